@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+ナレーション音声のキャッシュ
+
+合成済みの音声ファイルを (正規化したテキスト, エンジン, 声, 速度, 言語) の
+ハッシュをキーとしてディスクに保存し、同じナレーションの再合成を省略します。
+
+- 合計サイズの上限を超えると、最後に使われた日時が古いものから削除（LRU）
+- 書き込みは一時ファイル経由の置き換えで行い、中断されても壊れたファイルを残さない
+- ヒット数・ミス数などの統計情報を取得可能
+
+保存先:
+    .audio_cache/<キー>.<拡張子> と .audio_cache/index.json
+"""
+
+import hashlib    # キャッシュキーの計算用
+import json       # インデックスの読み書き用
+import os         # ファイル操作用
+import re         # テキストの正規化用
+import shutil     # ファイルのコピー用
+import tempfile   # アトミックな書き込み用
+import threading  # 複数スレッドからの利用の排他制御用
+import time       # 最終使用日時の記録用
+import unicodedata  # テキストの正規化用
+
+# 既定のキャッシュディレクトリと合計サイズの上限
+DEFAULT_CACHE_DIR = '.audio_cache'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+INDEX_FILE = 'index.json'
+
+
+def normalize_text(text):
+    """
+    キャッシュキー用にテキストを正規化
+
+    NFKC正規化（全角英数字・記号の統一）を行い、改行を含む連続した空白を
+    1つの空白にまとめます。読み上げ結果に影響しない書式の違いでキャッシュが外れないようにします。
+    """
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip()
+
+
+def _atomic_copy(src, dest):
+    """src を dest の隣の一時ファイルにコピーしてから置き換える"""
+    dest_dir = os.path.dirname(os.path.abspath(dest))
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp, open(src, 'rb') as f:
+            shutil.copyfileobj(f, tmp)
+        os.replace(tmp_path, dest)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class AudioCache:
+    """
+    合成済み音声のディスクキャッシュ（サイズ上限付きLRU）
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, extension='.mp3'):
+        """
+        Args:
+            cache_dir (str): キャッシュディレクトリ
+            max_bytes (int): キャッシュの合計サイズの上限（バイト）
+            extension (str): 保存する音声ファイルの拡張子
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    @staticmethod
+    def key(text, engine, voice=None, rate=None, lang=None):
+        """
+        キャッシュキーを計算
+
+        Args:
+            text (str): ナレーションのテキスト（正規化してからハッシュ化）
+            engine (str): 音声合成エンジン名（'gtts', 'say', 'espeak' など）
+            voice (str, optional): 声の名前
+            rate: 読み上げ速度
+            lang (str, optional): 言語コード
+
+        Returns:
+            str: 16進数のハッシュ文字列
+        """
+        payload = json.dumps([normalize_text(text), engine, voice, rate, lang], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.extension)
+
+    def _load_index(self):
+        """インデックスを読み込み、インデックスにない音声ファイルも登録し直す"""
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            index = {}
+
+        # 別プロセスが書き込んだ音声ファイルや、消えたファイルとの整合を取る
+        on_disk = {}
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.extension):
+                path = os.path.join(self.cache_dir, name)
+                on_disk[name[:-len(self.extension)]] = (os.path.getsize(path), os.path.getmtime(path))
+        return {
+            key: {'size': size, 'last_used': index.get(key, {}).get('last_used', mtime)}
+            for key, (size, mtime) in on_disk.items()
+        }
+
+    def _save_index(self):
+        """インデックスをアトミックに書き込み（ロック取得中に呼ぶこと）"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, os.path.join(self.cache_dir, INDEX_FILE))
+
+    def get(self, key, dest):
+        """
+        キャッシュされた音声を dest にコピー
+
+        Args:
+            key (str): キャッシュキー
+            dest (str): コピー先のファイルパス
+
+        Returns:
+            bool: キャッシュにあった場合True（コピーできなかった場合はミスとしてFalse）
+        """
+        path = self._path(key)
+        with self._lock:
+            if key not in self._index or not os.path.exists(path):
+                self._index.pop(key, None)
+                self.misses += 1
+                return False
+        try:
+            _atomic_copy(path, dest)
+        except OSError:
+            # 確認してからコピーするまでの間に、キャッシュを共有する別のプロセスが追い出した場合など
+            with self._lock:
+                if not os.path.exists(path):
+                    self._index.pop(key, None)
+                self.misses += 1
+                self._save_index()
+            return False
+        with self._lock:
+            if key in self._index:
+                self._index[key]['last_used'] = time.time()
+            self.hits += 1
+            self._save_index()
+        return True
+
+    def put(self, key, src):
+        """
+        音声ファイルをキャッシュに保存し、上限を超えた分を古い順に削除
+
+        Args:
+            key (str): キャッシュキー
+            src (str): 保存する音声ファイルのパス
+        """
+        path = self._path(key)
+        _atomic_copy(src, path)
+        with self._lock:
+            self._index[key] = {'size': os.path.getsize(path), 'last_used': time.time()}
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        """合計サイズが上限以下になるまで、最終使用日時が古いものから削除（ロック取得中に呼ぶこと）"""
+        total = sum(entry['size'] for entry in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]['last_used']):
+            if total <= self.max_bytes or len(self._index) <= 1:
+                break
+            total -= self._index.pop(key)['size']
+            if os.path.exists(self._path(key)):
+                os.remove(self._path(key))
+            self.evictions += 1
+
+    def stats(self):
+        """ヒット数・ミス数・エントリ数・合計サイズなどの統計情報を辞書で取得"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._index),
+                'bytes': sum(entry['size'] for entry in self._index.values()),
+            }
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+音声ファイルの長さの一括取得
+
+MP3はフレームヘッダーを、WAVはヘッダーをPython内で直接読み取り、
+ffprobe を1ファイルずつ起動せずに全シーンの音声の長さを一度に取得します。
+読み取れない形式のファイルだけ ffprobe にフォールバックします。
+
+取得した長さは音声ファイルと同じディレクトリの durations.json に
+ファイルサイズ・更新日時とともに保存し、変更のないファイルは再解析しません。
+"""
+
+import json      # 長さのインデックスの読み書き用
+import os        # ファイル操作用
+import subprocess  # ffprobe（フォールバック）の実行用
+import tempfile  # インデックスのアトミックな書き込み用
+import wave      # WAVファイルの長さ取得用
+from profiler import span  # 処理時間の計測用
+
+# 長さのインデックスのファイル名（音声ファイルと同じディレクトリに保存）
+DURATION_INDEX = 'durations.json'
+
+# ビットレート表（kbps）: (MPEG-1かどうか, レイヤー) -> インデックス順の値
+_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# サンプリングレート表（Hz）: バージョンビット -> インデックス順の値
+_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],   # MPEG-2.5
+}
+
+
+def _parse_frame_header(data, pos):
+    """
+    MP3フレームヘッダーを解析
+
+    Returns:
+        tuple: (フレーム長, フレームあたりのサンプル数, サンプリングレート, MPEG-1かどうか, モノラルかどうか)
+               ヘッダーとして不正な場合はNone
+    """
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+
+    version = (data[pos + 1] >> 3) & 0x03
+    layer = 4 - ((data[pos + 1] >> 1) & 0x03)
+    bitrate_index = data[pos + 2] >> 4
+    sample_rate_index = (data[pos + 2] >> 2) & 0x03
+    padding = (data[pos + 2] >> 1) & 0x01
+    mono = (data[pos + 3] >> 6) == 3
+
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate, mpeg1, mono
+    if layer == 3 and not mpeg1:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate, mpeg1, mono
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate, mpeg1, mono
+
+
+def _id3v2_size(data, pos):
+    """位置 pos にあるID3v2タグの全体サイズ（タグでない場合は0）"""
+    if data[pos:pos + 3] != b'ID3' or pos + 10 > len(data):
+        return 0
+    size = 0
+    for byte in data[pos + 6:pos + 10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[pos + 5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def mp3_duration(path):
+    """
+    MP3ファイルの長さ（秒）をフレームヘッダーから計算
+
+    先頭フレームにXing/Infoヘッダーがあればその総フレーム数を使い、
+    なければ全フレームのサンプル数を合計します。複数のMP3を連結したファイル
+    （途中にID3タグを含むもの）にも対応します。
+
+    Args:
+        path (str): MP3ファイルのパス
+
+    Returns:
+        float: 長さ（秒）。MP3フレームが見つからない場合はNone
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    pos = 0
+    seconds = 0.0
+    first_frame = True
+    found = False
+    while pos < len(data) - 4:
+        tag_size = _id3v2_size(data, pos)
+        if tag_size:
+            pos += tag_size
+            continue
+
+        header = _parse_frame_header(data, pos)
+        if header is None:
+            # 同期ワードを探して次のバイトへ
+            pos += 1
+            continue
+
+        frame_length, samples, sample_rate, mpeg1, mono = header
+        if first_frame:
+            first_frame = False
+            side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+            xing = pos + 4 + side_info
+            # 途中で切れたファイルではタグの後ろのフラグ・総フレーム数がないため、長さを確認してから読む
+            if (data[xing:xing + 4] in (b'Xing', b'Info') and len(data) >= xing + 12
+                    and data[xing + 7] & 0x01):
+                frames = int.from_bytes(data[xing + 8:xing + 12], 'big')
+                return frames * samples / sample_rate
+
+        found = True
+        seconds += samples / sample_rate
+        pos += max(frame_length, 1)
+
+    return seconds if found else None
+
+
+def wav_duration(path):
+    """WAVファイルの長さ（秒）をヘッダーから取得"""
+    with wave.open(path, 'rb') as f:
+        return f.getnframes() / f.getframerate()
+
+
+def ffprobe_duration(path):
+    """ffprobe で音声ファイルの長さ（秒）を取得（取得できない場合はNone）"""
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return float(result.stdout.strip())
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return None
+
+
+def audio_duration(path):
+    """音声ファイルの長さ（秒）を形式に応じた方法で取得（取得できない場合はNone）"""
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension == '.mp3':
+            duration = mp3_duration(path)
+            if duration is not None:
+                return duration
+        elif extension == '.wav':
+            return wav_duration(path)
+    except (OSError, EOFError, IndexError, wave.Error):
+        # 読めない・壊れたファイルは ffprobe に任せる
+        pass
+    return ffprobe_duration(path)
+
+
+def _load_index(directory):
+    try:
+        with open(os.path.join(directory, DURATION_INDEX), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_index(directory, index):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(directory, DURATION_INDEX))
+
+
+def probe_durations(paths):
+    """
+    複数の音声ファイルの長さを一括で取得
+
+    ファイルサイズと更新日時がインデックスと同じファイルは解析せずにインデックスの値を使い、
+    解析したファイルの結果はインデックスに追記します。
+
+    Args:
+        paths (list): 音声ファイルのパスのリスト
+
+    Returns:
+        dict: パス -> 長さ（秒）。存在しないファイルや長さを取得できないファイルは含まれません
+    """
+    with span('probe', 'audio', files=len(paths)):
+        durations = {}
+        by_directory = {}
+        for path in paths:
+            by_directory.setdefault(os.path.dirname(path) or '.', []).append(path)
+
+        for directory, directory_paths in by_directory.items():
+            index = _load_index(directory)
+            changed = False
+            for path in directory_paths:
+                if not os.path.exists(path):
+                    continue
+                stat = os.stat(path)
+                name = os.path.basename(path)
+                entry = index.get(name)
+                if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                    durations[path] = entry['duration']
+                    continue
+
+                duration = audio_duration(path)
+                if duration is None:
+                    continue
+                durations[path] = duration
+                index[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'duration': duration}
+                changed = True
+
+            if changed:
+                _save_index(directory, index)
+
+    return durations
@@ -0,0 +1,659 @@
+#!/usr/bin/env python3
+"""
+スクリーンショット生成処理のベンチマークスクリプト
+
+code_to_image_simple.py の各処理の速度を計測します。
+
+使用方法:
+    python benchmark_renderer.py tokenizer [--lines 2000] [--repeat 5]
+    python benchmark_renderer.py glyph-cache [--input index.html] [--repeat 3]
+    python benchmark_renderer.py render-modes [--scales 4 2 1]
+    python benchmark_renderer.py streaming [--lines 1000 10000] [--band-lines 64]
+    python benchmark_renderer.py frame [--repeat 3]
+    python benchmark_renderer.py suite [--output FILE] [--baseline FILE] [--lines 20 60 200] [--widths 40 80 120]
+    python benchmark_renderer.py compare OLD.json NEW.json [--threshold 0.1]
+
+suite は合成HTML/CSS/JSコードと index.html で、トークナイザーのスループットと
+generate_image のレイテンシ（p50/p95）・最大RSSを計測し、結果をJSONファイルに保存します。
+コミットごとの結果を compare で比較すると、性能の劣化を確認できます。
+"""
+
+import argparse  # コマンドライン引数の解析用
+import contextlib  # 描画中の進行表示の抑制用
+import io        # 描画中の進行表示の抑制用
+import json      # ベンチマーク結果の保存用
+import math      # PSNRの計算用
+import os        # 一時ファイルのパス操作用
+import platform  # 計測環境の記録用
+import random    # 合成コードの生成用
+import re        # 旧トークナイザー（比較用）の再現用
+import subprocess  # 計測対象のコミットの取得用
+import sys       # プラットフォーム判定用
+import tempfile  # ベンチマーク出力用の一時ディレクトリ
+import time      # 処理時間の計測用
+from datetime import datetime  # 計測日時の記録用
+from concurrent.futures import ProcessPoolExecutor  # 計測ごとにプロセスを分けるため
+
+try:
+    import resource  # ピークメモリ（最大RSS）の取得用（Unix系のみ）
+except ImportError:
+    resource = None
+
+import PIL
+from PIL import Image, ImageChops, ImageStat
+
+from code_to_image_simple import SimpleCodeImageGenerator
+from generate_screenshots import GENERATOR_SETTINGS, SOURCE_FILE, scene_title, scenes
+from resize_screenshots import BACKGROUND_COLOR, FILL_RATIO, TARGET_HEIGHT, TARGET_WIDTH, letterbox
+
+
+def load_corpus(path='index.html', min_lines=2000):
+    """
+    ベンチマーク用のソースコード行を読み込み
+
+    指定ファイルの行を min_lines 行以上になるまで繰り返して連結します。
+
+    Args:
+        path (str): 読み込むソースファイル
+        min_lines (int): 最低行数
+
+    Returns:
+        list: ソースコードの行のリスト
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        source_lines = f.read().split('\n')
+
+    lines = []
+    while len(lines) < min_lines:
+        lines.extend(source_lines)
+    return lines
+
+
+def legacy_tokenize_line(generator, line):
+    """
+    比較用：位置ごとに全パターンを再コンパイルして試行する従来のトークナイザー
+    """
+    tokens = []
+
+    if not line.strip():
+        return [(line, 'default')]
+
+    if line.strip().startswith('//') or line.strip().startswith('/*'):
+        return [(line, 'comment')]
+
+    if '<!--' in line:
+        return [(line, 'comment')]
+
+    in_css = False
+    if '{' in line and (':' in line or 'px' in line or '#' in line):
+        in_css = True
+
+    patterns = [
+        (r'//.*$|/\*.*?\*/', 'comment'),
+        (r'<!--.*?-->', 'comment'),
+        (r'"[^"]*"|\'[^\']*\'', 'string'),
+        (r'\b\d+\.?\d*\b', 'number'),
+        (r'</?[a-zA-Z][^>]*>', 'tag'),
+        (r'\b(?:' + '|'.join(generator.JS_KEYWORDS) + r')\b', 'keyword'),
+    ]
+
+    if in_css:
+        patterns.extend([
+            (r'\b(?:' + '|'.join(generator.CSS_KEYWORDS) + r')\b', 'css_property'),
+            (r'#[0-9a-fA-F]{3,6}', 'css_value'),
+            (r'\d+px|\d+%|\d+em', 'css_value'),
+        ])
+    else:
+        patterns.extend([
+            (r'\b(?:' + '|'.join(generator.BUILTINS) + r')\b', 'function'),
+            (r'\b\w+(?=\s*\()', 'function'),
+        ])
+
+    position = 0
+    while position < len(line):
+        matched = False
+
+        for pattern, token_type in patterns:
+            regex = re.compile(pattern)
+            match = regex.match(line, position)
+            if match:
+                if match.start() > position:
+                    tokens.append((line[position:match.start()], 'default'))
+                tokens.append((match.group(), token_type))
+                position = match.end()
+                matched = True
+                break
+
+        if not matched:
+            tokens.append((line[position], 'default'))
+            position += 1
+
+    return tokens
+
+
+def token_classes(tokens):
+    """トークン列を文字ごとのトークン種別リストに展開（分割位置の違いを無視して比較するため）"""
+    classes = []
+    for text, token_type in tokens:
+        classes.extend([token_type] * len(text))
+    return classes
+
+
+def time_tokenizer(tokenize, lines, repeat):
+    """トークナイザーで全行を repeat 回処理し、最速の所要時間（秒）を返す"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            tokenize(line)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_tokenizer(args):
+    """従来のループと結合済み正規表現によるトークナイザーを比較"""
+    generator = SimpleCodeImageGenerator(theme='light', font_size=16)
+    lines = load_corpus(args.input, args.lines)
+
+    # トークン種別が一致することを確認
+    mismatches = 0
+    legacy_tokens = 0
+    new_tokens = 0
+    for line in lines:
+        old = legacy_tokenize_line(generator, line)
+        new = generator._tokenize_line(line)
+        legacy_tokens += len(old)
+        new_tokens += len(new)
+        if token_classes(old) != token_classes(new):
+            mismatches += 1
+
+    legacy_time = time_tokenizer(lambda line: legacy_tokenize_line(generator, line), lines, args.repeat)
+    new_time = time_tokenizer(generator._tokenize_line, lines, args.repeat)
+
+    print(f"Tokenizer benchmark: {len(lines)} lines from {args.input} (best of {args.repeat})")
+    print(f"  legacy loop : {legacy_time * 1000:8.1f} ms  {len(lines) / legacy_time:10.0f} lines/s  {legacy_tokens} tokens")
+    print(f"  single pass : {new_time * 1000:8.1f} ms  {len(lines) / new_time:10.0f} lines/s  {new_tokens} tokens")
+    print(f"  speedup     : {legacy_time / new_time:.1f}x")
+    print(f"  token class mismatches: {mismatches}")
+
+
+def mean_pixel_diff(path_a, path_b):
+    """2枚の画像の画素値の平均絶対差（0〜255）を計算"""
+    with Image.open(path_a) as a, Image.open(path_b) as b:
+        diff = ImageChops.difference(a.convert('RGB'), b.convert('RGB'))
+        return sum(ImageStat.Stat(diff).mean) / 3
+
+
+def bench_glyph_cache(args):
+    """グリフキャッシュの有無で generate_image の所要時間を比較"""
+    with open(args.input, 'r', encoding='utf-8') as f:
+        code = f.read()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = {}
+        for label, cache_size in (('uncached', 0), ('cached', args.cache_size)):
+            generator = SimpleCodeImageGenerator(theme='light', font_size=16, glyph_cache_size=cache_size)
+            output_path = os.path.join(tmp_dir, f'{label}.png')
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                generator.generate_image(code, output_path, title=args.input)
+                timings.append(time.perf_counter() - start)
+            results[label] = (output_path, timings, generator.glyph_cache)
+
+        print(f"\nGlyph cache benchmark: {args.input} ({len(code.splitlines())} lines, {args.repeat} renders)")
+        for label, (_, timings, cache) in results.items():
+            print(f"  {label:9s}: first {timings[0] * 1000:8.1f} ms  best {min(timings) * 1000:8.1f} ms")
+            if cache is not None:
+                stats = cache.stats()
+                print(f"             hits {stats['hits']}  misses {stats['misses']}  "
+                      f"evictions {stats['evictions']}  entries {stats['entries']}  "
+                      f"hit rate {stats['hit_rate']:.1%}")
+
+        uncached_best = min(results['uncached'][1])
+        cached_best = min(results['cached'][1])
+        print(f"  speedup  : {uncached_best / cached_best:.2f}x")
+        print(f"  mean pixel difference: {mean_pixel_diff(results['uncached'][0], results['cached'][0]):.4f}")
+
+
+def peak_rss_mb():
+    """現在のプロセスの最大RSS（MB）を取得（取得できない場合はNone）"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOSはバイト単位、Linuxはキロバイト単位
+    return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+
+
+def _render_in_child(input_path, output_path, scale):
+    """子プロセス内で1枚描画し、(処理時間, キャンバスのメモリ量, 最大RSS) を返す"""
+    with open(input_path, 'r', encoding='utf-8') as f:
+        code = f.read()
+    generator = SimpleCodeImageGenerator(theme='light', font_size=16, render_scale=scale)
+    start = time.perf_counter()
+    generator.render_image(code, title=input_path).save(output_path)
+    seconds = time.perf_counter() - start
+    return seconds, generator.last_render_stats['canvas_bytes'], peak_rss_mb()
+
+
+def psnr(path_a, path_b):
+    """2枚の画像のPSNR（dB）を計算（同一画像の場合は inf）"""
+    with Image.open(path_a) as a, Image.open(path_b) as b:
+        diff = ImageChops.difference(a.convert('RGB'), b.convert('RGB'))
+        mse = sum(rms ** 2 for rms in ImageStat.Stat(diff).rms) / 3
+    return float('inf') if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+
+def bench_render_modes(args):
+    """描画スケールごとの時間・メモリと、4倍描画との画質差を比較"""
+    print(f"Render mode benchmark: {args.input}")
+    print(f"  {'scale':>5}  {'time':>10}  {'canvas':>10}  {'peak RSS':>10}  {'mean diff':>9}  {'PSNR':>8}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        reference_path = os.path.join(tmp_dir, 'scale4.png')
+        scales = [4] + [scale for scale in args.scales if scale != 4]
+        for scale in scales:
+            output_path = os.path.join(tmp_dir, f'scale{scale}.png')
+            # 最大RSSを他の計測と分離するため、描画ごとに新しいプロセスを使う
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                seconds, canvas_bytes, rss = executor.submit(
+                    _render_in_child, args.input, output_path, scale
+                ).result()
+
+            rss_text = f"{rss:8.1f}MB" if rss is not None else f"{'n/a':>10}"
+            print(f"  {scale:>5}  {seconds * 1000:8.1f}ms  {canvas_bytes / (1024 * 1024):8.1f}MB  {rss_text}  "
+                  f"{mean_pixel_diff(reference_path, output_path):9.3f}  {psnr(reference_path, output_path):6.2f}dB")
+
+
+def _render_pages_in_child(lines, output_dir, lines_per_page, band_lines):
+    """子プロセス内で合成コードをページ分割で描画し、(処理時間, ページ数, 最大RSS) を返す"""
+    generator = SimpleCodeImageGenerator(theme='light', font_size=16)
+    start = time.perf_counter()
+    paths = generator.generate_pages('\n'.join(lines), os.path.join(output_dir, 'page{page:04d}.png'),
+                                     title='streaming benchmark', lines_per_page=lines_per_page,
+                                     band_lines=band_lines)
+    return time.perf_counter() - start, len(paths), peak_rss_mb()
+
+
+def bench_streaming(args):
+    """ページ分割・帯描画で、行数が増えても最大RSSが一定に保たれることを確認"""
+    print(f"Streaming benchmark: {args.lines_per_page} lines/page, {args.band_lines} lines/band")
+    print(f"  {'lines':>7}  {'pages':>5}  {'time':>10}  {'peak RSS':>10}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_lines in args.lines:
+            lines = load_corpus(args.input, num_lines)[:num_lines]
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                seconds, pages, rss = executor.submit(
+                    _render_pages_in_child, lines, tmp_dir, args.lines_per_page, args.band_lines
+                ).result()
+            rss_text = f"{rss:8.1f}MB" if rss is not None else f"{'n/a':>10}"
+            print(f"  {num_lines:>7}  {pages:>5}  {seconds:9.2f}s  {rss_text}")
+
+
+def bench_frame(args):
+    """通常描画 + レターボックス化（リサイズ）と、render_to_frame による直接描画を比較"""
+    with open(SOURCE_FILE, 'r', encoding='utf-8') as f:
+        source_lines = f.readlines()
+    generator = SimpleCodeImageGenerator(**GENERATOR_SETTINGS)
+
+    print(f"Frame benchmark: {len(scenes)} scenes -> {TARGET_WIDTH}x{TARGET_HEIGHT} (best of {args.repeat})")
+    print(f"  {'scene':<28}  {'letterbox':>10}  {'direct':>10}  {'font':>4}  {'scale':>5}")
+    totals = [0.0, 0.0]
+    for scene in scenes:
+        code = ''.join(source_lines[scene['start']-1:scene['end']])
+        title = scene_title(scene)
+        timings = [float('inf'), float('inf')]
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            letterbox(generator.render_image(code, title=title))
+            timings[0] = min(timings[0], time.perf_counter() - start)
+
+            start = time.perf_counter()
+            generator.render_to_frame(code, frame_size=(TARGET_WIDTH, TARGET_HEIGHT), title=title,
+                                      background=BACKGROUND_COLOR, fill_ratio=FILL_RATIO)
+            timings[1] = min(timings[1], time.perf_counter() - start)
+
+        stats = generator.last_render_stats
+        totals = [total + timing for total, timing in zip(totals, timings)]
+        print(f"  {scene['name']:<28}  {timings[0] * 1000:8.1f}ms  {timings[1] * 1000:8.1f}ms  "
+              f"{stats['font_size']:>4}  {stats['scale']:>5}")
+    print(f"  {'total':<28}  {totals[0] * 1000:8.1f}ms  {totals[1] * 1000:8.1f}ms")
+    print(f"  speedup: {totals[0] / totals[1]:.2f}x")
+
+
+# suite の結果ファイルの保存先
+SUITE_RESULTS_DIR = '.benchmarks'
+
+# 合成コードの断片（言語ごと）。行の幅に達するまでランダムに連結します
+SYNTHETIC_FRAGMENTS = {
+    'html': [
+        '<div class="court">', '</div>', '<span id="score">0</span>', '<canvas id="game" width="800">',
+        '<button onclick="setDifficulty(\'hard\')">Hard</button>', '<p>', '</p>', 'Player', 'vs', 'CPU',
+        '<h1>Tennis</h1>', '<!-- scoreboard -->', '<input type="range" min="1" max="11">', 'first to 11',
+    ],
+    'css': [
+        '.panel {', 'color: #e0e0e0;', 'margin: 12px 4px;', 'padding: 8px;', 'font-size: 16px;',
+        'background: #1e1e1e;', 'border: 2px solid #4ec9b0;', 'width: 100%;', 'display: flex;',
+        'text-align: center;', '}', '#score {', 'height: 2em;', 'position: absolute;',
+    ],
+    'js': [
+        'const speed = Math.min(ball.dx * 1.05, 12);', 'if (ball.x < 0) {', 'resetBall();', '}',
+        'let aiError = Math.random() * 0.3;', 'function updateAI(dt) {', 'return player.y + 40;',
+        'ctx.fillRect(x, y, 10, 80);', '// predict the landing point', 'for (let i = 0; i < 11; i++) {',
+        "document.getElementById('score').textContent = score;", 'ball.dy = -ball.dy;', 'else {',
+    ],
+}
+
+
+def synthetic_corpus(language, num_lines, width, seed=0):
+    """
+    ベンチマーク用の合成コードを生成
+
+    言語ごとの断片をインデント付きで連結し、各行をちょうど width 文字にそろえます。
+    乱数の種が同じなら、いつ・どの環境で実行しても同じコードになります。
+
+    Args:
+        language (str): 'html', 'css', 'js'、または3言語を数行ずつ交互に並べる 'mixed'
+        num_lines (int): 行数
+        width (int): 1行の文字数
+        seed (int): 乱数の種
+
+    Returns:
+        list: コードの行のリスト
+    """
+    rng = random.Random(f'{language}:{seed}')
+    languages = list(SYNTHETIC_FRAGMENTS) if language == 'mixed' else [language]
+    lines = []
+    for index in range(num_lines):
+        fragments = SYNTHETIC_FRAGMENTS[languages[(index // 8) % len(languages)]]
+        line = ' ' * rng.choice((0, 2, 4, 8))
+        while len(line) < width:
+            line += rng.choice(fragments) + ' '
+        lines.append(line[:width])
+    return lines
+
+
+def percentile(values, fraction):
+    """値のリストのパーセンタイル（線形補間, fraction は0〜1）"""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def git_revision():
+    """計測対象のコミットと、作業ツリーに未コミットの変更があるかを取得（gitが使えない場合はNone）"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def bench_tokenizer_corpora(corpora, repeat):
+    """
+    コーパスごとの _tokenize_line のスループットを計測
+
+    Returns:
+        list: コーパスごとの結果（1行あたりの処理時間のp50/p95, 中央値での行数/秒）
+    """
+    generator = SimpleCodeImageGenerator()
+    results = []
+    for name, lines in corpora.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for line in lines:
+                generator._tokenize_line(line)
+            timings.append(time.perf_counter() - start)
+        tokens = sum(len(generator._tokenize_line(line)) for line in lines)
+        p50 = percentile(timings, 0.5)
+        results.append({
+            'corpus': name,
+            'lines': len(lines),
+            'tokens': tokens,
+            'p50_us_per_line': p50 / len(lines) * 1e6,
+            'p95_us_per_line': percentile(timings, 0.95) / len(lines) * 1e6,
+            'lines_per_sec': len(lines) / p50,
+        })
+    return results
+
+
+def _latency_in_child(code, title, theme, scale, band_lines, repeat, output_path):
+    """
+    子プロセス内で同じコードを (1 + repeat) 回 generate_image し、処理時間とメモリ量を返す
+
+    1回目はフォントの読み込みやグリフキャッシュの作成を含む初回の時間として別に記録します。
+    """
+    baseline_rss = peak_rss_mb()
+    generator = SimpleCodeImageGenerator(theme=theme, font_size=16, render_scale=scale)
+    timings = []
+    for _ in range(1 + repeat):
+        start = time.perf_counter()
+        # generate_image の保存メッセージは計測結果の表示の邪魔になるため捨てる
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator.generate_image(code, output_path, title=title, band_lines=band_lines)
+        timings.append(time.perf_counter() - start)
+    with Image.open(output_path) as img:
+        image_size = img.size
+    return {
+        'first_ms': timings[0] * 1000,
+        'timings_ms': [seconds * 1000 for seconds in timings[1:]],
+        'canvas_mb': generator.last_render_stats['canvas_bytes'] / (1024 * 1024),
+        'baseline_rss_mb': baseline_rss,
+        'peak_rss_mb': peak_rss_mb(),
+        'image_size': list(image_size),
+    }
+
+
+def render_cases(args):
+    """suite で描画するケース（合成コードの行数×幅、index.html）×テーマ×スケールの一覧"""
+    with open(args.input, 'r', encoding='utf-8') as f:
+        input_code = f.read()
+
+    sources = []
+    for num_lines in args.lines:
+        for width in args.widths:
+            code = '\n'.join(synthetic_corpus('mixed', num_lines, width, args.seed))
+            sources.append(('mixed', num_lines, width, code))
+    input_lines = input_code.split('\n')
+    sources.append((os.path.basename(args.input), len(input_lines), max(len(line) for line in input_lines),
+                    input_code))
+
+    for corpus, num_lines, width, code in sources:
+        for theme in args.themes:
+            for scale in args.scales:
+                yield {'corpus': corpus, 'lines': num_lines, 'width': width, 'theme': theme, 'scale': scale}, code
+
+
+def case_key(case):
+    """結果の比較に使うケースの名前"""
+    if 'theme' not in case:
+        return f"tokenize {case['corpus']}"
+    return f"render {case['corpus']} {case['lines']}x{case['width']} {case['theme']} x{case['scale']}"
+
+
+def bench_suite(args):
+    """トークナイザーのスループットと generate_image のレイテンシ・メモリ量を計測して保存"""
+    commit, dirty = git_revision()
+    corpora = {language: synthetic_corpus(language, args.tokenizer_lines, 80, args.seed)
+               for language in SYNTHETIC_FRAGMENTS}
+    corpora[os.path.basename(args.input)] = load_corpus(args.input, args.tokenizer_lines)
+
+    print(f"Renderer benchmark suite (commit {commit[:10] if commit else 'unknown'}{', dirty' if dirty else ''})")
+    print(f"\nTokenizer throughput ({args.tokenizer_lines}+ lines per corpus, {args.repeat} runs)")
+    print(f"  {'corpus':<12}  {'lines/s':>10}  {'p50':>10}  {'p95':>10}")
+    tokenizer_results = bench_tokenizer_corpora(corpora, args.repeat)
+    for result in tokenizer_results:
+        print(f"  {result['corpus']:<12}  {result['lines_per_sec']:10.0f}  {result['p50_us_per_line']:7.2f}us  "
+              f"{result['p95_us_per_line']:7.2f}us")
+
+    print(f"\ngenerate_image latency (1 warm-up + {args.repeat} renders per case, fresh process per case)")
+    print(f"  {'case':<38}  {'first':>9}  {'p50':>9}  {'p95':>9}  {'canvas':>8}  {'peak RSS':>9}")
+    render_results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'render.png')
+        for case, code in render_cases(args):
+            # 最大RSSを他のケースと分離するため、ケースごとに新しいプロセスを使う
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                measured = executor.submit(_latency_in_child, code, f"benchmark {case['corpus']}",
+                                           case['theme'], case['scale'], args.band_lines, args.repeat,
+                                           output_path).result()
+            case.update(measured)
+            case['p50_ms'] = percentile(case['timings_ms'], 0.5)
+            case['p95_ms'] = percentile(case['timings_ms'], 0.95)
+            render_results.append(case)
+
+            rss_text = f"{case['peak_rss_mb']:7.1f}MB" if case['peak_rss_mb'] is not None else f"{'n/a':>9}"
+            print(f"  {case_key(case)[len('render '):]:<38}  {case['first_ms']:7.1f}ms  {case['p50_ms']:7.1f}ms  "
+                  f"{case['p95_ms']:7.1f}ms  {case['canvas_mb']:6.1f}MB  {rss_text}")
+
+    results = {
+        'commit': commit,
+        'dirty': dirty,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+        },
+        'settings': {key: value for key, value in vars(args).items() if key != 'func'},
+        'tokenizer': tokenizer_results,
+        'render': render_results,
+    }
+
+    output = args.output or os.path.join(SUITE_RESULTS_DIR, f"renderer_{commit[:10] if commit else 'unknown'}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        return 1 if compare_results(baseline, results, args.threshold) else 0
+    return 0
+
+
+def compare_results(baseline, current, threshold):
+    """
+    2回分の suite の結果を比較して表示
+
+    描画はp50レイテンシと最大RSS、トークナイザーは1行あたりのp50処理時間を比べ、
+    threshold（相対値）を超えて悪化したケースを回帰として数えます。
+
+    Returns:
+        int: 回帰と判定したケースの数
+    """
+    def metrics(results):
+        table = {}
+        for result in results['tokenizer']:
+            table[case_key(result)] = {'time': result['p50_us_per_line'], 'rss': None}
+        for result in results['render']:
+            table[case_key(result)] = {'time': result['p50_ms'], 'rss': result['peak_rss_mb']}
+        return table
+
+    old = metrics(baseline)
+    new = metrics(current)
+    print(f"\nComparison: {(baseline.get('commit') or 'unknown')[:10]} -> {(current.get('commit') or 'unknown')[:10]} "
+          f"(regression threshold {threshold:.0%})")
+    if baseline.get('environment') != current.get('environment'):
+        print("  note: results were measured in different environments")
+    print(f"  {'case':<45}  {'time':>8}  {'peak RSS':>8}")
+
+    regressions = 0
+    for key in [key for key in new if key in old]:
+        time_ratio = new[key]['time'] / old[key]['time']
+        rss_ratio = (new[key]['rss'] / old[key]['rss']) if new[key]['rss'] and old[key]['rss'] else None
+        regressed = time_ratio > 1 + threshold or (rss_ratio is not None and rss_ratio > 1 + threshold)
+        regressions += regressed
+        rss_text = f"{rss_ratio - 1:+7.1%}" if rss_ratio is not None else f"{'':>7}"
+        print(f"  {key:<45}  {time_ratio - 1:+7.1%}  {rss_text}{'  REGRESSION' if regressed else ''}")
+
+    missing = [key for key in old if key not in new]
+    if missing:
+        print(f"  {len(missing)} baseline case(s) not measured in the current run")
+    print(f"  {regressions} regression(s)")
+    return regressions
+
+
+def compare_command(args):
+    """保存済みの2つの結果ファイルを比較（回帰がある場合は終了コード1）"""
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, 'r', encoding='utf-8') as f:
+        current = json.load(f)
+    return 1 if compare_results(baseline, current, args.threshold) else 0
+
+
+def main():
+    """Main function to run renderer benchmarks."""
+    parser = argparse.ArgumentParser(description='Benchmark code_to_image_simple.py')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    tokenizer_parser = subparsers.add_parser('tokenizer', help='compare tokenizer implementations')
+    tokenizer_parser.add_argument('--input', default='index.html', help='source file used as corpus')
+    tokenizer_parser.add_argument('--lines', type=int, default=2000, help='minimum number of lines')
+    tokenizer_parser.add_argument('--repeat', type=int, default=5, help='number of timed repetitions')
+    tokenizer_parser.set_defaults(func=bench_tokenizer)
+
+    cache_parser = subparsers.add_parser('glyph-cache', help='render a file with and without the glyph cache')
+    cache_parser.add_argument('--input', default='index.html', help='source file to render')
+    cache_parser.add_argument('--repeat', type=int, default=3, help='number of renders per mode')
+    cache_parser.add_argument('--cache-size', type=int, default=4096, help='glyph cache entries')
+    cache_parser.set_defaults(func=bench_glyph_cache)
+
+    modes_parser = subparsers.add_parser('render-modes', help='compare render scales against the 4x output')
+    modes_parser.add_argument('--input', default='index.html', help='source file to render')
+    modes_parser.add_argument('--scales', type=int, nargs='+', default=[4, 2, 1], help='render scales to compare')
+    modes_parser.set_defaults(func=bench_render_modes)
+
+    streaming_parser = subparsers.add_parser('streaming', help='measure peak memory of paged rendering')
+    streaming_parser.add_argument('--input', default='index.html', help='source file used as corpus')
+    streaming_parser.add_argument('--lines', type=int, nargs='+', default=[1000, 10000], help='line counts')
+    streaming_parser.add_argument('--lines-per-page', type=int, default=500, help='lines per page image')
+    streaming_parser.add_argument('--band-lines', type=int, default=64, help='lines per render band')
+    streaming_parser.set_defaults(func=bench_streaming)
+
+    frame_parser = subparsers.add_parser('frame', help='compare render + letterbox with render_to_frame')
+    frame_parser.add_argument('--repeat', type=int, default=3, help='number of renders per scene and mode')
+    frame_parser.set_defaults(func=bench_frame)
+
+    suite_parser = subparsers.add_parser('suite', help='run the tokenizer and render latency suite and save results')
+    suite_parser.add_argument('--output', help=f'results file (default: {SUITE_RESULTS_DIR}/renderer_<commit>.json)')
+    suite_parser.add_argument('--baseline', help='previous results file to compare against')
+    suite_parser.add_argument('--threshold', type=float, default=0.1,
+                              help='relative slowdown reported as a regression (default: 0.1 = 10%%)')
+    suite_parser.add_argument('--input', default='index.html', help='real source file rendered alongside the synthetic code')
+    suite_parser.add_argument('--tokenizer-lines', type=int, default=5000, help='lines per tokenizer corpus')
+    suite_parser.add_argument('--lines', type=int, nargs='+', default=[20, 60, 200], help='line counts to render')
+    suite_parser.add_argument('--widths', type=int, nargs='+', default=[40, 80, 120], help='line widths (characters)')
+    suite_parser.add_argument('--themes', nargs='+', default=['dark', 'light'],
+                              choices=sorted(SimpleCodeImageGenerator.THEMES), help='themes to render')
+    suite_parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 4], help='render scales')
+    suite_parser.add_argument('--band-lines', type=int, help='lines per render band (default: whole image at once)')
+    suite_parser.add_argument('--repeat', type=int, default=5, help='timed renders per case (after one warm-up)')
+    suite_parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic corpora')
+    suite_parser.set_defaults(func=bench_suite)
+
+    compare_parser = subparsers.add_parser('compare', help='compare two saved suite results')
+    compare_parser.add_argument('baseline', help='older results file')
+    compare_parser.add_argument('current', help='newer results file')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='relative slowdown reported as a regression (default: 0.1 = 10%%)')
+    compare_parser.set_defaults(func=compare_command)
+
+    args = parser.parse_args()
+    return args.func(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+動画エンコード処理のベンチマークスクリプト
+
+create_video.py のエンコード方式を、同じ画像・音声で比較します。
+ビルドキャッシュは一時ディレクトリのものを使うため、毎回すべてエンコードされ、
+本来のキャッシュや出力動画には影響しません。
+
+使用方法:
+    python benchmark_video.py encode-modes [--repeat 1] [--jobs 1 4] [--scenes N]
+    python benchmark_video.py profiles [--scenes N]
+"""
+
+import argparse  # コマンドライン引数の解析用
+import os        # 一時ファイルのパス操作用
+import re        # ffmpegの出力の解析用
+import subprocess  # 画質比較（ffmpegのpsnrフィルター）用
+import tempfile  # ベンチマーク出力用の一時ディレクトリ
+import time      # 処理時間の計測用
+
+try:
+    import resource  # 子プロセス（ffmpeg）のCPU時間の取得用（Unix系のみ）
+except ImportError:
+    resource = None
+
+import create_video
+from audio_durations import ffprobe_duration
+from build_cache import BuildCache
+
+
+def children_cpu_seconds():
+    """終了済みの子プロセスのCPU時間（ユーザー + システム）の合計（取得できない場合はNone）"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def video_psnr(path_a, path_b):
+    """ffmpegのpsnrフィルターで2つの動画の平均PSNR（dB）を計算（取得できない場合はNone）"""
+    cmd = ['ffmpeg', '-i', path_a, '-i', path_b, '-lavfi', '[0:v][1:v]psnr', '-f', 'null', '-']
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    match = re.search(r'average:(inf|[0-9.]+)', result.stderr)
+    return float(match.group(1)) if match else None
+
+
+def load_items(args):
+    """ベンチマーク対象のシーン（--scenes 指定時は先頭からその数だけ）"""
+    items = create_video.collect_scenes()
+    return items[:args.scenes] if args.scenes else items
+
+
+def time_encode(encode, repeat, keep=None):
+    """
+    エンコード関数を repeat 回実行し、最速の (経過時間, ffmpegのCPU時間) を返す
+
+    Args:
+        encode (callable): 一時ディレクトリのパスを受け取り、成功時にTrueを返す関数
+        repeat (int): 計測回数
+        keep (str, optional): 指定した場合、最後の出力動画をこのパスに移動して残す
+
+    Returns:
+        tuple: (経過時間（秒）, CPU時間（秒）またはNone, 出力ファイルサイズ（バイト）, 動画の長さ（秒）)
+    """
+    best = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, 'output.mp4')
+            cpu_before = children_cpu_seconds()
+            start = time.perf_counter()
+            if not encode(tmp_dir, output):
+                raise RuntimeError('encode failed')
+            seconds = time.perf_counter() - start
+            cpu_after = children_cpu_seconds()
+            cpu = cpu_after - cpu_before if cpu_before is not None else None
+            result = (seconds, cpu, os.path.getsize(output), ffprobe_duration(output))
+            if keep:
+                os.replace(output, keep)
+        if best is None or result[0] < best[0]:
+            best = result
+    return best
+
+
+def bench_encode_modes(args):
+    """セグメント作成 + 結合の2段階方式（並列数ごと）と、concatフィルターによる1回エンコードを比較"""
+    items = load_items(args)
+    if not items:
+        print("No scenes to encode (generate screenshots and audio first)")
+        return
+    content = sum(item['total_duration'] for item in items)
+
+    def segments(jobs):
+        def encode(tmp_dir, output):
+            cache = BuildCache('benchmark', cache_dir=os.path.join(tmp_dir, 'cache'))
+            return create_video.encode_segments(items, output, cache, jobs=jobs,
+                                                segments_path=os.path.join(tmp_dir, 'segments'))
+        return encode
+
+    def single_pass(tmp_dir, output):
+        cache = BuildCache('benchmark', cache_dir=os.path.join(tmp_dir, 'cache'))
+        return create_video.encode_single_pass(items, output, cache)
+
+    modes = [
+        (f'segments ({jobs} jobs)', len(items) + 1, segments(jobs))
+        for jobs in sorted(set(args.jobs))
+    ]
+    modes.append(('single-pass', 1, single_pass))
+
+    results = []
+    for label, processes, encode in modes:
+        results.append((label, processes) + time_encode(encode, args.repeat))
+
+    print(f"\nEncode mode benchmark: {len(items)} scenes, {content:.1f}s of video")
+    print(f"  {'mode':<20}  {'ffmpeg runs':>11}  {'wall':>8}  {'cpu':>8}  {'realtime':>8}  "
+          f"{'size':>9}  {'duration':>8}")
+    for label, processes, seconds, cpu, size, duration in results:
+        cpu_text = f"{cpu:7.1f}s" if cpu is not None else f"{'n/a':>8}"
+        duration_text = f"{duration:7.2f}s" if duration is not None else f"{'n/a':>8}"
+        print(f"  {label:<20}  {processes:>11}  {seconds:7.1f}s  {cpu_text}  {content / seconds:7.1f}x  "
+              f"{size / (1024 * 1024):7.2f}MB  {duration_text}")
+    baseline = results[0][2]
+    for label, _, seconds, *_ in results[1:]:
+        print(f"  speedup of {label} over {results[0][0]}: {baseline / seconds:.2f}x")
+
+
+def bench_profiles(args):
+    """エンコードプロファイルごとのエンコード時間・ファイルサイズ・画質（standard との PSNR）を比較"""
+    items = load_items(args)
+    if not items:
+        print("No scenes to encode (generate screenshots and audio first)")
+        return
+    content = sum(item['total_duration'] for item in items)
+
+    def encode_with(profile):
+        def encode(tmp_dir, output):
+            cache = BuildCache('benchmark', cache_dir=os.path.join(tmp_dir, 'cache'))
+            return create_video.encode_segments(items, output, cache, jobs=1, profile=profile,
+                                                segments_path=os.path.join(tmp_dir, 'segments'))
+        return encode
+
+    profiles = ['standard'] + [name for name in sorted(create_video.ENCODE_PROFILES) if name != 'standard']
+    results = []
+    with tempfile.TemporaryDirectory() as keep_dir:
+        reference = os.path.join(keep_dir, 'standard.mp4')
+        for profile in profiles:
+            kept = os.path.join(keep_dir, f'{profile}.mp4')
+            seconds, cpu, size, _ = time_encode(encode_with(profile), 1, keep=kept)
+            quality = video_psnr(kept, reference) if profile != 'standard' else None
+            results.append((profile, seconds, cpu, size, quality))
+
+    print(f"\nEncode profile benchmark: {len(items)} scenes, {content:.1f}s of video, 1 job")
+    print(f"  {'profile':<10}  {'wall':>8}  {'cpu':>8}  {'realtime':>8}  {'size':>9}  {'PSNR':>8}")
+    for profile, seconds, cpu, size, quality in results:
+        cpu_text = f"{cpu:7.1f}s" if cpu is not None else f"{'n/a':>8}"
+        quality_text = f"{quality:6.2f}dB" if quality is not None else f"{'-':>8}"
+        print(f"  {profile:<10}  {seconds:7.1f}s  {cpu_text}  {content / seconds:7.1f}x  "
+              f"{size / (1024 * 1024):7.2f}MB  {quality_text}")
+    baseline = results[0]
+    for profile, seconds, cpu, size, _ in results[1:]:
+        cpu_ratio = f", {baseline[2] / cpu:.2f}x less CPU" if cpu and baseline[2] else ''
+        print(f"  {profile} vs standard: {baseline[1] / seconds:.2f}x faster{cpu_ratio}, "
+              f"{size / baseline[3]:.2f}x size")
+
+
+def main():
+    """Main function to run video encoding benchmarks."""
+    parser = argparse.ArgumentParser(description='Benchmark create_video.py')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    modes_parser = subparsers.add_parser('encode-modes', help='compare segment + concat with a single-pass encode')
+    modes_parser.add_argument('--repeat', type=int, default=1, help='number of timed runs per mode')
+    modes_parser.add_argument('--jobs', type=int, nargs='+', default=[1, os.cpu_count() or 1],
+                              help='parallel segment encodes to compare')
+    modes_parser.add_argument('--scenes', type=int, help='only encode the first N scenes')
+    modes_parser.set_defaults(func=bench_encode_modes)
+
+    profiles_parser = subparsers.add_parser('profiles', help='compare encoding profiles (time, size, PSNR)')
+    profiles_parser.add_argument('--scenes', type=int, help='only encode the first N scenes')
+    profiles_parser.set_defaults(func=bench_profiles)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
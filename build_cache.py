@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+ビルドキャッシュ（内容ハッシュによる差分ビルド）
+
+動画生成パイプラインの各成果物（スクリーンショット、音声、リサイズ画像、
+動画セグメント）について、生成に使った入力内容のハッシュをマニフェストに記録します。
+入力が前回と同じで成果物が残っている場合は再生成をスキップし、
+再生成した場合はその理由をマニフェストに残します。
+
+マニフェスト:
+    .build_cache/manifest.json
+
+キャッシュを無視して全て再生成する場合は、環境変数 BUILD_CACHE_FORCE=1 を設定するか、
+.build_cache ディレクトリを削除してください。
+"""
+
+import hashlib    # 内容ハッシュの計算用
+import json       # マニフェストの読み書き用
+import os         # ファイル操作用
+import tempfile   # マニフェストのアトミックな書き込み用
+import threading  # 複数スレッドからの記録の排他制御用
+from datetime import datetime  # 記録日時用
+
+# キャッシュディレクトリとマニフェストファイル
+CACHE_DIR = '.build_cache'
+MANIFEST_FILE = 'manifest.json'
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """
+    ファイル内容のSHA-256ハッシュを計算
+
+    Args:
+        path (str): ファイルパス
+        chunk_size (int): 読み込み単位（バイト）
+
+    Returns:
+        str: 16進数のハッシュ文字列
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_key(*parts):
+    """
+    成果物の入力内容からキャッシュキーを計算
+
+    文字列・数値・辞書・リストなどJSONで表現できる値を受け取り、
+    順序を含めて同じ入力であれば同じキーになります。
+
+    Returns:
+        str: 16進数のハッシュ文字列
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class FileHashIndex:
+    """
+    ファイルのハッシュの索引
+
+    ファイルサイズと更新日時（ナノ秒）が前回と同じファイルは内容を読まずに前回のハッシュを返し、
+    変わったファイルだけハッシュを計算し直します。更新日時だけが変わったファイル
+    （内容は同じ）もハッシュで同一と判定できるため、不要な再生成は起きません。
+
+    索引:
+        .build_cache/hashes_<name>.json
+    """
+
+    def __init__(self, name, cache_dir=CACHE_DIR):
+        """
+        Args:
+            name (str): 索引の名前（処理段階ごとに分ける）
+            cache_dir (str): キャッシュディレクトリ
+        """
+        self.path = os.path.join(cache_dir, f'hashes_{name}.json')
+        self.cache_dir = cache_dir
+        self.hashed = 0  # 実際に内容を読んでハッシュを計算したファイル数
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._index = {}
+
+    def hash(self, path):
+        """ファイルのハッシュを取得（サイズと更新日時が前回と同じ場合は索引の値）"""
+        stat = os.stat(path)
+        entry = self._index.get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['hash']
+
+        digest = hash_file(path)
+        self.hashed += 1
+        self._index[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest}
+        return digest
+
+    def save(self):
+        """索引を一時ファイル経由でアトミックに書き込み"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def load_manifest(cache_dir=CACHE_DIR):
+    """マニフェストを読み込み（存在しない場合は空のマニフェスト）"""
+    path = os.path.join(cache_dir, MANIFEST_FILE)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'artifacts': {}, 'runs': {}}
+
+
+class BuildCache:
+    """
+    1つの処理段階（stage）の成果物キャッシュ
+
+    check() で成果物を再生成する必要があるか判定し、record() で結果を記録、
+    save() でマニフェストに書き込みます。
+    """
+
+    def __init__(self, stage, cache_dir=CACHE_DIR):
+        """
+        Args:
+            stage (str): 処理段階の名前（'screenshots', 'audio' など）
+            cache_dir (str): キャッシュディレクトリ
+        """
+        self.stage = stage
+        self.cache_dir = cache_dir
+        self.force = os.environ.get('BUILD_CACHE_FORCE', '') not in ('', '0')
+        self._manifest = load_manifest(cache_dir)
+        self._entries = []
+        self._lock = threading.Lock()
+        self._started = datetime.now().isoformat(timespec='seconds')
+
+    def check(self, artifact, key):
+        """
+        成果物を再生成する必要があるか判定
+
+        Args:
+            artifact (str): 成果物のファイルパス
+            key (str): 現在の入力内容から計算したキャッシュキー
+
+        Returns:
+            tuple: (再利用できる場合True, 判定理由)
+        """
+        if self.force:
+            return False, 'forced rebuild'
+        if not os.path.exists(artifact):
+            return False, 'output missing'
+
+        with self._lock:
+            previous = self._manifest['artifacts'].get(artifact)
+        if previous is None:
+            return False, 'not in manifest'
+        if previous['key'] != key:
+            return False, 'inputs changed'
+        return True, 'up to date'
+
+    def record(self, artifact, key, rebuilt, reason):
+        """
+        成果物の処理結果を記録
+
+        Args:
+            artifact (str): 成果物のファイルパス
+            key (str): キャッシュキー
+            rebuilt (bool): 再生成した場合True、スキップした場合False
+            reason (str): 再生成またはスキップの理由
+        """
+        with self._lock:
+            self._manifest['artifacts'][artifact] = {
+                'key': key,
+                'stage': self.stage,
+                'updated': datetime.now().isoformat(timespec='seconds') if rebuilt
+                else self._manifest['artifacts'].get(artifact, {}).get('updated'),
+            }
+            self._entries.append({
+                'artifact': artifact,
+                'action': 'rebuilt' if rebuilt else 'skipped',
+                'reason': reason,
+            })
+
+    def forget(self, artifact):
+        """生成に失敗した成果物をマニフェストから削除（次回は必ず再生成されるように）"""
+        with self._lock:
+            self._manifest['artifacts'].pop(artifact, None)
+
+    def save(self):
+        """
+        今回の処理結果をマニフェストに書き込み
+
+        他の処理段階が記録した内容を消さないよう、書き込み直前に読み直して
+        この段階の分だけを反映し、一時ファイル経由でアトミックに置き換えます。
+        """
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            manifest = load_manifest(self.cache_dir)
+            for artifact, entry in self._manifest['artifacts'].items():
+                if entry['stage'] == self.stage:
+                    manifest['artifacts'][artifact] = entry
+            for artifact, entry in list(manifest['artifacts'].items()):
+                if entry['stage'] == self.stage and artifact not in self._manifest['artifacts']:
+                    del manifest['artifacts'][artifact]
+            manifest['runs'][self.stage] = {
+                'started': self._started,
+                'entries': list(self._entries),
+            }
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, os.path.join(self.cache_dir, MANIFEST_FILE))
+
+    def summary(self):
+        """今回の処理結果の件数を (再生成数, スキップ数) で取得"""
+        with self._lock:
+            rebuilt = sum(1 for entry in self._entries if entry['action'] == 'rebuilt')
+            return rebuilt, len(self._entries) - rebuilt
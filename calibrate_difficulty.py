@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+難易度プリセット（easy / medium / hard）のモンテカルロ調整ツール
+
+index.html の setDifficulty() は aiSpeed, aiReactionDistance, aiErrorRate を手で決めています。
+このスクリプトは game_engine.py のシミュレーターで、AIのパラメータのグリッド上の各点について
+人間らしいプレイヤーモデル（反応の遅れと狙いのずれの大きさが異なる3段階）と多数の試合を行い、
+プレイヤーの勝率・ラリーの長さ・AIのミスの分布を集計します。
+
+- 現在のプリセットの評価と、目標の勝率（基準のプレイヤーモデルに対して）に最も近いパラメータを表示
+- --refine N で、最良の点の周りを刻み幅を半分にしたグリッドで N 回探索し直す（適応的な探索）
+- 試合はプロセスプールで並列に実行し、結果は共有メモリ上の配列に直接書き込む
+- 乱数の種はバッチごとに seed から導出するため、並列数を変えても結果は同じ
+
+使用方法:
+    python calibrate_difficulty.py [--matches 100] [--jobs N] [--refine 1] [--output calibration.json]
+                                   [--speeds 2 3 4 5 6 7] [--reaction-distances 100 200 300 400]
+                                   [--error-rates 0.05 0.3 0.6 1.0 1.5]
+"""
+
+import argparse  # コマンドライン引数の解析用
+import itertools  # グリッドの組み合わせ生成用
+import json      # 結果の保存用
+import os        # CPUコア数の取得用
+import sys       # 終了コード用
+import time      # 処理時間の計測用
+from concurrent.futures import ProcessPoolExecutor  # バッチの並列実行用
+from multiprocessing import shared_memory  # 結果配列の共有用
+
+import numpy as np
+
+import game_engine
+from game_engine import FRAME_RATE, MAX_RALLY_HITS, MISS_BIN_PIXELS, MISS_BINS
+
+# プレイヤーモデル（game_engine.HumanPlayer の設定）。反応の遅れ（フレーム）と狙いのずれ（ピクセル）
+PLAYER_PROFILES = {
+    'novice': {'reaction_frames': 8, 'aim_error': 20},
+    'casual': {'reaction_frames': 6, 'aim_error': 15},
+    'expert': {'reaction_frames': 4, 'aim_error': 10},
+}
+REFERENCE_PROFILE = 'casual'
+
+# 各プリセットで目標とする、基準のプレイヤーモデルの勝率
+DEFAULT_TARGETS = {'easy': 0.7, 'medium': 0.5, 'hard': 0.3}
+
+PARAMETERS = ('ai_speed', 'ai_reaction_distance', 'ai_error_rate')
+
+# 共有メモリ上の結果配列（プレイヤーモデル x パラメータの点 x 追加の次元）
+RESULT_FIELDS = {
+    'matches': (),             # 最後まで行われた試合数
+    'unfinished': (),          # 打ち切った試合数
+    'player_wins': (),         # プレイヤーが勝った試合数
+    'points': (),              # ポイント（ラリー）数
+    'player_points': (),       # プレイヤーの得点数（= AIのミス数）
+    'ticks': (),               # 最後まで行われた試合のフレーム数の合計
+    'rally_histogram': (MAX_RALLY_HITS + 1,),
+    'miss_histogram': (MISS_BINS,),
+}
+
+
+class SharedResults:
+    """
+    全バッチの結果を書き込む共有メモリ上の配列
+
+    1つの共有メモリブロックに RESULT_FIELDS の配列を並べ、各ワーカーは spec で同じブロックを開いて
+    自分のバッチの行だけを書き込みます（行が重ならないためロックは不要）。
+    """
+
+    def __init__(self, spec, create=False):
+        size = sum(np.prod(shape, dtype=np.int64) * 8 for _, shape, _ in spec['layout'])
+        if create:
+            self._shm = shared_memory.SharedMemory(create=True, size=max(int(size), 1))
+            spec = dict(spec, name=self._shm.name)
+        else:
+            self._shm = shared_memory.SharedMemory(name=spec['name'])
+        self.spec = spec
+        self.arrays = {name: np.ndarray(shape, dtype=np.int64, buffer=self._shm.buf, offset=offset)
+                       for name, shape, offset in spec['layout']}
+        if create:
+            for array in self.arrays.values():
+                array.fill(0)
+
+    @classmethod
+    def create(cls, num_profiles, num_configs):
+        """(プレイヤーモデル数, パラメータの点の数) の結果配列を新しく確保"""
+        layout = []
+        offset = 0
+        for name, extra in RESULT_FIELDS.items():
+            shape = (num_profiles, num_configs, *extra)
+            layout.append((name, shape, offset))
+            offset += int(np.prod(shape)) * 8
+        return cls({'layout': layout}, create=True)
+
+    def close(self):
+        """共有メモリを閉じる（配列は使えなくなる）"""
+        self.arrays = {}
+        self._shm.close()
+
+    def unlink(self):
+        """共有メモリを閉じて削除（作成したプロセスで最後に呼ぶ）"""
+        self.close()
+        self._shm.unlink()
+
+
+def _run_batch(spec, profile_index, profile, config_start, configs, matches, seed, max_ticks):
+    """
+    ワーカー：1つのプレイヤーモデルで、連続したパラメータの点 configs のそれぞれ matches 試合を実行
+
+    各試合のAIのパラメータは試合ごとの配列として GameEngine に渡し、まとめて1つのエンジンで進めます。
+    結果は共有メモリの [profile_index, config_start:config_start + len(configs)] に書き込みます。
+
+    Returns:
+        tuple: (ポイント数, シミュレーションしたフレーム数)
+    """
+    configs = np.asarray(configs, dtype=np.float64)
+    count = len(configs)
+    groups = np.repeat(np.arange(count), matches)
+    engine = game_engine.GameEngine(
+        len(groups), player=game_engine.HumanPlayer(**profile), seed=np.random.SeedSequence(seed),
+        groups=groups, **{name: np.repeat(configs[:, index], matches) for index, name in enumerate(PARAMETERS)})
+    engine.run(max_ticks)
+
+    finished = engine.finished
+    results = SharedResults(spec)
+    try:
+        rows = slice(config_start, config_start + count)
+        out = results.arrays
+        out['matches'][profile_index, rows] = np.bincount(groups[finished], minlength=count)
+        out['unfinished'][profile_index, rows] = np.bincount(groups[~finished], minlength=count)
+        out['player_wins'][profile_index, rows] = np.bincount(groups[finished & engine.winner_player],
+                                                              minlength=count)
+        out['ticks'][profile_index, rows] = np.bincount(groups[finished], weights=engine.result_ticks[finished],
+                                                        minlength=count).astype(np.int64)
+        out['rally_histogram'][profile_index, rows] = engine.rally_histogram
+        out['miss_histogram'][profile_index, rows] = engine.ai_miss_histogram
+        out['points'][profile_index, rows] = engine.rally_histogram.sum(axis=1)
+        out['player_points'][profile_index, rows] = engine.ai_miss_histogram.sum(axis=1)
+    finally:
+        results.close()
+    return int(engine.rally_histogram.sum()), engine.total_ticks
+
+
+def evaluate(configs, profiles, matches, jobs=1, seed=0, batch_matches=4000, max_ticks=FRAME_RATE * 60 * 30):
+    """
+    パラメータの点 configs をプレイヤーモデル profiles で評価
+
+    パラメータの点を、1バッチあたり batch_matches 試合程度になるようにまとめてワーカーに渡します。
+
+    Args:
+        configs (list): (ai_speed, ai_reaction_distance, ai_error_rate) のリスト
+        profiles (list): PLAYER_PROFILES のキーのリスト
+        matches (int): 1つの点・プレイヤーモデルあたりの試合数
+        jobs (int): 並列プロセス数（1の場合はこのプロセスで実行）
+        seed (int): 乱数の種
+        batch_matches (int): 1バッチ（1つの GameEngine）で同時に進める試合数の目安
+        max_ticks (int): 1試合の最大フレーム数（超えた試合は打ち切り）
+
+    Returns:
+        tuple: (結果配列の辞書（共有メモリからコピーしたもの）, ポイント数, フレーム数)
+    """
+    per_batch = max(1, batch_matches // matches)
+    results = SharedResults.create(len(profiles), len(configs))
+    tasks = []
+    for profile_index, profile in enumerate(profiles):
+        for start in range(0, len(configs), per_batch):
+            # 乱数の種は (seed, プレイヤーモデル, 点の開始位置) から決めるため、並列数に依存しない
+            tasks.append((results.spec, profile_index, PLAYER_PROFILES[profile], start,
+                          configs[start:start + per_batch], matches, [seed, profile_index, start], max_ticks))
+
+    try:
+        if jobs <= 1 or len(tasks) <= 1:
+            totals = [_run_batch(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+                totals = list(executor.map(_run_batch, *zip(*tasks)))
+        arrays = {name: array.copy() for name, array in results.arrays.items()}
+    finally:
+        results.unlink()
+    return arrays, sum(points for points, _ in totals), sum(ticks for _, ticks in totals)
+
+
+def histogram_percentile(histogram, fraction):
+    """ヒストグラムの fraction（0〜1）分位点のビン番号（空の場合はNone）"""
+    total = histogram.sum()
+    if total == 0:
+        return None
+    return int(np.searchsorted(np.cumsum(histogram), fraction * total))
+
+
+def config_metrics(arrays, profile_index, config_index):
+    """1つのプレイヤーモデル・パラメータの点の集計値（勝率とその95%信頼区間、ラリーの長さ、AIのミス）"""
+    def value(name):
+        return arrays[name][profile_index, config_index]
+
+    matches = int(value('matches'))
+    points = int(value('points'))
+    rally = value('rally_histogram')
+    misses = value('miss_histogram')
+    win_rate = value('player_wins') / matches if matches else None
+    return {
+        'matches': matches,
+        'unfinished': int(value('unfinished')),
+        'player_win_rate': win_rate,
+        'win_rate_ci95': 1.96 * np.sqrt(win_rate * (1 - win_rate) / matches) if matches else None,
+        'mean_match_seconds': value('ticks') / matches / FRAME_RATE if matches else None,
+        'points': points,
+        'mean_rally_hits': float((np.arange(MAX_RALLY_HITS + 1) * rally).sum() / points) if points else None,
+        'rally_hits_p50': histogram_percentile(rally, 0.5),
+        'rally_hits_p90': histogram_percentile(rally, 0.9),
+        'ai_miss_rate': value('player_points') / points if points else None,
+        'miss_distance_p50': (histogram_percentile(misses, 0.5) + 1) * MISS_BIN_PIXELS if misses.sum() else None,
+        'miss_distance_p90': (histogram_percentile(misses, 0.9) + 1) * MISS_BIN_PIXELS if misses.sum() else None,
+        'rally_histogram': rally.tolist(),
+        'miss_histogram': misses.tolist(),
+    }
+
+
+def grid(values):
+    """パラメータごとの値のリストから、全組み合わせの (ai_speed, ai_reaction_distance, ai_error_rate) を作成"""
+    return [tuple(float(v) for v in combination)
+            for combination in itertools.product(*(values[name] for name in PARAMETERS))]
+
+
+def refine_grid(center, steps):
+    """center の周りに、各パラメータを ±step/2 ずらした 3x3x3 の点を作成（負の値は除く）"""
+    axes = [sorted({value - step / 2, value, value + step / 2}) for value, step in zip(center, steps)]
+    return [point for point in itertools.product(*axes) if min(point) >= 0 and point[0] > 0]
+
+
+def closest(metrics, target):
+    """目標の勝率に最も近いパラメータの点（勝率が同じ場合はラリーが長い方）のキーを取得"""
+    return min(metrics, key=lambda key: (abs(metrics[key]['player_win_rate'] - target),
+                                         -(metrics[key]['mean_rally_hits'] or 0)))
+
+
+def format_row(label, config, per_profile, profiles):
+    """1行分の表示（パラメータ、プレイヤーモデルごとの勝率、基準モデルでのラリーとミスの分布）"""
+    reference = per_profile[REFERENCE_PROFILE if REFERENCE_PROFILE in per_profile else profiles[0]]
+    wins = '  '.join(f"{per_profile[name]['player_win_rate']:6.1%}" if per_profile[name]['player_win_rate'] is not None
+                     else f"{'n/a':>6}" for name in profiles)
+    rally = (f"{reference['mean_rally_hits']:5.1f} /{reference['rally_hits_p90']:3d}"
+             if reference['mean_rally_hits'] is not None else f"{'n/a':>10}")
+    misses = (f"{reference['ai_miss_rate']:5.1%}  {reference['miss_distance_p50']:3d}/{reference['miss_distance_p90']:3d}px"
+              if reference['miss_distance_p50'] is not None else f"{'n/a':>5}  {'n/a':>9}")
+    return (f"  {label:<16} {config[0]:5.2f} {config[1]:6.0f} {config[2]:6.3f}   {wins}   {rally}   {misses}")
+
+
+def print_header(profiles):
+    """結果の表の見出し"""
+    names = '  '.join(f'{name:>6}' for name in profiles)
+    print(f"  {'':<16} {'speed':>5} {'react':>6} {'error':>6}   {names}   {'rally mean/p90':>10}   "
+          f"{'AI miss':>5}  {'dist p50/p90':>9}")
+
+
+def main():
+    """Main function to calibrate the difficulty presets."""
+    parser = argparse.ArgumentParser(description='Calibrate the easy/medium/hard AI presets by Monte-Carlo simulation')
+    parser.add_argument('--matches', type=int, default=100,
+                        help='matches per parameter point and player model (default: 100)')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help='number of worker processes (default: all cores)')
+    parser.add_argument('--speeds', type=float, nargs='+', default=[2, 3, 4, 5, 6, 7], help='aiSpeed values')
+    parser.add_argument('--reaction-distances', type=float, nargs='+', default=[100, 200, 300, 400],
+                        help='aiReactionDistance values')
+    parser.add_argument('--error-rates', type=float, nargs='+', default=[0.05, 0.3, 0.6, 1.0, 1.5],
+                        help='aiErrorRate values')
+    parser.add_argument('--profiles', nargs='+', choices=list(PLAYER_PROFILES), default=list(PLAYER_PROFILES),
+                        help='player models to play against')
+    parser.add_argument('--targets', type=float, nargs=3, default=list(DEFAULT_TARGETS.values()),
+                        metavar=('EASY', 'MEDIUM', 'HARD'),
+                        help=f'target player win rates against the {REFERENCE_PROFILE} player (default: 0.7 0.5 0.3)')
+    parser.add_argument('--refine', type=int, default=1,
+                        help='rounds of finer search around the best point for each preset (default: 1)')
+    parser.add_argument('--batch', type=int, default=4000, help='matches simulated together in one batch')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--output', help='save all results as JSON to this file')
+    args = parser.parse_args()
+
+    profiles = args.profiles
+    reference_index = profiles.index(REFERENCE_PROFILE) if REFERENCE_PROFILE in profiles else 0
+    targets = dict(zip(DEFAULT_TARGETS, args.targets))
+    start_time = time.perf_counter()
+    all_metrics = {}
+    totals = [0, 0]
+
+    def run(configs, round_index):
+        """新しい点だけを評価して all_metrics に追加"""
+        configs = [config for config in dict.fromkeys(configs) if config not in all_metrics]
+        if not configs:
+            return
+        arrays, points, ticks = evaluate(configs, profiles, args.matches, args.jobs,
+                                         seed=args.seed + round_index * 1000003, batch_matches=args.batch)
+        totals[0] += points
+        totals[1] += ticks
+        for config_index, config in enumerate(configs):
+            all_metrics[config] = {name: config_metrics(arrays, profile_index, config_index)
+                                   for profile_index, name in enumerate(profiles)}
+
+    presets = {name: tuple(float(game_engine.DIFFICULTY_PRESETS[name][key]) for key in PARAMETERS)
+               for name in game_engine.DIFFICULTY_PRESETS}
+    values = {'ai_speed': args.speeds, 'ai_reaction_distance': args.reaction_distances,
+              'ai_error_rate': args.error_rates}
+    run(list(presets.values()) + grid(values), 0)
+
+    # 基準のプレイヤーモデルでの勝率が目標に最も近い点の周りを、刻み幅を半分にしながら探索し直す
+    reference = profiles[reference_index]
+    steps = [np.min(np.diff(sorted(set(values[name])))) if len(set(values[name])) > 1 else 1.0
+             for name in PARAMETERS]
+    best = {}
+    for round_index in range(args.refine + 1):
+        candidates = {config: metrics[reference] for config, metrics in all_metrics.items()
+                      if metrics[reference]['player_win_rate'] is not None}
+        best = {preset: closest(candidates, target) for preset, target in targets.items()}
+        if round_index == args.refine:
+            break
+        steps = [step / 2 for step in steps]
+        run([point for config in best.values() for point in refine_grid(config, steps)], round_index + 1)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Simulated {totals[0]:,} rallies in {len(all_metrics)} parameter points x {len(profiles)} player models "
+          f"({args.matches} matches each, {totals[1] / FRAME_RATE / 3600:,.0f}h of play) in {elapsed:.1f}s "
+          f"with {args.jobs} jobs")
+    print(f"\nPlayer win rate by player model; rally hits and AI misses against the {reference} player")
+    print_header(profiles)
+    print("  current presets:")
+    for name, config in presets.items():
+        print(format_row(name, config, all_metrics[config], profiles))
+    print(f"  recommended (target win rate against {reference}):")
+    for name, config in best.items():
+        print(format_row(f'{name} ({targets[name]:.0%})', config, all_metrics[config], profiles))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'settings': {key: value for key, value in vars(args).items()},
+                'player_profiles': {name: PLAYER_PROFILES[name] for name in profiles},
+                'presets': {name: dict(zip(PARAMETERS, config)) for name, config in presets.items()},
+                'recommended': {name: dict(zip(PARAMETERS, config)) for name, config in best.items()},
+                'points': [{'params': dict(zip(PARAMETERS, config)), 'results': metrics}
+                           for config, metrics in all_metrics.items()],
+            }, f, ensure_ascii=False, indent=2, default=float)
+        print(f"\nResults saved to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
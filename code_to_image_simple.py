@@ -23,8 +23,123 @@ except ImportError:
     print("Please install it using: pip install pillow")
     sys.exit(1)
 
+import copy  # 画面サイズに合わせた描画設定の複製用
 import os    # ファイルパス操作とファイル存在確認用
 import re    # 正規表現によるコードのトークン解析用
+import time  # 描画時間の計測用
+from collections import OrderedDict  # グリフキャッシュのLRU管理用
+
+# パイプライン全体の計測（profiler.py）。単体のツールとして使う場合は計測しない
+try:
+    from profiler import span
+except ImportError:
+    import contextlib
+
+    def span(name, category='pipeline', **args):
+        return contextlib.nullcontext()
+
+
+# 1枚の画像に収める最大行数（これを超えるファイルはページ単位の画像に分割）
+MAX_LINES_PER_IMAGE = 500
+
+# 拡大キャンバスに一度に描画する行数（帯ごとの描画でメモリ使用量を抑える）
+BAND_LINES = 64
+
+
+class GlyphRunCache:
+    """
+    トークン単位のラスタライズ結果を保持するLRUキャッシュ
+
+    (テキスト, 色, フォントサイズ) をキーに、描画済みのRGBAビットマップと
+    送り幅を保存します。キーワード、インデント、行番号などの繰り返し出現する
+    トークンは、再描画・再計測せずにビットマップの貼り付けだけで描画できます。
+    """
+
+    def __init__(self, max_entries=4096, max_bytes=64 * 1024 * 1024):
+        """
+        Args:
+            max_entries (int): 保持する最大エントリ数（超えると最も古いものから削除）
+            max_bytes (int): 保持するビットマップの合計バイト数の上限
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0      # 保持中のビットマップの合計バイト数
+        self.hits = 0        # キャッシュヒット数
+        self.misses = 0      # キャッシュミス数（新規ラスタライズ数）
+        self.evictions = 0   # LRUにより削除されたエントリ数
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        """キャッシュヒット率（0.0〜1.0）"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, text, color, font, font_size):
+        """
+        トークンのラスタライズ結果を取得（未登録の場合は描画して登録）
+
+        Args:
+            text (str): トークン文字列
+            color (str): 文字色
+            font (ImageFont): 描画に使用するフォント
+            font_size (int): フォントサイズ（キーの一部）
+
+        Returns:
+            tuple: (RGBAビットマップまたはNone, 描画オフセット(x, y), 送り幅)
+        """
+        key = (text, color, font_size)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        entry = self._rasterize(text, color, font)
+        self._entries[key] = entry
+        self._bytes += self._entry_bytes(entry)
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= self._entry_bytes(evicted)
+            self.evictions += 1
+        return entry
+
+    @staticmethod
+    def _entry_bytes(entry):
+        """エントリのビットマップのバイト数（RGBA 4バイト/ピクセル）"""
+        stamp = entry[0]
+        return stamp.width * stamp.height * 4 if stamp is not None else 0
+
+    @staticmethod
+    def _rasterize(text, color, font):
+        """トークンを文字色付きのRGBAビットマップとして描画"""
+        left, top, right, bottom = font.getbbox(text)
+        width, height = right - left, bottom - top
+
+        # 空白のみのトークンは描画せず送り幅だけを使う
+        if width <= 0 or height <= 0:
+            return None, (left, top), right
+
+        mask = Image.new('L', (width, height), 0)
+        ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=font)
+        stamp = Image.new('RGBA', (width, height), color)
+        stamp.putalpha(mask)
+        return stamp, (left, top), right
+
+    def stats(self):
+        """ヒット率などの統計情報を辞書で取得"""
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+        }
 
 
 class SimpleCodeImageGenerator:
@@ -111,7 +226,12 @@ class SimpleCodeImageGenerator:
         'arc', 'moveTo', 'lineTo'                   # Canvas描画
     }
 
-    def __init__(self, theme='dark', font_size=14, line_height_ratio=1.5):
+    # 言語モードごとのコンパイル済みトークン正規表現のキャッシュ
+    # キー: (クラス, 言語モード), 値: (正規表現, グループ名→トークン種別)
+    _token_regex_cache = {}
+
+    def __init__(self, theme='dark', font_size=14, line_height_ratio=1.5, glyph_cache_size=4096,
+                 render_scale=4):
         """
         コードイメージジェネレーターの初期化
 
@@ -119,10 +239,13 @@ class SimpleCodeImageGenerator:
             theme (str): テーマ名（'dark' または 'light'）
             font_size (int): フォントサイズ（ピクセル）
             line_height_ratio (float): 行の高さの倍率（フォントサイズに対する比率）
+            glyph_cache_size (int): グリフキャッシュの最大エントリ数（0でキャッシュ無効）
+            render_scale (int): 描画時の拡大倍率（4: 従来の4倍描画, 2: 2倍描画, 1: 縮小なしの直接描画）
         """
         # 選択されたテーマの色設定を取得（存在しない場合はダークテーマ）
         self.theme = self.THEMES.get(theme, self.THEMES['dark'])
         self.font_size = font_size  # フォントサイズを保存
+        self.line_height_ratio = line_height_ratio
         # 行の高さを計算（フォントサイズ × 倍率）
         self.line_height = int(font_size * line_height_ratio)
 
@@ -134,6 +257,19 @@ class SimpleCodeImageGenerator:
         self.line_number_padding = 15   # 行番号とコードの間隔
         self.line_number_width = 50     # 行番号領域の幅
 
+        # 描画済みトークンのキャッシュ（複数画像の生成間で共有）
+        self.glyph_cache = GlyphRunCache(glyph_cache_size) if glyph_cache_size > 0 else None
+
+        # 描画スケールと、スケールごとに読み込んだフォントのキャッシュ
+        self.render_scale = render_scale
+        self._scaled_fonts = {}
+
+        # 直近の render_image の処理時間・メモリ量
+        self.last_render_stats = None
+
+        # render_to_frame 用に、フォントサイズごとに用意した描画設定
+        self._frame_generators = {}
+
     def _load_font(self):
         """
         等幅フォントの読み込み
@@ -202,174 +338,464 @@ class SimpleCodeImageGenerator:
         bbox = self.font.getbbox(text)
         return bbox[2] - bbox[0], bbox[3] - bbox[1]
 
-    def _tokenize_line(self, line):
-        """Simple tokenizer for HTML/CSS/JavaScript code."""
-        tokens = []
-
-        # Handle empty lines
-        if not line.strip():
-            return [(line, 'default')]
-
-        # Check if entire line is a comment
-        if line.strip().startswith('//') or line.strip().startswith('/*'):
-            return [(line, 'comment')]
+    @classmethod
+    def _token_patterns(cls, language):
+        """
+        言語モードごとのトークンパターン一覧を取得
 
-        # HTML comment
-        if '<!--' in line:
-            return [(line, 'comment')]
+        同じ位置で複数のパターンが一致する場合は、リストの先頭に近いものが優先されます。
 
-        # CSS rule detection
-        in_css = False
-        if '{' in line and (':' in line or 'px' in line or '#' in line):
-            in_css = True
+        Args:
+            language (str): 'css'（CSSルール行）または 'script'（HTML/JavaScript行）
 
-        # Regular expressions for different token types
+        Returns:
+            list: (正規表現, トークン種別) のタプルのリスト
+        """
         patterns = [
             (r'//.*$|/\*.*?\*/', 'comment'),  # Comments
             (r'<!--.*?-->', 'comment'),  # HTML comments
             (r'"[^"]*"|\'[^\']*\'', 'string'),  # Strings
             (r'\b\d+\.?\d*\b', 'number'),  # Numbers
             (r'</?[a-zA-Z][^>]*>', 'tag'),  # HTML tags
-            (r'\b(?:' + '|'.join(self.JS_KEYWORDS) + r')\b', 'keyword'),  # JS Keywords
+            (r'\b(?:' + '|'.join(sorted(cls.JS_KEYWORDS)) + r')\b', 'keyword'),  # JS Keywords
         ]
 
-        if in_css:
+        if language == 'css':
             patterns.extend([
-                (r'\b(?:' + '|'.join(self.CSS_KEYWORDS) + r')\b', 'css_property'),  # CSS properties
+                (r'\b(?:' + '|'.join(sorted(cls.CSS_KEYWORDS)) + r')\b', 'css_property'),  # CSS properties
                 (r'#[0-9a-fA-F]{3,6}', 'css_value'),  # Color values
                 (r'\d+px|\d+%|\d+em', 'css_value'),  # CSS units
             ])
         else:
             patterns.extend([
-                (r'\b(?:' + '|'.join(self.BUILTINS) + r')\b', 'function'),  # Built-ins
+                (r'\b(?:' + '|'.join(sorted(cls.BUILTINS)) + r')\b', 'function'),  # Built-ins
                 (r'\b\w+(?=\s*\()', 'function'),  # Function calls
             ])
 
-        # Tokenize the line
+        return patterns
+
+    @classmethod
+    def _get_token_regex(cls, language):
+        """
+        言語モード用の結合済み正規表現を取得（クラスごとに一度だけコンパイル）
+
+        全パターンを優先順に名前付きグループとして1つの正規表現へ結合します。
+        正規表現の選択（|）は左から順に試行されるため、位置ごとに先頭から
+        パターンを試す従来のループと同じトークンが得られます。
+
+        Args:
+            language (str): 'css' または 'script'
+
+        Returns:
+            tuple: (コンパイル済み正規表現, グループ名からトークン種別への辞書)
+        """
+        cache_key = (cls, language)
+        compiled = cls._token_regex_cache.get(cache_key)
+        if compiled is None:
+            groups = []
+            token_types = {}
+            for index, (pattern, token_type) in enumerate(cls._token_patterns(language)):
+                group_name = f't{index}'
+                groups.append(f'(?P<{group_name}>{pattern})')
+                token_types[group_name] = token_type
+            compiled = (re.compile('|'.join(groups)), token_types)
+            cls._token_regex_cache[cache_key] = compiled
+        return compiled
+
+    def _draw_text(self, img, draw, position, text, color, font, font_size):
+        """
+        テキストを描画し、描画後のx方向の送り幅を返す
+
+        グリフキャッシュが有効な場合はラスタライズ済みのビットマップを貼り付けます。
+
+        Returns:
+            int: テキストの送り幅（ピクセル）
+        """
+        if self.glyph_cache is None:
+            draw.text(position, text, fill=color, font=font)
+            return font.getbbox(text)[2]
+
+        stamp, (left, top), advance = self.glyph_cache.get(text, color, font, font_size)
+        if stamp is not None:
+            img.paste(stamp, (position[0] + left, position[1] + top), stamp)
+        return advance
+
+    def _tokenize_line(self, line):
+        """Simple tokenizer for HTML/CSS/JavaScript code."""
+        # Handle empty lines
+        if not line.strip():
+            return [(line, 'default')]
+
+        # Check if entire line is a comment
+        if line.strip().startswith('//') or line.strip().startswith('/*'):
+            return [(line, 'comment')]
+
+        # HTML comment
+        if '<!--' in line:
+            return [(line, 'comment')]
+
+        # CSS rule detection
+        in_css = '{' in line and (':' in line or 'px' in line or '#' in line)
+        regex, token_types = self._get_token_regex('css' if in_css else 'script')
+
+        # Tokenize the line in a single pass; text between matches becomes one default run
+        tokens = []
         position = 0
-        while position < len(line):
-            matched = False
-
-            for pattern, token_type in patterns:
-                regex = re.compile(pattern)
-                match = regex.match(line, position)
-                if match:
-                    # Add any text before the match as default
-                    if match.start() > position:
-                        tokens.append((line[position:match.start()], 'default'))
-
-                    # Add the matched token
-                    tokens.append((match.group(), token_type))
-                    position = match.end()
-                    matched = True
-                    break
-
-            if not matched:
-                # No pattern matched, add one character as default
-                tokens.append((line[position], 'default'))
-                position += 1
+        for match in regex.finditer(line):
+            if match.start() > position:
+                tokens.append((line[position:match.start()], 'default'))
+            tokens.append((match.group(), token_types[match.lastgroup]))
+            position = match.end()
+
+        if position < len(line):
+            tokens.append((line[position:], 'default'))
 
         return tokens
 
-    def generate_image(self, code, output_path, title=None):
+    def _get_scaled_font(self, scale):
         """
-        ソースコードから画像を生成
+        描画スケールに応じたフォントを取得（スケールごとに一度だけ読み込み）
 
-        指定されたソースコードをシンタックスハイライト付きの画像として生成し、
-        高解像度（4倍スケール）で処理後、最終的に通常解像度で保存します。
+        Args:
+            scale (int): 描画スケール
+
+        Returns:
+            ImageFont: font_size × scale の大きさのフォント
+        """
+        font = self._scaled_fonts.get(scale)
+        if font is None:
+            font = self._load_font_with_size(self.font_size * scale)
+            self._scaled_fonts[scale] = font
+        return font
+
+    def _compute_layout(self, lines, title, columns=None):
+        """
+        画像全体のサイズとコード領域の位置を計算（通常解像度の座標）
 
         Args:
-            code (str): 画像化するソースコード
-            output_path (str): 出力画像ファイルのパス
+            lines (list): コードの行のリスト
             title (str, optional): 画像上部に表示するタイトル
+            columns (int, optional): 画像幅の計算に使う最小桁数
 
         Returns:
-            None（ファイルとして保存）
+            dict: 画像の幅・高さ、コード領域の開始位置と高さ
         """
-        # Split code into lines
-        lines = code.split('\n')
-        num_lines = len(lines)
-
         # Calculate image dimensions
         max_line_length = max(len(line) for line in lines) if lines else 0
+        if columns:
+            max_line_length = max(max_line_length, columns)
         char_width, _ = self._get_text_size('M')
 
         content_width = (max_line_length * char_width) + self.line_number_width + (self.line_number_padding * 2)
-        content_height = num_lines * self.line_height
+        content_height = len(lines) * self.line_height
 
         img_width = content_width + (self.padding * 2)
         img_height = content_height + (self.padding * 2)
 
+        content_top = self.padding
         if title:
             img_height += self.line_height + 10
+            content_top += self.line_height + 10
+
+        return {
+            'width': img_width,
+            'height': img_height,
+            'content_top': content_top,
+            'content_height': content_height,
+        }
+
+    def _band_bounds(self, layout, num_lines, start, end):
+        """行範囲 [start, end) を描画する帯の上端・下端のy座標（通常解像度）を計算"""
+        top = 0 if start == 0 else layout['content_top'] + start * self.line_height
+        bottom = layout['height'] if end >= num_lines else layout['content_top'] + end * self.line_height
+        return top, bottom
+
+    def _render_band(self, lines, layout, title, start, end, first_line_number):
+        """
+        行範囲 [start, end) を含む横帯を render_scale 倍で描画し、通常解像度に縮小して返す
+
+        帯の外にはみ出す図形（タイトル、行番号背景、枠線）はキャンバス外として切り取られるため、
+        帯を縦に並べると画像全体を一度に描画した場合と同じ内容になります。
+        """
+        scale = self.render_scale
+        img_width = layout['width']
+        top, bottom = self._band_bounds(layout, len(lines), start, end)
+        band_height = bottom - top
+
+        # 帯の行を先にまとめてトークンに分割
+        with span('tokenize', 'render', lines=end - start):
+            line_tokens = [self._tokenize_line(lines[i]) for i in range(start, end)]
+
+        with span('draw', 'render', lines=end - start, scale=scale):
+            img = self._draw_band(line_tokens, layout, title, start, top, bottom, first_line_number)
+
+        # Resize back to target resolution with antialiasing
+        if scale != 1:
+            with span('downsample', 'render', scale=scale):
+                img = img.resize((img_width, band_height), Image.Resampling.LANCZOS)
+        return img
+
+    def _draw_band(self, line_tokens, layout, title, start, top, bottom, first_line_number):
+        """トークン分割済みの行 line_tokens（行 start から）を含む横帯 [top, bottom) を render_scale 倍で描画"""
+        scale = self.render_scale
+        img_width = layout['width']
+        img_height = layout['height']
+        band_height = bottom - top
 
         # Create image with higher resolution for better quality
-        scale = 4  # Scale factor for higher resolution (increased from 2 to 4)
-        img = Image.new('RGB', (img_width * scale, img_height * scale), self.theme['background'])
+        img = Image.new('RGB', (img_width * scale, band_height * scale), self.theme['background'])
         draw = ImageDraw.Draw(img)
 
+        # 帯の上端を原点とするためのy方向のずらし量
+        shift = -top * scale
+
         # Create scaled font
-        scaled_font = self._load_font_with_size(self.font_size * scale)
+        scaled_size = self.font_size * scale
+        scaled_font = self._get_scaled_font(scale)
 
         # Draw title if provided
-        y_offset = self.padding * scale
-        if title:
+        if title and top < layout['content_top']:
             title_color = self.theme['default_text']
-            draw.text((self.padding * scale, y_offset), title, fill=title_color, font=scaled_font)
-            y_offset += (self.line_height + 10) * scale
+            self._draw_text(img, draw, (self.padding * scale, self.padding * scale + shift), title,
+                            title_color, scaled_font, scaled_size)
+        y_offset = layout['content_top'] * scale + shift
 
         # Draw line numbers background
         line_num_bg_x1 = self.padding * scale
         line_num_bg_x2 = (self.padding + self.line_number_width) * scale
         draw.rectangle(
-            [line_num_bg_x1, y_offset, line_num_bg_x2, y_offset + (content_height * scale)],
+            [line_num_bg_x1, y_offset, line_num_bg_x2, y_offset + (layout['content_height'] * scale)],
             fill=self.theme['line_number_bg']
         )
 
         # Process each line
-        for i, line in enumerate(lines):
+        for i, tokens in enumerate(line_tokens, start):
             line_y = y_offset + (i * self.line_height * scale)
 
             # Draw line number
-            line_num = str(i + 1).rjust(3)
-            draw.text(
+            line_num = str(i + first_line_number).rjust(3)
+            self._draw_text(
+                img, draw,
                 ((self.padding + 5) * scale, line_y),
                 line_num,
-                fill=self.theme['line_number_fg'],
-                font=scaled_font
+                self.theme['line_number_fg'],
+                scaled_font,
+                scaled_size
             )
 
             # Draw code line with syntax highlighting
             x_offset = (self.padding + self.line_number_width + self.line_number_padding) * scale
 
-            # Tokenize and draw the line
-            tokens = self._tokenize_line(line)
+            # Draw the tokens of the line
             for token_text, token_type in tokens:
                 color = self.theme.get(token_type, self.theme['default_text'])
-                draw.text(
+                x_offset += self._draw_text(
+                    img, draw,
                     (x_offset, line_y),
                     token_text,
-                    fill=color,
-                    font=scaled_font
+                    color,
+                    scaled_font,
+                    scaled_size
                 )
-                text_width = scaled_font.getbbox(token_text)[2]
-                x_offset += text_width
 
         # Add a subtle border
         border_color = '#333333' if 'dark' in str(self.theme) else '#cccccc'
         draw.rectangle(
-            [0, 0, (img_width * scale) - 1, (img_height * scale) - 1],
+            [0, shift, (img_width * scale) - 1, (img_height * scale) - 1 + shift],
             outline=border_color,
             width=scale
         )
+        return img
 
-        # Resize back to target resolution with antialiasing
-        img = img.resize((img_width, img_height), Image.Resampling.LANCZOS)
+    def render_image(self, code, title=None, band_lines=None, first_line_number=1, columns=None):
+        """
+        ソースコードから画像を生成してImageオブジェクトとして返す
+
+        render_scale 倍の解像度で描画後、LANCZOSで通常解像度に縮小します。
+        render_scale が1の場合は縮小せず、FreeTypeのヒンティング付き
+        アンチエイリアス描画の結果をそのまま使用します。
+        band_lines を指定すると band_lines 行ずつの横帯に分けて拡大描画・縮小するため、
+        拡大キャンバスのメモリ量はファイルの行数に関係なく帯1つ分に抑えられます。
+        処理時間とキャンバスのメモリ量は last_render_stats に記録されます。
+
+        Args:
+            code (str): 画像化するソースコード
+            title (str, optional): 画像上部に表示するタイトル
+            band_lines (int, optional): 1回に拡大描画する行数（Noneの場合は全体を一度に描画）
+            first_line_number (int): 先頭行に表示する行番号
+            columns (int, optional): 画像幅の計算に使う最小桁数
+
+        Returns:
+            Image: 生成された画像
+        """
+        start_time = time.perf_counter()
+
+        # Split code into lines
+        lines = code.split('\n')
+        num_lines = len(lines)
+        layout = self._compute_layout(lines, title, columns)
+        scale = self.render_scale
+
+        if not band_lines or band_lines >= num_lines:
+            img = self._render_band(lines, layout, title, 0, num_lines, first_line_number)
+            canvas_bytes = layout['width'] * scale * layout['height'] * scale * 3
+        else:
+            # 帯ごとに描画・縮小し、通常解像度の出力画像に順次貼り付ける
+            img = Image.new('RGB', (layout['width'], layout['height']), self.theme['background'])
+            max_band_height = 0
+            for start in range(0, num_lines, band_lines):
+                end = min(start + band_lines, num_lines)
+                top, bottom = self._band_bounds(layout, num_lines, start, end)
+                max_band_height = max(max_band_height, bottom - top)
+                img.paste(self._render_band(lines, layout, title, start, end, first_line_number), (0, top))
+            # 出力画像と拡大キャンバス1帯分（RGB 3バイト/ピクセル）
+            canvas_bytes = (layout['width'] * layout['height']
+                            + layout['width'] * scale * max_band_height * scale) * 3
+
+        # 処理時間とキャンバスのメモリ量を記録
+        self.last_render_stats = {
+            'scale': scale,
+            'width': layout['width'],
+            'height': layout['height'],
+            'canvas_bytes': canvas_bytes,
+            'seconds': time.perf_counter() - start_time,
+        }
+        return img
+
+    def _frame_generator(self, font_size):
+        """
+        フォントサイズを変えた描画設定を取得（フォントサイズごとに一度だけ作成）
+
+        余白・行番号領域の幅もフォントサイズと同じ比率で拡大縮小するため、
+        出来上がる画像は元の設定で描画した画像を拡大縮小したものと同じレイアウトになります。
+        グリフキャッシュはフォントサイズをキーに含むため、元の設定と共有します。
+        """
+        generator = self._frame_generators.get(font_size)
+        if generator is None:
+            zoom = font_size / self.font_size
+            generator = copy.copy(self)
+            generator.font_size = font_size
+            generator.line_height = int(font_size * self.line_height_ratio)
+            generator.font = generator._load_font()
+            generator.padding = round(self.padding * zoom)
+            generator.line_number_padding = round(self.line_number_padding * zoom)
+            generator.line_number_width = round(self.line_number_width * zoom)
+            # 拡大描画時の文字の大きさ（フォントサイズ × 描画倍率）が元の設定を超えないよう、
+            # 大きなフォントでは描画倍率を下げる
+            generator.render_scale = max(1, min(self.render_scale, round(self.render_scale / zoom)))
+            generator._scaled_fonts = {}
+            generator._frame_generators = {}
+            self._frame_generators[font_size] = generator
+        return generator
+
+    def render_to_frame(self, code, frame_size=(1920, 1080), title=None, background=None, fill_ratio=0.9,
+                        band_lines=None, first_line_number=1, columns=None):
+        """
+        画面サイズのフレームに収まるフォントサイズで描画し、背景の中央に配置した画像を返す
+
+        通常サイズで描画した画像を後から縮小する代わりに、フレームの fill_ratio に収まる
+        最大のフォントサイズ（余白などもフォントサイズに比例）を求めて、最初からその大きさで描画します。
+        拡大描画からの縮小1回だけで済むため、2回目のリサンプリングによる文字のぼけと処理時間を省けます。
+
+        Args:
+            code (str): 画像化するソースコード
+            frame_size (tuple): フレームの (幅, 高さ)
+            title (str, optional): 画像上部に表示するタイトル
+            background (str, optional): フレームの余白の色（Noneの場合はテーマの背景色）
+            fill_ratio (float): コード画像がフレームに占める最大の割合
+            band_lines (int, optional): 1回に拡大描画する行数
+            first_line_number (int): 先頭行に表示する行番号
+            columns (int, optional): 画像幅の計算に使う最小桁数
+
+        Returns:
+            Image: frame_size の大きさのRGB画像
+        """
+        frame_width, frame_height = frame_size
+        max_width = frame_width * fill_ratio
+        max_height = frame_height * fill_ratio
+        lines = code.split('\n')
+
+        # 元の設定でのレイアウトから倍率を見積もり、収まるまでフォントサイズを下げる
+        layout = self._compute_layout(lines, title, columns)
+        zoom = min(max_width / layout['width'], max_height / layout['height'])
+        font_size = max(1, int(self.font_size * zoom) + 1)
+        while True:
+            generator = self._frame_generator(font_size)
+            layout = generator._compute_layout(lines, title, columns)
+            if font_size == 1 or (layout['width'] <= max_width and layout['height'] <= max_height):
+                break
+            font_size -= 1
+
+        img = generator.render_image(code, title=title, band_lines=band_lines,
+                                     first_line_number=first_line_number, columns=columns)
+        frame = Image.new('RGB', frame_size, background or self.theme['background'])
+        offset = ((frame_width - img.width) // 2, (frame_height - img.height) // 2)
+        frame.paste(img, offset)
+
+        # 行の位置をフレーム上で求められるよう、配置位置と行のレイアウトも記録
+        self.last_render_stats = dict(generator.last_render_stats, font_size=font_size, frame_size=frame_size,
+                                      image_offset=offset, content_top=layout['content_top'],
+                                      line_height=generator.line_height, padding=generator.padding)
+        return frame
+
+    def generate_image(self, code, output_path, title=None, band_lines=None):
+        """
+        ソースコードから画像を生成
+
+        指定されたソースコードをシンタックスハイライト付きの画像として生成し、
+        高解像度（render_scale 倍、既定は4倍）で処理後、最終的に通常解像度で保存します。
+
+        Args:
+            code (str): 画像化するソースコード
+            output_path (str): 出力画像ファイルのパス
+            title (str, optional): 画像上部に表示するタイトル
+            band_lines (int, optional): 1回に拡大描画する行数（Noneの場合は全体を一度に描画）
+
+        Returns:
+            None（ファイルとして保存）
+        """
+        img = self.render_image(code, title=title, band_lines=band_lines)
 
         # Save image with higher quality
-        img.save(output_path, quality=100, dpi=(600, 600))
+        with span('save', 'render'):
+            img.save(output_path, quality=100, dpi=(600, 600))
         print(f"Image saved to: {output_path}")
 
+    def generate_pages(self, code, output_pattern, title=None, lines_per_page=200, band_lines=None):
+        """
+        長いソースコードをページ単位の画像に分割して生成
+
+        ページごとに描画・保存して破棄するため、メモリ使用量はファイル全体の
+        行数ではなくページ1枚分で決まります。行番号はファイル全体の通し番号で、
+        画像の幅は全ページで揃えられます。
+
+        Args:
+            code (str): 画像化するソースコード
+            output_pattern (str): 出力パスの書式（例: 'out_p{page:03d}.png'）
+            title (str, optional): 各ページ上部に表示するタイトル（ページ番号が付加されます）
+            lines_per_page (int): 1ページあたりの行数
+            band_lines (int, optional): 1回に拡大描画する行数
+
+        Returns:
+            list: 生成した画像ファイルのパスのリスト
+        """
+        lines = code.split('\n')
+        columns = max(len(line) for line in lines) if lines else 0
+        num_pages = (len(lines) + lines_per_page - 1) // lines_per_page
+
+        output_paths = []
+        for page, start in enumerate(range(0, len(lines), lines_per_page), 1):
+            page_code = '\n'.join(lines[start:start + lines_per_page])
+            page_title = f"{title} ({page}/{num_pages})" if title else None
+            img = self.render_image(page_code, title=page_title, band_lines=band_lines,
+                                    first_line_number=start + 1, columns=columns)
+
+            output_path = output_pattern.format(page=page)
+            img.save(output_path, quality=100, dpi=(600, 600))
+            print(f"Image saved to: {output_path}")
+            output_paths.append(output_path)
+        return output_paths
+
 
 def main():
     """Main function to convert HTML files to images."""
@@ -403,12 +829,34 @@ def main():
     generator_dark = SimpleCodeImageGenerator(theme='dark', font_size=14)
     generator_light = SimpleCodeImageGenerator(theme='light', font_size=14)
 
+    # 長いファイルはページ単位の画像に分割してメモリ使用量を抑える
+    if code.count('\n') + 1 > MAX_LINES_PER_IMAGE:
+        outputs_dark = generator_dark.generate_pages(
+            code,
+            f'{base_name}_dark_simple_p{{page:03d}}.png',
+            title=f'{os.path.basename(input_file)} - Dark Theme',
+            lines_per_page=MAX_LINES_PER_IMAGE,
+            band_lines=BAND_LINES
+        )
+        outputs_light = generator_light.generate_pages(
+            code,
+            f'{base_name}_light_simple_p{{page:03d}}.png',
+            title=f'{os.path.basename(input_file)} - Light Theme',
+            lines_per_page=MAX_LINES_PER_IMAGE,
+            band_lines=BAND_LINES
+        )
+        print(f"\nSuccessfully generated:")
+        print(f"  - Dark theme: {len(outputs_dark)} pages ({outputs_dark[0]} ...)")
+        print(f"  - Light theme: {len(outputs_light)} pages ({outputs_light[0]} ...)")
+        return
+
     # Generate dark theme image
     output_dark = f'{base_name}_dark_simple.png'
     generator_dark.generate_image(
         code,
         output_dark,
-        title=f'{os.path.basename(input_file)} - Dark Theme'
+        title=f'{os.path.basename(input_file)} - Dark Theme',
+        band_lines=BAND_LINES
     )
 
     # Generate light theme image
@@ -416,7 +864,8 @@ def main():
     generator_light.generate_image(
         code,
         output_light,
-        title=f'{os.path.basename(input_file)} - Light Theme'
+        title=f'{os.path.basename(input_file)} - Light Theme',
+        band_lines=BAND_LINES
     )
 
     print(f"\nSuccessfully generated:")
@@ -7,13 +7,30 @@
 
 機能:
 - 各シーンごとの動画セグメント作成
-- 音声同期での静止画表示
+- 音声同期での静止画表示（表示時間は音声ファイルの長さから自動計算）
 - 高品質H.264エンコーディング
 - 全セグメントの結合
+- 画像・音声が前回と同じセグメントの再利用（build_cache.py のマニフェストで判定）
+
+エンコード方式:
+- segments:    シーンごとにセグメントを作成してから結合（既定。変更のないセグメントを再利用できる）
+- single-pass: 全シーンの画像と音声を1回のffmpegに入力し、concatフィルターで一度にエンコード
+
+使用方法:
+    python create_video.py [--mode segments|single-pass] [--jobs N] [--profile still|standard]
 """
 
+import argparse    # コマンドライン引数の解析用
+import contextlib  # パイプが閉じられたときの例外の抑制用
 import subprocess  # ffmpegコマンド実行用
 import os          # ファイル操作とディレクトリ管理用
+import sys         # 終了コード用
+import tempfile    # ffmpegのエラー出力の一時保存用
+import time        # エンコード時間の計測用
+from concurrent.futures import ThreadPoolExecutor, as_completed  # セグメントの並列エンコード用
+from audio_durations import probe_durations  # 音声の長さの一括取得用
+from build_cache import CACHE_DIR, BuildCache, content_key, hash_file  # 差分ビルド用
+from profiler import span  # 処理時間の計測用
 
 # 動画出力設定
 output_video = "tennis_game_tutorial.mp4"  # 最終出力ファイル名
@@ -21,23 +38,34 @@ resolution = "1920x1080"                    # フルHD解像度
 fps = 30                                    # フレームレート（秒間30フレーム）
 video_codec = "libx264"                     # H.264ビデオコーデック
 audio_codec = "aac"                         # AACオーディオコーデック
+audio_bitrate = "192k"                      # 音声ビットレート
+
+# エンコードプロファイル
+# standard: 入力画像をそのまま毎フレーム読み込んでエンコード（従来の設定）
+# still:    静止画スライド向け。入力画像は1fpsで読み込み（出力は fps のままにしてプレーヤー互換を維持）、
+#           GOPを10秒に延ばしてシーンカット検出を無効にし、同じフレームが続く映像の符号化を軽くする
+ENCODE_PROFILES = {
+    'standard': {'input_framerate': None, 'preset': None, 'gop': None},
+    'still': {'input_framerate': 1, 'preset': 'veryfast', 'gop': fps * 10},
+}
+DEFAULT_PROFILE = 'still'
 
 # シーン定義：各セクションの表示時間設定
-# ナレーション音声の長さに基づいて推定された表示時間
-# duration: メイン表示時間（秒）, gap: シーン間の無音間隔（秒）
+# メイン表示時間はナレーション音声の長さ（audio/durations.json にキャッシュ）から自動で決まる
+# gap: ナレーション終了後の無音間隔（秒）
 scenes = [
-    {'id': 'scene01', 'duration': 12.0, 'gap': 1.0},  # HTML構造とメタデータ
-    {'id': 'scene02', 'duration': 15.0, 'gap': 1.0},  # CSSスタイル
-    {'id': 'scene03', 'duration': 10.0, 'gap': 1.0},  # HTML本体
-    {'id': 'scene04', 'duration': 12.0, 'gap': 1.0},  # JavaScript初期設定
-    {'id': 'scene05', 'duration': 18.0, 'gap': 1.0},  # ゲームオブジェクト
-    {'id': 'scene06', 'duration': 15.0, 'gap': 1.0},  # 描画関数
-    {'id': 'scene07', 'duration': 20.0, 'gap': 1.0},  # AI制御システム
-    {'id': 'scene08', 'duration': 25.0, 'gap': 1.0},  # プレイヤー制御とボール物理
-    {'id': 'scene09', 'duration': 15.0, 'gap': 1.0},  # スコア管理
-    {'id': 'scene10', 'duration': 12.0, 'gap': 1.0},  # メインループと描画
-    {'id': 'scene11', 'duration': 12.0, 'gap': 1.0},  # キーボード入力処理
-    {'id': 'scene12', 'duration': 18.0, 'gap': 0.0},  # 難易度設定（最後なので無音なし）
+    {'id': 'scene01', 'gap': 1.0},  # HTML構造とメタデータ
+    {'id': 'scene02', 'gap': 1.0},  # CSSスタイル
+    {'id': 'scene03', 'gap': 1.0},  # HTML本体
+    {'id': 'scene04', 'gap': 1.0},  # JavaScript初期設定
+    {'id': 'scene05', 'gap': 1.0},  # ゲームオブジェクト
+    {'id': 'scene06', 'gap': 1.0},  # 描画関数
+    {'id': 'scene07', 'gap': 1.0},  # AI制御システム
+    {'id': 'scene08', 'gap': 1.0},  # プレイヤー制御とボール物理
+    {'id': 'scene09', 'gap': 1.0},  # スコア管理
+    {'id': 'scene10', 'gap': 1.0},  # メインループと描画
+    {'id': 'scene11', 'gap': 1.0},  # キーボード入力処理
+    {'id': 'scene12', 'gap': 0.0},  # 難易度設定（最後なので無音なし）
 ]
 
 # Scene name mapping
@@ -56,96 +84,435 @@ scene_names = {
     'scene12': 'difficulty_start'
 }
 
-# Create a temporary directory for intermediate files
+# Temporary directory for intermediate files
 temp_dir = "temp_video_files"
-os.makedirs(temp_dir, exist_ok=True)
 
-print("Creating video segments for each scene...")
-print(f"Target resolution: {resolution}")
-print(f"Frame rate: {fps} fps")
-print(f"Video codec: {video_codec}")
-print(f"Audio codec: {audio_codec}")
+# 動画セグメントの保存先（キャッシュキーをファイル名に含めて実行間で再利用）
+# 実際にはこの下に、作成するスクリプト・出力動画・プロファイルごとのディレクトリ（segments_dir()）を作る
+segment_dir = os.path.join(CACHE_DIR, 'segments')
+
+# このスクリプト自身のセグメントの保存先の名前（create_video / create_video_resized）
+SEGMENT_PRODUCER = os.path.splitext(os.path.basename(__file__))[0]
+
+
+def collect_scenes():
+    """
+    画像・音声ファイルと表示時間をシーンごとにまとめる
+
+    全シーンの音声の長さを一括で取得し、画像または音声が欠けているシーンは
+    エラーを表示して除外します。
+
+    Returns:
+        list: シーン順の辞書（id, image, audio, duration, gap, total_duration, source_key）のリスト
+    """
+    # 全シーンの音声の長さを一括で取得（変更のないファイルはインデックスの値を使用）
+    audio_durations = probe_durations([f"audio/{scene['id']}_narration.mp3" for scene in scenes])
+
+    items = []
+    for scene in scenes:
+        scene_id = scene['id']
+
+        # Find the correct image file
+        scene_name = scene_names.get(scene_id, 'unknown')
+        image_file = f"pic_resized/{scene_id}_{scene_name}.png"
+
+        # Check if image file exists
+        if not os.path.exists(image_file):
+            print(f"  ✗ Error: Image file {image_file} not found")
+            continue
+
+        audio_file = f"audio/{scene_id}_narration.mp3"
+
+        # Check if audio file exists
+        if not os.path.exists(audio_file):
+            print(f"  ✗ Error: Audio file {audio_file} not found")
+            continue
 
-# Process each scene
-for i, scene in enumerate(scenes):
-    scene_id = scene['id']
-    duration = scene['duration']
-    gap = scene['gap']
-    total_duration = duration + gap
+        if audio_file not in audio_durations:
+            print(f"  ✗ Error: Unable to get duration of {audio_file}")
+            continue
 
-    print(f"\nProcessing {scene_id}...")
+        # ナレーションの長さ + 無音間隔をセグメントの長さにする
+        duration = audio_durations[audio_file]
+        items.append({
+            'id': scene_id,
+            'image': image_file,
+            'audio': audio_file,
+            'duration': duration,
+            'gap': scene['gap'],
+            'total_duration': round(duration + scene['gap'], 3),
+            'source_key': hash_file(image_file),
+        })
+    return items
 
-    # Find the correct image file
-    scene_name = scene_names.get(scene_id, 'unknown')
-    image_file = f"pic_resized/{scene_id}_{scene_name}.png"
 
-    # Check if image file exists
-    if not os.path.exists(image_file):
-        print(f"  ✗ Error: Image file {image_file} not found")
-        continue
+def encode_settings(profile=DEFAULT_PROFILE):
+    """キャッシュキーに含めるエンコード設定"""
+    return [resolution, fps, video_codec, audio_codec, audio_bitrate, ENCODE_PROFILES[profile]]
 
-    audio_file = f"audio/{scene_id}_narration.mp3"
 
-    # Check if audio file exists
-    if not os.path.exists(audio_file):
-        print(f"  ✗ Error: Audio file {audio_file} not found")
-        continue
+def video_codec_args(profile=DEFAULT_PROFILE):
+    """プロファイルに応じた映像エンコーダーのオプション"""
+    settings = ENCODE_PROFILES[profile]
+    args = ['-c:v', video_codec, '-tune', 'stillimage']
+    if settings['preset']:
+        args += ['-preset', settings['preset']]
+    if settings['gop']:
+        args += ['-g', str(settings['gop']), '-x264-params', 'scenecut=0']
+    return args
 
-    video_segment = f"{temp_dir}/{scene_id}_video.mp4"
 
-    # Create video segment with audio
-    cmd = [
+def segment_command(item, video_segment, threads=0, profile=DEFAULT_PROFILE):
+    """
+    1シーン分の動画セグメントを作成するffmpegコマンド（threads: libx264のスレッド数、0は自動）
+
+    item に image がない場合は、render() が返すRGBの生データ1フレーム（frame_size の大きさ）を
+    標準入力から受け取り、loopフィルターで繰り返して静止画として使います。
+    render の代わりに frames がある場合は、frames() が返すフレームの列を fps のまま動画として受け取ります。
+    """
+    input_framerate = ENCODE_PROFILES[profile]['input_framerate']
+    if 'image' in item:
+        video_input = [
+            '-loop', '1',
+            *(['-framerate', str(input_framerate)] if input_framerate else []),
+            '-i', item['image'],
+        ]
+    else:
+        video_input = [
+            '-f', 'rawvideo',
+            '-pix_fmt', 'rgb24',
+            '-s', item['frame_size'],
+            '-framerate', str(fps if 'frames' in item else input_framerate or fps),
+            '-i', '-',
+        ]
+    return [
         'ffmpeg',
-        '-loop', '1',
-        '-i', image_file,
-        '-i', audio_file,
-        '-c:v', video_codec,
-        '-tune', 'stillimage',
+        *video_input,
+        '-i', item['audio'],
+        *(['-vf', 'loop=loop=-1:size=1'] if 'render' in item else []),
+        '-af', 'apad',  # 音声の後ろを無音で埋めて、無音間隔の分まで映像を続ける
+        *video_codec_args(profile),
+        '-threads', str(threads),
         '-c:a', audio_codec,
-        '-b:a', '192k',
+        '-b:a', audio_bitrate,
         '-pix_fmt', 'yuv420p',
         '-s', resolution,
         '-r', str(fps),
-        '-t', str(total_duration),
-        '-shortest',
+        '-t', str(item['total_duration']),
         video_segment,
         '-y'
     ]
 
+
+def stream_frames(cmd, frames):
+    """
+    フレームの列を順にffmpegの標準入力に書き込んで実行
+
+    失敗した場合は subprocess.run(check=True) と同じく、stderr を持つ CalledProcessError を送出します。
+    フレームの作成中に例外が発生した場合は、途中までの映像で動画を完成させないよう ffmpeg を終了してから送出します。
+    ffmpegの出力が詰まらないよう、stderr は一時ファイルに受けます。
+    """
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr)
+        try:
+            for frame in frames:
+                process.stdin.write(frame)
+        except BrokenPipeError:
+            # ffmpegが先に終了した（-t の長さに達した場合を含む。成否は終了コードで判定）
+            pass
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            with contextlib.suppress(BrokenPipeError):
+                process.stdin.close()
+            process.wait()
+        if process.returncode != 0:
+            stderr.seek(0)
+            raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr.read())
+
+
+def encode_segment(item, video_segment, threads=0, profile=DEFAULT_PROFILE):
+    """
+    1シーン分の動画セグメントをエンコード
+
+    ffmpegの失敗、ffmpegが見つからない場合、フレームの描画（render / frames）の失敗はいずれも
+    例外を送出せずに失敗として返し、書きかけのセグメントは削除します。
+
+    Returns:
+        tuple: (成功した場合True, 処理時間（秒）, 失敗時のエラーメッセージ)
+    """
+    start_time = time.perf_counter()
     try:
-        subprocess.run(cmd, check=True, capture_output=True)
-        print(f"  ✓ Created video segment: {video_segment}")
-        print(f"  Duration: {total_duration:.1f}s (content: {duration:.1f}s, gap: {gap:.1f}s)")
+        cmd = segment_command(item, video_segment, threads, profile)
+        if 'frames' in item:
+            with span('encode', 'video', scene=item['id'], duration=item['total_duration'], animated=True):
+                stream_frames(cmd, item['frames']())
+        else:
+            frame = item['render']() if 'render' in item else None
+            with span('encode', 'video', scene=item['id'], duration=item['total_duration']):
+                subprocess.run(cmd, input=frame, check=True, capture_output=True)
+        return True, time.perf_counter() - start_time, None
     except subprocess.CalledProcessError as e:
-        print(f"  ✗ Error creating video segment: {e}")
-        print(f"    stderr: {e.stderr.decode()}")
-        continue
+        error = f"{e}\n    stderr: {e.stderr.decode()}"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    if os.path.exists(video_segment):
+        os.remove(video_segment)
+    return False, time.perf_counter() - start_time, error
 
-# Create concat file
-concat_file = f"{temp_dir}/concat.txt"
-with open(concat_file, 'w') as f:
-    for scene in scenes:
-        video_file = f"{temp_dir}/{scene['id']}_video.mp4"
-        if os.path.exists(video_file):
+
+def segments_dir(producer, output=output_video, profile=DEFAULT_PROFILE):
+    """
+    セグメントの保存先ディレクトリ（producer: セグメントを作成するスクリプトの名前）
+
+    prune_segments() はディレクトリ内の今回使わないセグメントを削除するため、
+    画像の入力元やエンコード設定の異なるスクリプト・プロファイル同士が互いのセグメントを消さないよう、
+    作成するスクリプト・出力動画・プロファイルごとにディレクトリを分けます。
+    """
+    stem = os.path.splitext(os.path.basename(output))[0]
+    return os.path.join(segment_dir, f"{producer}-{stem}-{profile}")
+
+
+def segment_plan(item, segments_path, profile=DEFAULT_PROFILE):
+    """
+    1シーン分のセグメントのパスとキャッシュキー
+
+    キーは画像（source_key）・音声・長さ・エンコード設定から計算し、パスにも含めます。
+
+    Returns:
+        tuple: (セグメントのパス, キャッシュキー)
+    """
+    key = content_key('segment', item['source_key'], hash_file(item['audio']),
+                      item['total_duration'], *encode_settings(profile))
+    return f"{segments_path}/{item['id']}_{key[:16]}.mp4", key
+
+
+def prune_segments(segment_files, cache, segments_path):
+    """segments_path の中の、今回使用しない古いセグメントを削除"""
+    for file in os.listdir(segments_path):
+        path = f"{segments_path}/{file}"
+        if path not in segment_files:
+            os.remove(path)
+            cache.forget(path)
+
+
+def encode_segments(items, output, cache, segments_path=None, jobs=1, profile=DEFAULT_PROFILE):
+    """
+    シーンごとに動画セグメントを作成してから結合（2段階方式）
+
+    画像・音声・エンコード設定が前回と同じセグメントは再利用し、
+    全セグメントが前回と同じ場合は結合もスキップします。
+    再作成が必要なセグメントは jobs 個ずつ並列にエンコードし、長いシーンから順に開始します
+    （最後に長いシーンが1つだけ残って待ち時間が延びるのを防ぐため）。
+    コア数を超えないよう、各ffmpegのlibx264スレッド数は コア数 / jobs に制限します。
+    1つでもセグメントの作成に失敗した場合は結合しません。
+
+    Args:
+        items (list): collect_scenes() の戻り値
+        output (str): 出力動画ファイルのパス
+        cache (BuildCache): ビルドキャッシュ
+        segments_path (str, optional): セグメントの保存先ディレクトリ
+                                       （省略時はこのスクリプトの segments_dir()）
+        jobs (int): 同時に実行するffmpegの数
+        profile (str): エンコードプロファイル（ENCODE_PROFILES のキー）
+
+    Returns:
+        bool: 出力動画を作成（または再利用）できた場合True
+    """
+    segments_path = segments_path or segments_dir(SEGMENT_PRODUCER, output, profile)
+    os.makedirs(segments_path, exist_ok=True)
+    segment_keys = []
+    segment_files = []
+    stale = []
+
+    for item in items:
+        video_segment, key = segment_plan(item, segments_path, profile)
+        segment_keys.append(key)
+        segment_files.append(video_segment)
+
+        fresh, reason = cache.check(video_segment, key)
+        if fresh:
+            print(f"  ✓ Reusing video segment: {video_segment} ({reason})")
+            cache.record(video_segment, key, rebuilt=False, reason=reason)
+        else:
+            stale.append((item, video_segment, key, reason))
+
+    prune_segments(segment_files, cache, segments_path)
+
+    # 長いシーンから順にエンコード（Longest Job First）
+    stale.sort(key=lambda entry: entry[0]['total_duration'], reverse=True)
+    jobs = max(1, min(jobs, len(stale)))
+    threads = max(1, (os.cpu_count() or 1) // jobs)
+    if stale:
+        print(f"\nEncoding {len(stale)} segments ({jobs} parallel, {threads} threads each)...")
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(encode_segment, entry[0], entry[1], threads, profile): entry
+            for entry in stale
+        }
+        for future in as_completed(futures):
+            item, video_segment, key, reason = futures[future]
+            ok, seconds, error = future.result()
+            if ok:
+                print(f"  ✓ Created video segment: {video_segment}")
+                print(f"    Duration: {item['total_duration']:.1f}s "
+                      f"(content: {item['duration']:.1f}s, gap: {item['gap']:.1f}s), "
+                      f"encoded in {seconds:.1f}s ({item['total_duration'] / seconds:.1f}x realtime)")
+                cache.record(video_segment, key, rebuilt=True, reason=reason)
+            else:
+                print(f"  ✗ Error creating video segment {video_segment}: {error}")
+                cache.forget(video_segment)
+                failed.append(item['id'])
+
+    if failed:
+        print(f"\n✗ Not concatenating: {len(failed)} segment(s) failed ({', '.join(sorted(failed))})")
+        cache.forget(output)
+        return False
+
+    return concat_segments(segment_files, segment_keys, output, cache)
+
+
+def concat_segments(segment_files, segment_keys, output, cache):
+    """
+    作成済みのセグメントを再エンコードせずに結合
+
+    全セグメントが前回と同じ場合は結合もスキップします。
+
+    Args:
+        segment_files (list): シーン順のセグメントのパス
+        segment_keys (list): シーン順のセグメントのキャッシュキー
+        output (str): 出力動画ファイルのパス
+        cache (BuildCache): ビルドキャッシュ
+
+    Returns:
+        bool: 出力動画を作成（または再利用）できた場合True
+    """
+    # 全セグメントが前回と同じ場合は結合もスキップ
+    video_key = content_key('video', segment_keys)
+    video_fresh, video_reason = cache.check(output, video_key)
+    if video_fresh:
+        print(f"\n✓ Video is up to date: {output}")
+        cache.record(output, video_key, rebuilt=False, reason=video_reason)
+        return True
+
+    # Create concat file
+    os.makedirs(temp_dir, exist_ok=True)
+    concat_file = f"{temp_dir}/concat.txt"
+    with open(concat_file, 'w') as f:
+        for video_file in segment_files:
             f.write(f"file '{os.path.abspath(video_file)}'\n")
 
-print(f"\nConcatenating all video segments...")
-
-# Concatenate all videos
-concat_cmd = [
-    'ffmpeg',
-    '-f', 'concat',
-    '-safe', '0',
-    '-i', concat_file,
-    '-c', 'copy',
-    output_video,
-    '-y'
-]
+    print(f"\nConcatenating all video segments...")
+
+    # Concatenate all videos
+    concat_cmd = [
+        'ffmpeg',
+        '-f', 'concat',
+        '-safe', '0',
+        '-i', concat_file,
+        '-c', 'copy',
+        output,
+        '-y'
+    ]
+
+    try:
+        with span('concat', 'video', segments=len(segment_files)):
+            subprocess.run(concat_cmd, check=True, capture_output=True)
+        print(f"\n✓ Successfully created video: {output}")
+        cache.record(output, video_key, rebuilt=True, reason=video_reason)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"\n✗ Error concatenating videos: {e}")
+        print(f"  stderr: {e.stderr.decode()}")
+        cache.forget(output)
+        return False
+    finally:
+        # Clean up temporary files
+        print("\nCleaning up temporary files...")
+        for file in os.listdir(temp_dir):
+            os.remove(os.path.join(temp_dir, file))
+        os.rmdir(temp_dir)
+        print("✓ Cleanup complete")
+
+
+def single_pass_command(items, output, profile=DEFAULT_PROFILE):
+    """
+    全シーンを1回でエンコードするffmpegコマンド
+
+    各シーンの画像（表示時間分ループ）と音声（無音で埋めて同じ長さに切り詰め）を
+    入力とし、concatフィルターで順に連結します。
+    """
+    width, height = resolution.split('x')
+    input_framerate = ENCODE_PROFILES[profile]['input_framerate'] or fps
+    cmd = ['ffmpeg']
+    filters = []
+    streams = []
+    for i, item in enumerate(items):
+        total = item['total_duration']
+        cmd += ['-loop', '1', '-framerate', str(input_framerate), '-t', str(total), '-i', item['image'],
+                '-i', item['audio']]
+        filters.append(f"[{2 * i}:v]scale={width}:{height},setsar=1,fps={fps},format=yuv420p[v{i}]")
+        # 音声形式を揃え、無音間隔の分まで無音で埋める
+        filters.append(f"[{2 * i + 1}:a]aformat=sample_rates=44100:channel_layouts=stereo,"
+                       f"apad,atrim=0:{total},asetpts=PTS-STARTPTS[a{i}]")
+        streams.append(f"[v{i}][a{i}]")
+    filters.append(f"{''.join(streams)}concat=n={len(items)}:v=1:a=1[v][a]")
+
+    return cmd + [
+        '-filter_complex', ';'.join(filters),
+        '-map', '[v]',
+        '-map', '[a]',
+        *video_codec_args(profile),
+        '-c:a', audio_codec,
+        '-b:a', audio_bitrate,
+        '-r', str(fps),
+        output,
+        '-y'
+    ]
+
+
+def encode_single_pass(items, output, cache, profile=DEFAULT_PROFILE):
+    """
+    全シーンを1回のffmpegで直接最終動画にエンコード（中間ファイルなし）
+
+    Args:
+        items (list): collect_scenes() の戻り値
+        output (str): 出力動画ファイルのパス
+        cache (BuildCache): ビルドキャッシュ
+        profile (str): エンコードプロファイル（ENCODE_PROFILES のキー）
+
+    Returns:
+        bool: 出力動画を作成（または再利用）できた場合True
+    """
+    video_key = content_key('video-single-pass',
+                            [(item['source_key'], hash_file(item['audio']), item['total_duration'])
+                             for item in items],
+                            *encode_settings(profile))
+    fresh, reason = cache.check(output, video_key)
+    if fresh:
+        print(f"\n✓ Video is up to date: {output}")
+        cache.record(output, video_key, rebuilt=False, reason=reason)
+        return True
+
+    print(f"\nEncoding {len(items)} scenes in a single pass...")
+    try:
+        with span('encode', 'video', scene='all', duration=sum(item['total_duration'] for item in items)):
+            subprocess.run(single_pass_command(items, output, profile), check=True, capture_output=True)
+        print(f"\n✓ Successfully created video: {output}")
+        cache.record(output, video_key, rebuilt=True, reason=reason)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"\n✗ Error encoding video: {e}")
+        print(f"  stderr: {e.stderr.decode()}")
+        cache.forget(output)
+        return False
 
-try:
-    subprocess.run(concat_cmd, check=True, capture_output=True)
-    print(f"\n✓ Successfully created video: {output_video}")
 
+def show_video_info(output):
+    """出力動画の情報とファイルサイズを表示"""
     # Get video info
     probe_cmd = [
         'ffprobe',
@@ -153,32 +520,61 @@ try:
         '-select_streams', 'v:0',
         '-show_entries', 'stream=width,height,r_frame_rate,duration',
         '-of', 'default=noprint_wrappers=1',
-        output_video
+        output
     ]
 
     try:
         result = subprocess.run(probe_cmd, capture_output=True, text=True, check=True)
         print(f"\nVideo info:")
         print(result.stdout)
-    except:
+    except (subprocess.CalledProcessError, FileNotFoundError):
         pass
 
     # Get file size
-    file_size = os.path.getsize(output_video) / (1024 * 1024)  # MB
+    file_size = os.path.getsize(output) / (1024 * 1024)  # MB
     print(f"File size: {file_size:.2f} MB")
 
-except subprocess.CalledProcessError as e:
-    print(f"\n✗ Error concatenating videos: {e}")
-    print(f"  stderr: {e.stderr.decode()}")
-
-# Clean up temporary files
-print("\nCleaning up temporary files...")
-for file in os.listdir(temp_dir):
-    os.remove(os.path.join(temp_dir, file))
-os.rmdir(temp_dir)
-print("✓ Cleanup complete")
-
-print(f"\nVideo creation complete! Output file: {output_video}")
-print("\nTo update durations based on actual audio length, run:")
-print("python generate_audio.py")
-print("Then check the reported durations and update the 'scenes' list in this script.")
\ No newline at end of file
+
+def main():
+    """Main function to create the tutorial video."""
+    parser = argparse.ArgumentParser(description='Create the tutorial video from screenshots and narration')
+    parser.add_argument('--mode', choices=['segments', 'single-pass'], default='segments',
+                        help='encode per-scene segments and concatenate them (default), '
+                             'or encode every scene in one ffmpeg run')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help='number of segment encodes to run at once (default: all cores)')
+    parser.add_argument('--profile', choices=sorted(ENCODE_PROFILES), default=DEFAULT_PROFILE,
+                        help=f'video encoding profile (default: {DEFAULT_PROFILE})')
+    args = parser.parse_args()
+
+    print("Creating video segments for each scene..." if args.mode == 'segments'
+          else "Creating video in a single encode...")
+    print(f"Target resolution: {resolution}")
+    print(f"Frame rate: {fps} fps")
+    print(f"Video codec: {video_codec} ({args.profile} profile)")
+    print(f"Audio codec: {audio_codec}")
+
+    items = collect_scenes()
+    if not items:
+        print("\n✗ No scenes to encode")
+        return 1
+
+    # ビルドキャッシュ（画像・音声・エンコード設定が同じ成果物はスキップ）
+    cache = BuildCache('video')
+    if args.mode == 'segments':
+        ok = encode_segments(items, output_video, cache, jobs=args.jobs, profile=args.profile)
+    else:
+        ok = encode_single_pass(items, output_video, cache, profile=args.profile)
+    cache.save()
+
+    if not ok:
+        return 1
+
+    show_video_info(output_video)
+    print(f"\nVideo creation complete! Output file: {output_video}")
+    print(f"Total duration: {sum(item['total_duration'] for item in items):.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
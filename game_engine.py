@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+テニスゲームのシミュレーションエンジン（ヘッドレス・NumPyベクトル化版）
+
+index.html のゲームロジック（updatePlayer, updateAI, updateBall, resetBall, updateScore）を
+同じ規則でPythonに移植したものです。ブラウザなしで、独立した多数の試合を
+NumPy配列でまとめて1フレームずつ進めます。
+
+- 1ステップ = requestAnimationFrame の1フレーム（固定タイムステップ, 60fps相当）
+- パドルに当たるとボールのX方向の速度が1.05倍になり、Y方向の速度は当たった位置で決まる
+- AIはボールの到達位置を予測し、aiErrorRate に比例した誤差を毎フレーム加えて追いかける
+- どちらかが11点に達した試合は終了し、以降は状態が変化しない
+- 乱数は numpy.random.Generator（シード指定で同じ結果を再現）
+
+プレイヤー（右側のパドル）はキー入力の代わりにプレイヤーモデル（idle / follow / random / human）が操作します。
+
+使用方法:
+    python game_engine.py [--matches 10000] [--difficulty medium] [--player follow] [--seed 0]
+"""
+
+import argparse  # コマンドライン引数の解析用
+import sys       # 終了コード用
+import time      # 処理時間の計測用
+
+import numpy as np
+
+# index.html のゲーム設定（game, player, ai, ball オブジェクトの初期値）
+WIDTH = 800                # キャンバスの幅
+HEIGHT = 400               # キャンバスの高さ
+BALL_SPEED = 5             # game.ballSpeed（サーブ時の速度、打ち返し時のY方向の最大速度）
+PADDLE_SPEED = 8           # game.paddleSpeed（プレイヤーのパドルの移動量）
+PADDLE_WIDTH = 10
+PADDLE_HEIGHT = 100
+PLAYER_X = WIDTH - 30      # プレイヤー（右側）のパドルのX座標
+AI_X = 20                  # AI（左側）のパドルのX座標
+BALL_RADIUS = 8
+SPEEDUP = 1.05             # パドルで打ち返したときのX方向の加速率
+AI_DEAD_ZONE = 5           # AIが目標位置との差がこの値以下なら動かない
+WINNING_SCORE = 11         # 先に11点取った方の勝ち
+FRAME_RATE = 60            # 1秒あたりのフレーム数（requestAnimationFrame の標準的な間隔）
+
+# setDifficulty() の難易度設定（aiSpeed, aiReactionDistance, aiErrorRate）
+DIFFICULTY_PRESETS = {
+    'easy': {'ai_speed': 3, 'ai_reaction_distance': 100, 'ai_error_rate': 0.3},
+    'medium': {'ai_speed': 5, 'ai_reaction_distance': 150, 'ai_error_rate': 0.15},
+    'hard': {'ai_speed': 7, 'ai_reaction_distance': 250, 'ai_error_rate': 0.05},
+}
+
+# 集計用のヒストグラムの範囲
+MAX_RALLY_HITS = 64        # 1ポイントあたりの打ち返し回数（これ以上は最後のビンに集計）
+MISS_BIN_PIXELS = 10       # AIが取り損ねたときの、パドルの端からボールまでの距離のビン幅
+MISS_BINS = HEIGHT // MISS_BIN_PIXELS + 1
+
+
+class IdlePlayer:
+    """何も操作しないプレイヤー（パドルは初期位置のまま）"""
+
+    def __call__(self, engine, rng):
+        none = np.zeros(engine.size, dtype=bool)
+        return none, none
+
+
+class FollowPlayer:
+    """
+    ボールのY座標を追いかけるプレイヤー
+
+    ボールが自分の方へ向かっていて、右端から reaction_distance 以内にあるときはボールの高さへ、
+    それ以外はコート中央へパドルを動かします。パドル中央との差が dead_zone 以下なら動きません。
+    """
+
+    def __init__(self, dead_zone=10, reaction_distance=WIDTH):
+        self.dead_zone = dead_zone
+        self.reaction_distance = reaction_distance
+
+    def __call__(self, engine, rng):
+        approaching = (engine.speed_x > 0) & (engine.ball_x > WIDTH - self.reaction_distance)
+        target = np.where(approaching, engine.ball_y, HEIGHT / 2)
+        center = engine.player_y + PADDLE_HEIGHT / 2
+        return target < center - self.dead_zone, target > center + self.dead_zone
+
+
+class RandomPlayer:
+    """
+    でたらめにキーを押すプレイヤー
+
+    毎フレーム switch_rate の確率で入力（上・下・なし）を選び直し、それ以外は前のフレームの入力を続けます。
+    """
+
+    def __init__(self, switch_rate=0.05):
+        self.switch_rate = switch_rate
+
+    def __call__(self, engine, rng):
+        switch = rng.random(engine.size) < self.switch_rate
+        choice = rng.integers(0, 3, engine.size)
+        up = np.where(switch, choice == 1, engine.player_up)
+        down = np.where(switch, choice == 2, engine.player_down)
+        return up, down
+
+
+class HumanPlayer:
+    """
+    人間らしい反応の遅れと狙いのずれを持つプレイヤー
+
+    reaction_frames フレーム前のボールの高さを見てパドルを動かし、ボールが向かってくるたびに
+    標準偏差 aim_error ピクセルの狙いのずれを選び直します。ボールが右端から reaction_distance より
+    遠い間はコート中央へ戻ります。試合ごとの状態（見えているボールの高さの履歴）を持つため、
+    GameEngine.compact() のときに compact() で同じ試合だけを残します。
+    """
+
+    def __init__(self, reaction_frames=6, aim_error=15, dead_zone=10, reaction_distance=WIDTH / 2):
+        self.reaction_frames = reaction_frames
+        self.aim_error = aim_error
+        self.dead_zone = dead_zone
+        self.reaction_distance = reaction_distance
+        self._history = None
+        self._offset = None
+        self._position = 0
+
+    def compact(self, keep):
+        """終了した試合の状態を取り除く（keep: 残す試合のブール配列）"""
+        if self._history is not None:
+            self._history = self._history[:, keep]
+            self._offset = self._offset[keep]
+
+    def __call__(self, engine, rng):
+        if self._history is None:
+            self._history = np.repeat(engine.ball_y[None, :], self.reaction_frames + 1, axis=0)
+            self._offset = np.zeros(engine.size)
+        self._history[self._position] = engine.ball_y
+        self._position = (self._position + 1) % len(self._history)
+        seen_y = self._history[self._position]
+
+        approaching = engine.speed_x > 0
+        self._offset = np.where(approaching, self._offset, rng.normal(0, self.aim_error, engine.size))
+        reacting = approaching & (engine.ball_x > WIDTH - self.reaction_distance)
+        target = np.where(reacting, seen_y + self._offset, HEIGHT / 2)
+        center = engine.player_y + PADDLE_HEIGHT / 2
+        return target < center - self.dead_zone, target > center + self.dead_zone
+
+
+PLAYER_MODELS = {'idle': IdlePlayer, 'follow': FollowPlayer, 'random': RandomPlayer, 'human': HumanPlayer}
+
+
+def preset_params(difficulty):
+    """難易度名から AI のパラメータ（ai_speed, ai_reaction_distance, ai_error_rate）の辞書を取得"""
+    return dict(DIFFICULTY_PRESETS[difficulty])
+
+
+class GameEngine:
+    """
+    独立した多数の試合をまとめて進めるシミュレーター
+
+    各試合の状態は長さ size のNumPy配列（ball_x, ball_y, speed_x, speed_y, player_y, ai_y, スコアなど）で、
+    step() を1回呼ぶとすべての試合が1フレーム進みます。AIのパラメータは試合ごとに変えられます。
+    終了した試合の結果は試合番号ごとの配列（winner_player, player_score, ai_score, ticks など）に残り、
+    compact() で終了した試合を状態配列から取り除くと、残りの試合だけを計算します。
+    ラリーの長さとAIのミスのヒストグラムは、試合ごとのグループ番号（groups）別に集計します。
+    """
+
+    def __init__(self, num_matches, ai_speed=5, ai_reaction_distance=150, ai_error_rate=0.1,
+                 player=None, seed=None, groups=None):
+        """
+        Args:
+            num_matches (int): 同時に進める試合数
+            ai_speed (float or array): AIのパドルの最大移動量（game.aiSpeed）
+            ai_reaction_distance (float or array): AIが反応し始める距離（game.aiReactionDistance）
+            ai_error_rate (float or array): AIの予測誤差の大きさ（game.aiErrorRate）
+            player (callable, optional): プレイヤーモデル（Noneの場合は FollowPlayer）
+            seed (int or numpy.random.SeedSequence, optional): 乱数の種
+            groups (array, optional): 試合ごとのグループ番号（ヒストグラムを分けて集計する単位, 既定は全試合で1つ）
+        """
+        n = num_matches
+        self.rng = np.random.default_rng(seed)
+        self.player = player if player is not None else FollowPlayer()
+        self.match_ids = np.arange(n)
+        self.groups = np.zeros(n, dtype=np.int64) if groups is None else np.asarray(groups, dtype=np.int64).copy()
+        self.num_groups = int(self.groups.max()) + 1 if n else 1
+
+        # 試合ごとのAIのパラメータ
+        self.ai_speed = np.broadcast_to(np.asarray(ai_speed, dtype=np.float64), (n,)).copy()
+        self.ai_reaction_distance = np.broadcast_to(
+            np.asarray(ai_reaction_distance, dtype=np.float64), (n,)).copy()
+        self.ai_error_rate = np.broadcast_to(np.asarray(ai_error_rate, dtype=np.float64), (n,)).copy()
+
+        # 試合の状態（index.html のオブジェクトの初期値）
+        self.ball_x = np.full(n, WIDTH / 2)
+        self.ball_y = np.full(n, HEIGHT / 2)
+        self.speed_x = np.zeros(n)
+        self.speed_y = np.zeros(n)
+        self.player_y = np.full(n, HEIGHT / 2 - PADDLE_HEIGHT / 2)
+        self.ai_y = np.full(n, HEIGHT / 2 - PADDLE_HEIGHT / 2)
+        self.ai_target_y = np.full(n, HEIGHT / 2)
+        self.player_score = np.zeros(n, dtype=np.int32)
+        self.ai_score = np.zeros(n, dtype=np.int32)
+        self.player_up = np.zeros(n, dtype=bool)
+        self.player_down = np.zeros(n, dtype=bool)
+        self.running = np.ones(n, dtype=bool)
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.rally_hits = np.zeros(n, dtype=np.int32)
+        self.player_hits = np.zeros(n, dtype=np.int32)
+        self.ai_hits = np.zeros(n, dtype=np.int32)
+
+        # 試合番号ごとの結果（試合が終わった時点で書き込む）
+        self.result_player_score = np.zeros(n, dtype=np.int32)
+        self.result_ai_score = np.zeros(n, dtype=np.int32)
+        self.result_ticks = np.zeros(n, dtype=np.int64)
+        self.result_player_hits = np.zeros(n, dtype=np.int32)
+        self.result_ai_hits = np.zeros(n, dtype=np.int32)
+        self.finished = np.zeros(n, dtype=bool)
+
+        # グループごとの集計（1ポイントあたりの打ち返し回数、AIが取り損ねたときの距離）
+        self.rally_histogram = np.zeros((self.num_groups, MAX_RALLY_HITS + 1), dtype=np.int64)
+        self.ai_miss_histogram = np.zeros((self.num_groups, MISS_BINS), dtype=np.int64)
+        self.total_ticks = 0
+
+        # スタートボタンを押したときと同じく、最初のサーブ
+        self._reset_ball(np.ones(n, dtype=bool))
+
+    @property
+    def size(self):
+        """状態配列に残っている（計算対象の）試合数"""
+        return len(self.ball_x)
+
+    @property
+    def winner_player(self):
+        """試合番号ごとに、プレイヤーが勝った場合True"""
+        return self.result_player_score >= WINNING_SCORE
+
+    def _reset_ball(self, mask):
+        """resetBall(): mask の試合のボールを中央に戻し、ランダムな方向にサーブ"""
+        direction = np.where(self.rng.random(self.size) > 0.5, 1.0, -1.0)
+        serve_y = (self.rng.random(self.size) - 0.5) * BALL_SPEED
+        self.ball_x[mask] = WIDTH / 2
+        self.ball_y[mask] = HEIGHT / 2
+        self.speed_x[mask] = direction[mask] * BALL_SPEED
+        self.speed_y[mask] = serve_y[mask]
+
+    def _update_player(self):
+        """updatePlayer(): キー入力（プレイヤーモデルの出力）でパドルを動かす"""
+        up, down = self.player(self, self.rng)
+        self.player_up = up & self.running
+        self.player_down = down & self.running
+        self.player_y -= np.where(self.player_up & (self.player_y > 0), PADDLE_SPEED, 0)
+        self.player_y += np.where(self.player_down & (self.player_y < HEIGHT - PADDLE_HEIGHT), PADDLE_SPEED, 0)
+
+    def _update_ai(self):
+        """updateAI(): ボールの到達位置を予測し、誤差を加えた目標位置へAIのパドルを動かす"""
+        tracking = (self.speed_x < 0) & (self.ball_x < WIDTH - self.ai_reaction_distance)
+        slope = np.divide(self.speed_y, self.speed_x, out=np.zeros(self.size), where=tracking)
+        predicted_y = self.ball_y + slope * (AI_X - self.ball_x)
+        error = (self.rng.random(self.size) - 0.5) * self.ai_error_rate * PADDLE_HEIGHT
+        self.ai_target_y = np.where(tracking, predicted_y + error - PADDLE_HEIGHT / 2,
+                                    HEIGHT / 2 - PADDLE_HEIGHT / 2)
+
+        diff = self.ai_target_y - self.ai_y
+        move = np.minimum(self.ai_speed, np.abs(diff))
+        self.ai_y += np.where(diff > AI_DEAD_ZONE, move, np.where(diff < -AI_DEAD_ZONE, -move, 0))
+        np.clip(self.ai_y, 0, HEIGHT - PADDLE_HEIGHT, out=self.ai_y)
+
+    def _update_ball(self):
+        """
+        updateBall(): ボールを進め、壁・パドルでの跳ね返りと得点を処理
+
+        Returns:
+            tuple: (プレイヤーが得点した試合, AIが得点した試合) のブール配列
+        """
+        self.ball_x += self.speed_x
+        self.ball_y += self.speed_y
+
+        bounce = (self.ball_y - BALL_RADIUS <= 0) | (self.ball_y + BALL_RADIUS >= HEIGHT)
+        np.negative(self.speed_y, out=self.speed_y, where=bounce)
+
+        hit_ai = ((self.ball_x - BALL_RADIUS <= AI_X + PADDLE_WIDTH) & (self.ball_x - BALL_RADIUS >= AI_X)
+                  & (self.ball_y >= self.ai_y) & (self.ball_y <= self.ai_y + PADDLE_HEIGHT)
+                  & (self.speed_x < 0))
+        self._return_ball(hit_ai, self.ai_y)
+
+        hit_player = ((self.ball_x + BALL_RADIUS >= PLAYER_X)
+                      & (self.ball_x + BALL_RADIUS <= PLAYER_X + PADDLE_WIDTH)
+                      & (self.ball_y >= self.player_y) & (self.ball_y <= self.player_y + PADDLE_HEIGHT)
+                      & (self.speed_x > 0))
+        self._return_ball(hit_player, self.player_y)
+
+        self.ai_hits += hit_ai
+        self.player_hits += hit_player
+        self.rally_hits += hit_ai | hit_player
+
+        player_point = self.ball_x < 0
+        ai_point = self.ball_x > WIDTH
+        if player_point.any():
+            # AIのパドルの端からボールまでの距離（パドルをすり抜けた場合は0）
+            gap = np.maximum(self.ai_y - self.ball_y, self.ball_y - (self.ai_y + PADDLE_HEIGHT))
+            bins = np.clip(gap[player_point] // MISS_BIN_PIXELS, 0, MISS_BINS - 1).astype(np.int64)
+            self.ai_miss_histogram += self._group_counts(player_point, bins, MISS_BINS)
+        return player_point, ai_point
+
+    def _group_counts(self, mask, bins, num_bins):
+        """mask の試合の bins（ビン番号）をグループ別に数えた (num_groups, num_bins) の配列"""
+        flat = self.groups[mask] * num_bins + bins
+        return np.bincount(flat, minlength=self.num_groups * num_bins).reshape(self.num_groups, num_bins)
+
+    def _return_ball(self, hit, paddle_y):
+        """パドルに当たったボールを打ち返す（X方向は反転して1.05倍、Y方向は当たった位置で決まる）"""
+        relative_y = (self.ball_y - (paddle_y + PADDLE_HEIGHT / 2)) / (PADDLE_HEIGHT / 2)
+        self.speed_x = np.where(hit, -self.speed_x * SPEEDUP, self.speed_x)
+        self.speed_y = np.where(hit, relative_y * BALL_SPEED, self.speed_y)
+
+    def _update_score(self, player_point, ai_point):
+        """得点を加算してサーブし直し、11点に達した試合を終了（updateScore()）"""
+        scored = player_point | ai_point
+        if not scored.any():
+            return
+        self.player_score += player_point
+        self.ai_score += ai_point
+        self.rally_histogram += self._group_counts(scored, np.minimum(self.rally_hits[scored], MAX_RALLY_HITS),
+                                                   MAX_RALLY_HITS + 1)
+        self.rally_hits[scored] = 0
+        self._reset_ball(scored)
+
+        ended = scored & ((self.player_score >= WINNING_SCORE) | (self.ai_score >= WINNING_SCORE))
+        if ended.any():
+            ids = self.match_ids[ended]
+            self.result_player_score[ids] = self.player_score[ended]
+            self.result_ai_score[ids] = self.ai_score[ended]
+            self.result_ticks[ids] = self.ticks[ended]
+            self.result_player_hits[ids] = self.player_hits[ended]
+            self.result_ai_hits[ids] = self.ai_hits[ended]
+            self.finished[ids] = True
+            # 終了した試合はボールを止め、以降は得点も打ち返しも起きないようにする
+            self.running[ended] = False
+            self.speed_x[ended] = 0
+            self.speed_y[ended] = 0
+
+    def step(self):
+        """
+        すべての試合を1フレーム進める（gameLoop() の1回分）
+
+        Returns:
+            tuple: (プレイヤーが得点した試合, AIが得点した試合) のブール配列
+        """
+        self._update_player()
+        self._update_ai()
+        player_point, ai_point = self._update_ball()
+        self.ticks += self.running
+        self.total_ticks += int(np.count_nonzero(self.running))
+        self._update_score(player_point, ai_point)
+        return player_point, ai_point
+
+    def compact(self):
+        """終了した試合を状態配列から取り除く（以降の step() は残りの試合だけを計算）"""
+        keep = self.running
+        for name in ('match_ids', 'groups', 'ai_speed', 'ai_reaction_distance', 'ai_error_rate', 'ball_x', 'ball_y',
+                     'speed_x', 'speed_y', 'player_y', 'ai_y', 'ai_target_y', 'player_score', 'ai_score',
+                     'player_up', 'player_down', 'running', 'ticks', 'rally_hits', 'player_hits', 'ai_hits'):
+            setattr(self, name, getattr(self, name)[keep])
+        if hasattr(self.player, 'compact'):
+            self.player.compact(keep)
+
+    def run(self, max_ticks=FRAME_RATE * 60 * 60, compact_every=256):
+        """
+        すべての試合が終わるまで（最大 max_ticks フレーム）進める
+
+        compact_every フレームごとに、終了した試合が半分を超えていれば状態配列から取り除きます。
+
+        Returns:
+            bool: すべての試合が終了した場合True
+        """
+        for tick in range(1, max_ticks + 1):
+            self.step()
+            if tick % compact_every == 0:
+                running = np.count_nonzero(self.running)
+                if running == 0:
+                    break
+                if running * 2 < self.size:
+                    self.compact()
+        return bool(self.finished.all())
+
+    def summary(self):
+        """全試合の結果の集計（プレイヤーの勝率、試合・ポイントの長さ、打ち返し回数など）を辞書で取得"""
+        done = self.finished
+        points = self.result_player_score[done] + self.result_ai_score[done]
+        rally_histogram = self.rally_histogram.sum(axis=0)
+        rallies = rally_histogram.sum()
+        return {
+            'matches': int(done.sum()),
+            'player_win_rate': float(self.winner_player[done].mean()) if done.any() else None,
+            'mean_match_seconds': float(self.result_ticks[done].mean() / FRAME_RATE) if done.any() else None,
+            'mean_points': float(points.mean()) if done.any() else None,
+            'points': int(rallies),
+            'mean_rally_hits': float((np.arange(MAX_RALLY_HITS + 1) * rally_histogram).sum() / rallies)
+            if rallies else None,
+            'ai_misses': int(self.ai_miss_histogram.sum()),
+            'simulated_seconds': self.total_ticks / FRAME_RATE,
+        }
+
+
+def simulate(num_matches, difficulty='medium', player='follow', seed=0, max_ticks=FRAME_RATE * 60 * 60):
+    """
+    難易度プリセットとプレイヤーモデルを指定して num_matches 試合をシミュレーション
+
+    Returns:
+        GameEngine: 全試合を進め終えたエンジン（結果は summary() や result_* 配列で参照）
+    """
+    engine = GameEngine(num_matches, player=PLAYER_MODELS[player](), seed=seed, **preset_params(difficulty))
+    engine.run(max_ticks)
+    return engine
+
+
+def main():
+    """Main function to run a batch of headless matches."""
+    parser = argparse.ArgumentParser(description='Simulate tennis matches headlessly with the index.html rules')
+    parser.add_argument('--matches', type=int, default=10000, help='number of independent matches')
+    parser.add_argument('--difficulty', choices=sorted(DIFFICULTY_PRESETS), default='medium',
+                        help='AI difficulty preset')
+    parser.add_argument('--player', choices=sorted(PLAYER_MODELS), default='follow', help='player model')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--max-minutes', type=float, default=60,
+                        help='stop after this much simulated time per match (default: 60)')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    engine = simulate(args.matches, args.difficulty, args.player, args.seed,
+                      max_ticks=int(args.max_minutes * 60 * FRAME_RATE))
+    elapsed = time.perf_counter() - start_time
+    summary = engine.summary()
+
+    print(f"Simulated {summary['matches']}/{args.matches} matches ({args.difficulty}, player={args.player}, "
+          f"seed={args.seed}) in {elapsed:.2f}s")
+    if summary['matches']:
+        print(f"  player win rate : {summary['player_win_rate']:.1%}")
+        print(f"  match length    : {summary['mean_match_seconds']:.1f}s, {summary['mean_points']:.1f} points")
+        print(f"  rally length    : {summary['mean_rally_hits']:.2f} hits per point")
+        print(f"  AI misses       : {summary['ai_misses']}")
+    print(f"  game time       : {summary['simulated_seconds'] / 3600:.1f}h "
+          f"({summary['simulated_seconds'] / elapsed:,.0f}x real time)")
+    return 0 if summary['matches'] == args.matches else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+テニスゲームのプレイ映像の描画スクリプト
+
+index.html の描画処理（draw, drawNet, drawPaddle, drawBall）をNumPyで再現し、
+ゲームの状態（シミュレーション結果、または replay_format.py で記録したリプレイ）から1フレームずつ描画して、
+グレースケールの生データとして ffmpeg の標準入力に直接渡します。
+画面キャプチャなしで、ゲームのプレイ映像をシーンに追加できます。
+
+- draw() と同じく、毎フレーム rgba(0, 0, 0, 0.2) で全体を塗って前のフレームを薄く残す（残像）
+- ボールの軌跡（直前5フレームの位置）は半透明の小さな円で描画
+- 画面は白と黒だけなので、800x400の1チャンネル（グレースケール）のバッファ1枚を使い回す
+
+使用方法:
+    python gameplay_renderer.py [--seconds 30] [--difficulty medium] [--player follow] [--seed 0]
+                                [--output gameplay.mp4] [--resolution 1920x1080] [--benchmark]
+    python gameplay_renderer.py --replay session.replay [--point N] [--output gameplay.mp4]
+"""
+
+import argparse    # コマンドライン引数の解析用
+import subprocess  # ffmpeg の実行用
+import sys         # 終了コード用
+import time        # 処理時間の計測用
+from collections import deque  # ボールの軌跡の保持用
+
+import numpy as np
+
+import game_engine
+from game_engine import AI_X, BALL_RADIUS, FRAME_RATE, HEIGHT, PADDLE_HEIGHT, PADDLE_WIDTH, PLAYER_X, WIDTH
+from profiler import span  # 処理時間の計測用
+from replay_format import ReplayReader  # 記録したリプレイの読み込み用
+
+FADE_ALPHA = 0.2           # draw() の rgba(0, 0, 0, 0.2)
+TRAIL_LENGTH = 5           # ball.trail の最大長
+NET_WIDTH = 2              # drawNet() の lineWidth
+NET_DASH = 10              # drawNet() の setLineDash([10, 10])
+SUBPIXELS = 4              # 円の被覆率を計算するときの1ピクセルあたりの分割数（縦横）
+
+# 前のフレームを (1 - FADE_ALPHA) 倍に薄める係数（256分率の固定小数点、8bitで丸める点もブラウザと同じ）
+_FADE_FACTOR = round((1 - FADE_ALPHA) * 256)
+
+# 点線のネットを描く行（y = 0 から10ピクセル描いて10ピクセル空ける）
+_NET_ROWS = (np.arange(HEIGHT) // NET_DASH) % 2 == 0
+_NET_COLUMNS = slice(WIDTH // 2 - NET_WIDTH // 2, WIDTH // 2 + NET_WIDTH // 2)
+
+
+def _disc_coverage(radius, offset_x, offset_y):
+    """
+    半径 radius の円が各ピクセルを覆う割合（アンチエイリアス用）を計算
+
+    中心はウィンドウ左上のピクセルから (offset_x, offset_y) の位置で、
+    1ピクセルを SUBPIXELS x SUBPIXELS に分けた点のうち円の内側にある割合を返します。
+    """
+    size = int(np.ceil(radius * 2)) + 2
+    samples = (np.arange(size * SUBPIXELS) + 0.5) / SUBPIXELS
+    inside = ((samples[None, :] - offset_x) ** 2 + (samples[:, None] - offset_y) ** 2) <= radius ** 2
+    return inside.reshape(size, SUBPIXELS, size, SUBPIXELS).mean(axis=(1, 3))
+
+
+class GameplayRenderer:
+    """
+    ゲーム画面を1フレームずつ描画するクラス
+
+    frame（HEIGHT x WIDTH の uint8 配列）を1枚だけ確保し、draw() のたびに上書きします。
+    ボールの軌跡は前のフレームのボールの位置から作るため、状態は時刻順に渡してください。
+    """
+
+    def __init__(self):
+        self.frame = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)  # canvas（背景は黒）
+        self._scratch = np.empty((HEIGHT, WIDTH), dtype=np.uint16)  # 残像の計算用
+        self.trail = deque(maxlen=TRAIL_LENGTH)
+        self._previous_ball = None
+        self._discs = {}
+
+    def _disc(self, radius, x, y):
+        """円の被覆率のウィンドウと、その左上のピクセル座標（中心の端数は1/SUBPIXELSピクセル単位に丸める）"""
+        left = int(np.floor(x - radius)) - 1
+        top = int(np.floor(y - radius)) - 1
+        offset_x = round((x - left) * SUBPIXELS) / SUBPIXELS
+        offset_y = round((y - top) * SUBPIXELS) / SUBPIXELS
+        key = (radius, offset_x, offset_y)
+        coverage = self._discs.get(key)
+        if coverage is None:
+            coverage = self._discs[key] = _disc_coverage(radius, offset_x, offset_y)
+        return coverage, left, top
+
+    def _blend_white(self, coverage, left, top, alpha=1.0):
+        """被覆率 coverage のウィンドウを、不透明度 alpha の白で (left, top) に重ねる（画面外は切り捨て）"""
+        height, width = coverage.shape
+        x0, y0 = max(left, 0), max(top, 0)
+        x1, y1 = min(left + width, WIDTH), min(top + height, HEIGHT)
+        if x0 >= x1 or y0 >= y1:
+            return
+        region = self.frame[y0:y1, x0:x1]
+        weight = coverage[y0 - top:y1 - top, x0 - left:x1 - left] * alpha
+        region += np.rint((255 - region) * weight).astype(np.uint8)
+
+    def fade(self):
+        """ctx.fillRect(0, 0, width, height) を rgba(0, 0, 0, 0.2) で塗る（前のフレームを0.8倍に薄める）"""
+        np.multiply(self.frame, _FADE_FACTOR, out=self._scratch)
+        self._scratch += 128
+        self._scratch >>= 8
+        np.copyto(self.frame, self._scratch, casting='unsafe')
+
+    def draw_net(self):
+        """drawNet(): 中央に幅2ピクセルの白い点線"""
+        self.frame[_NET_ROWS, _NET_COLUMNS] = 255
+
+    def draw_paddle(self, x, y):
+        """drawPaddle(): 白い長方形（上下の端は被覆率に応じて半端な明るさになる）"""
+        top = y
+        bottom = y + PADDLE_HEIGHT
+        row0 = max(int(np.floor(top)), 0)
+        row1 = min(int(np.ceil(bottom)), HEIGHT)
+        if row0 >= row1:
+            return
+        rows = np.arange(row0, row1)
+        coverage = np.clip(np.minimum(rows + 1, bottom) - np.maximum(rows, top), 0, 1)
+        self._blend_white(np.repeat(coverage[:, None], PADDLE_WIDTH, axis=1), int(x), row0)
+
+    def draw_ball(self, x, y):
+        """drawBall(): 軌跡（古い方から不透明度0, 0.1, ...と半径0.5倍, 0.6倍, ...）とボール本体"""
+        for index, (trail_x, trail_y) in enumerate(self.trail):
+            if index == 0:
+                continue  # 不透明度0なので描画しても変化しない
+            self._blend_white(*self._disc(BALL_RADIUS * (index * 0.1 + 0.5), trail_x, trail_y), alpha=index * 0.1)
+        self._blend_white(*self._disc(BALL_RADIUS, x, y))
+
+    def draw(self, ball_x, ball_y, ai_y, player_y, served=False):
+        """
+        1フレーム分の状態を描画（gameLoop() の updateBall() の軌跡の更新と draw() に相当）
+
+        Args:
+            ball_x, ball_y (float): ボールの中心
+            ai_y, player_y (float): AIとプレイヤーのパドルの上端
+            served (bool): このフレームで得点してサーブし直した場合True（軌跡を消す）
+
+        Returns:
+            numpy.ndarray: 描画済みのフレーム（次の draw() で上書きされる）
+        """
+        if self._previous_ball is not None:
+            self.trail.append(self._previous_ball)
+        if served:
+            self.trail.clear()
+        self._previous_ball = (ball_x, ball_y)
+
+        self.fade()
+        self.draw_net()
+        self.draw_paddle(AI_X, ai_y)
+        self.draw_paddle(PLAYER_X, player_y)
+        self.draw_ball(ball_x, ball_y)
+        return self.frame
+
+
+def simulated_states(difficulty='medium', player='follow', seed=0, max_frames=None):
+    """
+    1試合をシミュレーションして、フレームごとの状態を返すジェネレーター
+
+    最初にサーブ直後（スタート時の draw()）の状態を返し、以降は1フレームごとに返します。
+    試合が終わるか max_frames フレームに達すると終了します。
+
+    Yields:
+        tuple: (ball_x, ball_y, ai_y, player_y, served)
+    """
+    engine = game_engine.GameEngine(1, player=game_engine.PLAYER_MODELS[player](), seed=seed,
+                                    **game_engine.preset_params(difficulty))
+    yield engine.ball_x[0], engine.ball_y[0], engine.ai_y[0], engine.player_y[0], True
+
+    frame = 0
+    while engine.running[0] and (max_frames is None or frame < max_frames):
+        player_point, ai_point = engine.step()
+        frame += 1
+        yield engine.ball_x[0], engine.ball_y[0], engine.ai_y[0], engine.player_y[0], bool(player_point[0] | ai_point[0])
+
+
+def ffmpeg_command(output, fps=FRAME_RATE, resolution=None):
+    """
+    グレースケールの生フレームを標準入力から受け取って動画にする ffmpeg コマンド
+
+    resolution（'1920x1080' など）を指定すると、縦横比を保ったまま拡大して黒い余白を付けます。
+    """
+    video_filter = []
+    if resolution:
+        width, height = resolution.split('x')
+        video_filter = ['-vf', f'scale={width}:{height}:force_original_aspect_ratio=decrease:flags=neighbor,'
+                               f'pad={width}:{height}:(ow-iw)/2:(oh-ih)/2']
+    return [
+        'ffmpeg', '-loglevel', 'error',
+        '-f', 'rawvideo',
+        '-pix_fmt', 'gray',
+        '-s', f'{WIDTH}x{HEIGHT}',
+        '-framerate', str(FRAME_RATE),
+        '-i', '-',
+        *video_filter,
+        '-c:v', 'libx264',
+        '-preset', 'veryfast',
+        '-pix_fmt', 'yuv420p',
+        '-r', str(fps),
+        output,
+        '-y'
+    ]
+
+
+def render_clip(states, output=None, fps=FRAME_RATE, resolution=None):
+    """
+    状態の列を描画し、ffmpeg の標準入力に流して動画にする
+
+    Args:
+        states (iterable): (ball_x, ball_y, ai_y, player_y, served) の列（simulated_states() など）
+        output (str, optional): 出力する動画ファイル（Noneの場合は描画だけ行う）
+        fps (int): 出力動画のフレームレート
+        resolution (str, optional): 出力動画の解像度（'1920x1080' など）
+
+    Returns:
+        int: 描画したフレーム数
+    """
+    renderer = GameplayRenderer()
+    process = subprocess.Popen(ffmpeg_command(output, fps, resolution), stdin=subprocess.PIPE) if output else None
+    frames = 0
+    with span('gameplay', 'frames', output=output):
+        try:
+            for state in states:
+                frame = renderer.draw(*state)
+                if process is not None:
+                    process.stdin.write(frame.data)
+                frames += 1
+        finally:
+            if process is not None:
+                process.stdin.close()
+                if process.wait() != 0:
+                    raise RuntimeError(f'ffmpeg failed with exit code {process.returncode}')
+    return frames
+
+
+def main():
+    """Main function to render simulated gameplay footage."""
+    parser = argparse.ArgumentParser(description='Render simulated gameplay and stream it to ffmpeg')
+    parser.add_argument('--seconds', type=float, default=30, help='clip length in seconds (default: 30)')
+    parser.add_argument('--difficulty', choices=sorted(game_engine.DIFFICULTY_PRESETS), default='medium',
+                        help='AI difficulty preset')
+    parser.add_argument('--player', choices=sorted(game_engine.PLAYER_MODELS), default='follow',
+                        help='player model')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the simulated match')
+    parser.add_argument('--replay', help='render a recorded replay file instead of simulating a match')
+    parser.add_argument('--point', type=int, help='with --replay, render only this point (rally) of the replay')
+    parser.add_argument('--output', default='gameplay.mp4', help='output video file')
+    parser.add_argument('--fps', type=int, default=FRAME_RATE, help=f'output frame rate (default: {FRAME_RATE})')
+    parser.add_argument('--resolution', help='scale and pad to WxH (e.g. 1920x1080, default: 800x400)')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='render without ffmpeg and report the rendering speed only')
+    args = parser.parse_args()
+
+    max_frames = int(args.seconds * FRAME_RATE)
+    if args.replay:
+        reader = ReplayReader(args.replay)
+        start, stop = reader.point_frames(args.point) if args.point is not None else (0, reader.frame_count)
+        states = reader.states(start, min(stop, start + max_frames + 1))
+    else:
+        states = simulated_states(args.difficulty, args.player, args.seed, max_frames=max_frames)
+    if args.benchmark:
+        # シミュレーションの時間を除くため、先に状態を作っておく
+        states = list(states)
+
+    start_time = time.perf_counter()
+    frames = render_clip(states, None if args.benchmark else args.output, args.fps, args.resolution)
+    elapsed = time.perf_counter() - start_time
+
+    clip_seconds = frames / FRAME_RATE
+    print(f"{'Rendered' if args.benchmark else 'Encoded'} {frames} frames ({clip_seconds:.1f}s of gameplay) "
+          f"in {elapsed:.2f}s: {frames / elapsed:.0f} fps, {clip_seconds / elapsed:.1f}x real time")
+    if not args.benchmark:
+        print(f"Saved {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
 """
 Generate audio files for each scene using macOS say command or espeak on Linux
+
+Narration is split into sentences that are synthesized in parallel and stitched
+into one MP3 per scene. Synthesized sentences are kept in the audio cache
+(.audio_cache/), so editing one sentence only re-synthesizes that sentence.
 """
 
 import os
 import subprocess
 import time
 import sys
+from audio_cache import AudioCache
+from audio_durations import probe_durations
+from tts_engine import SystemTTSBackend, synthesize_scenes
 
 # Define the narration text for each scene
 scenes = [
@@ -102,10 +109,6 @@ UI要素を非表示にしてゲームに集中できる環境を作ります。
     }
 ]
 
-# Create audio directory if it doesn't exist
-os.makedirs('audio', exist_ok=True)
-
-# Detect OS and set TTS system
 def detect_tts_system():
     """Detect available TTS system"""
     try:
@@ -124,119 +127,100 @@ def detect_tts_system():
 
     return None
 
-tts_system = detect_tts_system()
-
-if tts_system == 'macos':
-    # macOS settings
-    voice = 'Kyoko'  # Female Japanese voice
-    rate = 225  # Speech rate (words per minute) - 1.5x faster than default 150
-    print(f"Using macOS say command with voice: {voice}")
-    print(f"Speech rate: {rate} words per minute\n")
-elif tts_system == 'linux':
-    print("Using Linux espeak for audio generation\n")
-else:
-    print("No suitable TTS system found. Please install:")
-    print("- macOS: say command (built-in)")
-    print("- Linux: sudo apt-get install espeak espeak-data-ja")
-    sys.exit(1)
-
-# Generate audio for each scene
-for scene in scenes:
-    output_file = f"audio/{scene['id']}_narration.aiff"
-    mp3_file = f"audio/{scene['id']}_narration.mp3"
-
-    print(f"Generating audio for {scene['id']}...")
+
+def create_backend():
+    """Create the TTS backend for this OS, or None if no TTS system is installed"""
+    tts_system = detect_tts_system()
 
     if tts_system == 'macos':
-        # Create the say command
-        cmd = [
-            'say',
-            '-v', voice,
-            '-r', str(rate),
-            '-o', output_file,
-            scene['text']
-        ]
+        # macOS settings
+        engine = 'say'
+        voice = 'Kyoko'  # Female Japanese voice
+        rate = 225  # Speech rate (words per minute) - 1.5x faster than default 150
+        print(f"Using macOS say command with voice: {voice}")
+        print(f"Speech rate: {rate} words per minute\n")
     elif tts_system == 'linux':
-        # Create the espeak command
-        cmd = [
-            'espeak',
-            '-v', 'ja',  # Japanese voice
-            '-s', '150',  # Speed (words per minute)
-            '-w', output_file,  # Output to wav file
-            scene['text']
-        ]
+        engine = 'espeak'
+        voice = 'ja'  # Japanese voice
+        rate = 150  # Speed (words per minute)
+        print("Using Linux espeak for audio generation\n")
+    else:
+        print("No suitable TTS system found. Please install:")
+        print("- macOS: say command (built-in)")
+        print("- Linux: sudo apt-get install espeak espeak-data-ja")
+        return None
 
-    try:
-        # Execute the command
-        subprocess.run(cmd, check=True)
-        print(f"  ✓ Saved to {output_file}")
-
-        # Get file info
-        if os.path.exists(output_file):
-            file_size = os.path.getsize(output_file) / 1024 / 1024  # MB
-            print(f"  File size: {file_size:.2f} MB")
-
-    except subprocess.CalledProcessError as e:
-        print(f"  ✗ Error generating audio: {e}")
-        continue
-    except Exception as e:
-        print(f"  ✗ Unexpected error: {e}")
-        continue
-
-print("\nConverting audio files to MP3...")
-
-# Convert audio to MP3 for smaller file size
-for scene in scenes:
-    if tts_system == 'macos':
-        input_file = f"audio/{scene['id']}_narration.aiff"
+    return SystemTTSBackend(engine, voice, rate, lang='ja')
+
+
+def report(result):
+    """Print the result of one scene as soon as it is stitched"""
+    if not result['ok']:
+        print(f"  ✗ Error generating audio for {result['id']}: {result['error']}")
+    elif result['cached']:
+        print(f"  ✓ Restored {result['output']} from audio cache")
+    else:
+        file_size = os.path.getsize(result['output']) / 1024 / 1024  # MB
+        print(f"  ✓ Saved to {result['output']} ({file_size:.2f} MB, "
+              f"{result['synthesized']}/{result['chunks']} sentences synthesized)")
+
+
+def generate_audio(backend):
+    """
+    Synthesize all scenes sentence by sentence with a local TTS backend
+
+    Returns:
+        list: ids of the scenes that could not be generated
+    """
+    # Create audio directory if it doesn't exist
+    os.makedirs('audio', exist_ok=True)
+
+    # Audio cache keyed by (normalized text, engine, voice, rate, lang)
+    audio_cache = AudioCache()
+
+    # Local TTS has no rate limit
+    print("Generating audio sentence by sentence...")
+    jobs = [(scene['id'], scene['text'], f"audio/{scene['id']}_narration.mp3") for scene in scenes]
+    results = synthesize_scenes(jobs, backend, on_result=report, concurrency=os.cpu_count() or 1,
+                                rate=0, retries=1, cache=audio_cache)
+
+    failed = [result['id'] for result in results if not result['ok']]
+    if not failed:
+        print("\nAll audio files generated successfully!")
     else:
-        input_file = f"audio/{scene['id']}_narration.wav"
-
-    mp3_file = f"audio/{scene['id']}_narration.mp3"
-
-    if os.path.exists(input_file):
-        print(f"Converting {scene['id']}...")
-        cmd = [
-            'ffmpeg',
-            '-i', input_file,
-            '-acodec', 'mp3',
-            '-ab', '128k',
-            mp3_file,
-            '-y'  # Overwrite output file
-        ]
-
-        try:
-            subprocess.run(cmd, check=True, capture_output=True)
-            print(f"  ✓ Converted to {mp3_file}")
-
-            # Remove the original file
-            os.remove(input_file)
-            print(f"  ✓ Removed {input_file}")
-
-        except subprocess.CalledProcessError as e:
-            print(f"  ✗ Error converting to MP3: {e}")
-        except Exception as e:
-            print(f"  ✗ Unexpected error: {e}")
-
-print("\nAll audio files generated successfully!")
-
-# Calculate duration of each audio file
-print("\nAudio file durations:")
-for scene in scenes:
-    mp3_file = f"audio/{scene['id']}_narration.mp3"
-    if os.path.exists(mp3_file):
-        # Get duration using ffprobe
-        cmd = [
-            'ffprobe',
-            '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            mp3_file
-        ]
-
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            duration = float(result.stdout.strip())
-            print(f"  {scene['id']}: {duration:.1f} seconds")
-        except:
-            print(f"  {scene['id']}: Unable to get duration")
\ No newline at end of file
+        print("\nSome audio files could not be generated. Check the output above.")
+
+    stats = audio_cache.stats()
+    print(f"Audio cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, "
+          f"{stats['entries']} entries ({stats['bytes'] / 1024 / 1024:.1f} MB)")
+    return failed
+
+
+def show_durations():
+    """Print the duration of each scene's audio file"""
+    # 一括で取得して audio/durations.json に保存（create_video.py がそのまま再利用）
+    print("\nAudio file durations:")
+    durations = probe_durations([f"audio/{scene['id']}_narration.mp3" for scene in scenes])
+    for scene in scenes:
+        mp3_file = f"audio/{scene['id']}_narration.mp3"
+        if mp3_file in durations:
+            print(f"  {scene['id']}: {durations[mp3_file]:.1f} seconds")
+        elif os.path.exists(mp3_file):
+            print(f"  {scene['id']}: Unable to get duration")
+
+
+def main():
+    """Main function to generate narration audio with the local TTS system."""
+    backend = create_backend()
+    if backend is None:
+        return 1
+
+    failed = generate_audio(backend)
+
+    # Calculate duration of each audio file
+    show_durations()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,26 +8,34 @@ Google TTSサービスを利用します。
 
 出力:
     audio/フォルダに scene01_narration.mp3 から scene12_narration.mp3 まで12個のMP3ファイル
+
+ナレーション文と音声設定が前回と同じシーンは、再生成をスキップします
+（build_cache.py のマニフェストで判定）。
+
+各シーンの合成は tts_engine.py により、同時実行数とリクエスト頻度を制限しながら
+並列に実行され、失敗時は指数バックオフで再試行されます。
+ナレーションは文単位のチャンクに分割して並列に合成し、シーンごとのMP3に結合します。
+合成済みのチャンクは audio_cache.py により .audio_cache/ に保存され、
+1文だけ編集した場合はその文のチャンクだけが再合成されます。
+
+使用方法:
+    python generate_audio_gtts.py [--jobs 4] [--rate 2.0] [--retries 4]
+    python generate_audio_gtts.py --fake   # ネットワークを使わない疑似バックエンドで動作確認
 """
 
+import argparse    # コマンドライン引数の解析用
+import importlib.util  # gTTSの存在確認（読み込みはしない）用
 import os          # ディレクトリ作成とファイル操作用
-import subprocess  # 外部コマンド実行（pip install、ffprobe）用
-import time        # 時間操作用（将来の拡張用）
+import subprocess  # 外部コマンド実行（pip install）用
+import time        # 処理時間の計測用
 import sys         # システム操作とpipインストール用
+from audio_cache import AudioCache  # 合成済み音声のキャッシュ
+from audio_durations import probe_durations  # 音声の長さの一括取得用
+from build_cache import BuildCache, content_key  # 差分ビルド用
+from tts_engine import MAX_CHUNK_CHARS, FakeTTSBackend, GTTSBackend, synthesize_scenes  # 並列音声合成用
 
-# Google Text-to-Speechライブラリのインポートと自動インストール
-# gTTSが利用できない場合は自動的にインストールを試行
-try:
-    from gtts import gTTS    # Google Text-to-Speech メインクラス
-    import tempfile          # 一時ファイル処理用
-    print("gTTS (Google Text-to-Speech) を使用します")
-except ImportError:
-    # gTTSがインストールされていない場合の自動インストール
-    print("gTTS が見つかりません。インストールを開始...")
-    subprocess.run([sys.executable, '-m', 'pip', 'install', '--break-system-packages', 'gtts'], check=True)
-    from gtts import gTTS
-    import tempfile
-    print("gTTS のインストールが完了し、使用準備ができました")
+# 音声の出力先ディレクトリ
+OUTPUT_DIR = 'audio'
 
 # Define the narration text for each scene
 scenes = [
@@ -123,56 +131,176 @@ UI要素を非表示にしてゲームに集中できる環境を作ります。
     }
 ]
 
-# Create audio directory if it doesn't exist
-os.makedirs('audio', exist_ok=True)
-
-print("Generating audio files using gTTS...")
-print("Language: Japanese (ja)")
-print("Output format: MP3 (via gTTS)\n")
-
-# Generate audio for each scene
-for scene in scenes:
-    mp3_file = f"audio/{scene['id']}_narration.mp3"
-
-    print(f"Generating audio for {scene['id']}...")
-
-    try:
-        # Create gTTS object
-        tts = gTTS(text=scene['text'], lang='ja', slow=False)
-
-        # Save to file
-        tts.save(mp3_file)
-        print(f"  ✓ Saved to {mp3_file}")
-
-        # Get file info
-        if os.path.exists(mp3_file):
-            file_size = os.path.getsize(mp3_file) / 1024 / 1024  # MB
-            print(f"  File size: {file_size:.2f} MB")
-
-    except Exception as e:
-        print(f"  ✗ Error generating audio: {e}")
-        continue
-
-# メイン処理完了メッセージ
-print("\n全ての音声ファイルが正常に生成されました！")
-
-# Calculate duration of each audio file
-print("\nAudio file durations:")
-for scene in scenes:
-    mp3_file = f"audio/{scene['id']}_narration.mp3"
-    if os.path.exists(mp3_file):
-        # Get duration using ffprobe if available
-        cmd = [
-            'ffprobe',
-            '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            mp3_file
-        ]
-
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            duration = float(result.stdout.strip())
-            print(f"  {scene['id']}: {duration:.1f} seconds")
-        except:
-            print(f"  {scene['id']}: Duration unknown (ffprobe not available)")
\ No newline at end of file
+
+def narration_path(scene):
+    """シーンの音声ファイルのパス"""
+    return f"{OUTPUT_DIR}/{scene['id']}_narration.mp3"
+
+
+def narration_cache_key(scene, backend, chunked=True, max_chars=MAX_CHUNK_CHARS):
+    """
+    ナレーション音声のキャッシュキー（ナレーション文と音声設定から計算）
+
+    文単位に分割して結合した音声とシーン全体を1回で合成した音声は別の成果物として扱うため、
+    分割の有無と1チャンクの最大文字数もキーに含めます。
+    """
+    return content_key('tts', scene['text'], backend.name, 'ja', False, chunked, max_chars if chunked else None)
+
+
+def create_backend(fake=False, fake_failure_rate=0.2):
+    """
+    音声合成バックエンドを作成
+
+    Args:
+        fake (bool): Trueの場合、ネットワークを使わない疑似バックエンド
+        fake_failure_rate (float): 疑似バックエンドの失敗確率
+
+    Returns:
+        音声合成バックエンド
+    """
+    if fake:
+        print("疑似TTSバックエンド（オフライン）を使用します")
+        return FakeTTSBackend(failure_rate=fake_failure_rate)
+
+    # Google Text-to-Speechライブラリの確認と自動インストール
+    # ここでは存在だけを確認し、読み込みは実際に合成するとき（GTTSBackend.synthesize）まで遅らせる
+    # （全シーンがキャッシュ済みの場合は gtts を読み込まずに済む）
+    if importlib.util.find_spec('gtts') is not None:
+        print("gTTS (Google Text-to-Speech) を使用します")
+    else:
+        # gTTSがインストールされていない場合の自動インストール
+        print("gTTS が見つかりません。インストールを開始...")
+        subprocess.run([sys.executable, '-m', 'pip', 'install', '--break-system-packages', 'gtts'], check=True)
+        importlib.invalidate_caches()
+        print("gTTS のインストールが完了し、使用準備ができました")
+    return GTTSBackend(lang='ja', slow=False)
+
+
+def report(result):
+    """1シーンの合成完了時に結果を表示"""
+    if result['ok'] and result['cached']:
+        print(f"  ✓ {result['id']}: restored {result['output']} from audio cache")
+    elif result['ok']:
+        file_size = os.path.getsize(result['output']) / 1024 / 1024  # MB
+        print(f"  ✓ {result['id']}: saved to {result['output']} ({file_size:.2f} MB, "
+              f"{result['synthesized']}/{result['chunks']} chunk(s) synthesized, "
+              f"{result['attempts']} request(s))")
+    else:
+        print(f"  ✗ {result['id']}: error generating audio after {result['attempts']} attempt(s): "
+              f"{result['error']}")
+
+
+def generate_audio(backend, jobs=4, rate=2.0, retries=4, use_audio_cache=True, chunked=True):
+    """
+    全シーンのナレーション音声を生成
+
+    ナレーション文と音声設定が前回と同じシーンはスキップし、残りを並列に合成します。
+
+    Args:
+        backend: 音声合成バックエンド（create_backend() の戻り値）
+        jobs (int): 同時に実行するTTSリクエストの数
+        rate (float): 1秒あたりのTTSリクエスト数の上限（0: 制限なし）
+        retries (int): シーンごとの再試行回数
+        use_audio_cache (bool): 合成済みのチャンクをキャッシュから取り出す場合True
+        chunked (bool): Falseの場合はシーン全体を1回で合成
+
+    Returns:
+        list: 生成に失敗したシーンIDのリスト
+    """
+    # Create audio directory if it doesn't exist
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    print(f"Generating audio files using {backend.name}...")
+    print("Language: Japanese (ja)")
+    print(f"Concurrency: {jobs}, rate limit: {rate} requests/s, retries: {retries}")
+    print("Output format: MP3\n")
+
+    # ビルドキャッシュ（ナレーション文と音声設定が同じシーンはスキップ）
+    cache = BuildCache('audio')
+
+    # 合成が必要なシーンの判定
+    stale = []
+    keys = {}
+    reasons = {}
+    for scene in scenes:
+        mp3_file = narration_path(scene)
+        keys[mp3_file] = narration_cache_key(scene, backend, chunked)
+
+        fresh, reason = cache.check(mp3_file, keys[mp3_file])
+        if fresh:
+            print(f"Skipping {scene['id']} ({reason})")
+            cache.record(mp3_file, keys[mp3_file], rebuilt=False, reason=reason)
+            continue
+
+        reasons[mp3_file] = reason
+        stale.append((scene['id'], scene['text'], mp3_file))
+
+    # 全シーンを並列に合成
+    audio_cache = AudioCache() if use_audio_cache else None
+    start_time = time.perf_counter()
+    results = synthesize_scenes(stale, backend, chunked=chunked, on_result=report,
+                                concurrency=jobs, rate=rate, retries=retries, cache=audio_cache)
+
+    failed = []
+    for result in results:
+        if result['ok']:
+            cache.record(result['output'], keys[result['output']], rebuilt=True, reason=reasons[result['output']])
+        else:
+            cache.forget(result['output'])
+            failed.append(result['id'])
+
+    cache.save()
+
+    # メイン処理完了メッセージ
+    print(f"\n{len(stale)}シーンの合成に {time.perf_counter() - start_time:.1f}秒かかりました")
+    if audio_cache is not None:
+        stats = audio_cache.stats()
+        print(f"Audio cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, "
+              f"{stats['entries']} entries ({stats['bytes'] / 1024 / 1024:.1f} MB)")
+    if failed:
+        print(f"✗ 音声の生成に失敗したシーン: {', '.join(failed)}")
+    else:
+        print("全ての音声ファイルが正常に生成されました！")
+    return failed
+
+
+def show_durations():
+    """各シーンの音声の長さを表示"""
+    # 一括で取得して audio/durations.json に保存（create_video.py がそのまま再利用）
+    print("\nAudio file durations:")
+    durations = probe_durations([narration_path(scene) for scene in scenes])
+    for scene in scenes:
+        mp3_file = narration_path(scene)
+        if mp3_file in durations:
+            print(f"  {scene['id']}: {durations[mp3_file]:.1f} seconds")
+        elif os.path.exists(mp3_file):
+            print(f"  {scene['id']}: Unable to get duration")
+
+
+def main():
+    """Main function to generate narration audio for all scenes."""
+    parser = argparse.ArgumentParser(description='Generate narration audio with gTTS')
+    parser.add_argument('--jobs', '-j', type=int, default=4, help='number of concurrent TTS requests')
+    parser.add_argument('--rate', type=float, default=2.0, help='maximum TTS requests per second (0: unlimited)')
+    parser.add_argument('--retries', type=int, default=4, help='retries per scene on failure')
+    parser.add_argument('--no-audio-cache', action='store_true', help='always re-synthesize narration')
+    parser.add_argument('--no-chunking', action='store_true',
+                        help='synthesize each scene in one request instead of sentence by sentence')
+    parser.add_argument('--fake', action='store_true',
+                        help='use an offline fake backend that injects latency and failures')
+    parser.add_argument('--fake-failure-rate', type=float, default=0.2, help='failure probability of the fake backend')
+    args = parser.parse_args()
+
+    backend = create_backend(args.fake, args.fake_failure_rate)
+    failed = generate_audio(backend, jobs=args.jobs, rate=args.rate, retries=args.retries,
+                            use_audio_cache=not args.no_audio_cache, chunked=not args.no_chunking)
+
+    # Calculate duration of each audio file
+    show_durations()
+
+    # 失敗したシーンがある場合はパイプラインに伝えるためエラー終了
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
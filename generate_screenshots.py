@@ -7,16 +7,32 @@ index.htmlファイルを12のセクションに分割し、各セクション
 
 出力:
     pic/フォルダに scene01_xxx.png から scene12_xxx.png まで12枚の画像
+
+使用方法:
+    python generate_screenshots.py [--jobs N] [--force] [--compare-timing]
+
+ソースコードの該当行と描画設定が前回と同じシーンは、再生成をスキップします
+（build_cache.py のマニフェストで判定）。
 """
 
-import os    # ディレクトリ作成とファイル操作用
-import sys   # システム操作用
+import argparse  # コマンドライン引数の解析用
+import itertools # 全シーンへの同じ引数の受け渡し用
+import os        # ディレクトリ作成とファイル操作用
+import sys       # システム操作用
+import time      # 処理時間の計測用
+from concurrent.futures import ProcessPoolExecutor  # シーンの並列描画用
+from build_cache import BuildCache, content_key, hash_file  # 差分ビルド用
 from code_to_image_simple import SimpleCodeImageGenerator  # 画像生成クラス
+from profiler import span  # 処理時間の計測用
+
+# ソースコードファイルと出力ディレクトリ
+SOURCE_FILE = 'index.html'
+OUTPUT_DIR = 'pic'
 
-# ソースコードファイル（index.html）の読み込み
-# UTF-8エンコーディングで行ごとにリストとして読み込み
-with open('index.html', 'r', encoding='utf-8') as f:
-    lines = f.readlines()
+# 画像生成器の設定
+# ライトテーマを使用（印刷時やプレゼンテーションでの視認性向上のため）
+# フォントサイズは16px（デフォルトの14pxより大きくして読みやすく）
+GENERATOR_SETTINGS = {'theme': 'light', 'font_size': 16}
 
 # シーン定義：各セクションの行番号範囲と出力ファイル名
 # テニスゲームのコードを12の論理的なセクションに分割
@@ -35,32 +51,187 @@ scenes = [
     {'name': 'scene12_difficulty_start', 'start': 305, 'end': 338}
 ]
 
-# 出力ディレクトリ 'pic' の作成（既存の場合は何もしない）
-os.makedirs('pic', exist_ok=True)
+# プロセスごとに一度だけ用意する画像生成器
+# （ソースコードは呼び出し側が読み込んだものを render_scene() に渡し、キャッシュキーと同じ内容を描画する）
+_generator = None
 
-# 画像生成器のインスタンス作成
-# ライトテーマを使用（印刷時やプレゼンテーションでの視認性向上のため）
-# フォントサイズは16px（デフォルトの14pxより大きくして読みやすく）
-generator = SimpleCodeImageGenerator(theme='light', font_size=16)
 
-print("テニスゲームのスクリーンショット生成を開始...")
+def _init_worker():
+    """
+    描画プロセスの初期化
+
+    フォントの読み込みとトークナイザーの正規表現のコンパイルをプロセスごとに一度だけ行い、
+    以降のシーン描画で共有します。
+    """
+    global _generator
+
+    _generator = SimpleCodeImageGenerator(**GENERATOR_SETTINGS)
+    _generator._get_scaled_font(_generator.render_scale)
+    _generator._get_token_regex('css')
+    _generator._get_token_regex('script')
+
+
+def get_generator():
+    """
+    このプロセスの画像生成器を取得
+
+    初回だけ _init_worker() で作成し、以降は同じオブジェクト（読み込み済みのフォントと
+    コンパイル済みの正規表現）を返します。同じプロセス内の他の処理（memory_pipeline.py など）も共有します。
+    """
+    if _generator is None:
+        _init_worker()
+    return _generator
+
+
+def scene_output_path(scene):
+    """シーンの出力ファイルパスを取得"""
+    return f"{OUTPUT_DIR}/{scene['name']}.png"
+
+
+def scene_title(scene):
+    """シーン画像のタイトル（ファイル名と行番号範囲）"""
+    return f"{SOURCE_FILE} - Lines {scene['start']}-{scene['end']}"
+
+
+def scene_cache_key(scene, source_lines):
+    """
+    シーン画像のキャッシュキーを計算
+
+    対象行のソースコード、タイトル、描画設定、画像生成モジュール自体の内容から計算します。
+    """
+    scene_code = ''.join(source_lines[scene['start']-1:scene['end']])
+    return content_key('screenshot', scene_code, scene_title(scene), GENERATOR_SETTINGS,
+                       hash_file('code_to_image_simple.py'))
+
+
+def render_scene(scene, source_lines):
+    """
+    1シーン分のスクリーンショットを生成
+
+    Args:
+        scene (dict): シーン定義（name, start, end）
+        source_lines (list): ソースコードの行のリスト（scene_cache_key() に渡したものと同じ）
+
+    Returns:
+        tuple: (出力ファイルパス, 処理時間（秒）)
+    """
+    generator = get_generator()
+    start_time = time.perf_counter()
 
-# 各シーンのスクリーンショット生成ループ
-for scene in scenes:
     # 対象行の抽出（Pythonのインデックスは0から始まるため-1）
-    scene_lines = lines[scene['start']-1:scene['end']]
+    scene_lines = source_lines[scene['start']-1:scene['end']]
     # リストの行を結合して文字列に変換
     scene_code = ''.join(scene_lines)
 
     # 出力ファイルパスとタイトルの生成
-    output_path = f"pic/{scene['name']}.png"
-    title = f"index.html - Lines {scene['start']}-{scene['end']}"
+    output_path = scene_output_path(scene)
+    title = scene_title(scene)
 
     # 進行状況の表示
     print(f"Generating {output_path}...")
     # 実際の画像生成処理を実行
-    generator.generate_image(scene_code, output_path, title=title)
+    with span('render', 'screenshots', scene=scene['name']):
+        generator.generate_image(scene_code, output_path, title=title)
+    return output_path, time.perf_counter() - start_time
+
+
+def generate_screenshots(jobs=1, use_cache=True):
+    """
+    全シーンのスクリーンショットを生成
+
+    jobs が2以上の場合はプロセスプールで並列に描画します。
+    結果はシーン定義の順に返され、出力ファイル名も常に同じです。
+    use_cache がTrueの場合、入力が前回と同じシーンは描画をスキップします。
+
+    Args:
+        jobs (int): 並列プロセス数（1の場合は逐次処理）
+        use_cache (bool): ビルドキャッシュを使用する場合True
+
+    Returns:
+        list: シーン順の (出力ファイルパス, 処理時間（秒）) のリスト（スキップしたシーンは0秒）
+    """
+    # 出力ディレクトリ 'pic' の作成（既存の場合は何もしない）
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    with open(SOURCE_FILE, 'r', encoding='utf-8') as f:
+        source_lines = f.readlines()
+
+    # 再生成が必要なシーンの判定
+    cache = BuildCache('screenshots')
+    keys = {}
+    stale = []
+    for scene in scenes:
+        output_path = scene_output_path(scene)
+        keys[output_path] = scene_cache_key(scene, source_lines)
+        fresh, reason = cache.check(output_path, keys[output_path]) if use_cache else (False, 'cache disabled')
+        if fresh:
+            print(f"Skipping {output_path} ({reason})")
+            cache.record(output_path, keys[output_path], rebuilt=False, reason=reason)
+        else:
+            stale.append((scene, reason))
+
+    stale_scenes = [scene for scene, _ in stale]
+    if jobs <= 1 or len(stale_scenes) <= 1:
+        rendered = [render_scene(scene, source_lines) for scene in stale_scenes]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(stale_scenes)), initializer=_init_worker) as executor:
+            rendered = list(executor.map(render_scene, stale_scenes, itertools.repeat(source_lines)))
+
+    for (scene, reason), (output_path, _) in zip(stale, rendered):
+        cache.record(output_path, keys[output_path], rebuilt=True, reason=reason)
+    cache.save()
+
+    timings = dict(rendered)
+    return [(scene_output_path(scene), timings.get(scene_output_path(scene), 0.0)) for scene in scenes]
+
+
+def compare_timing(jobs):
+    """
+    逐次処理と並列処理の所要時間（ウォールクロック）を比較して表示
+
+    Args:
+        jobs (int): 並列処理のプロセス数
+    """
+    timings = {}
+    for label, job_count in (('sequential', 1), (f'parallel ({jobs} jobs)', jobs)):
+        start_time = time.perf_counter()
+        results = generate_screenshots(job_count, use_cache=False)
+        timings[label] = (time.perf_counter() - start_time, sum(seconds for _, seconds in results))
+
+    print("\nTiming report:")
+    for label, (wall, cpu_sum) in timings.items():
+        print(f"  {label:24s} wall {wall:7.2f}s  (sum of scene times {cpu_sum:7.2f}s)")
+    sequential_wall = timings['sequential'][0]
+    parallel_wall = timings[f'parallel ({jobs} jobs)'][0]
+    print(f"  speedup: {sequential_wall / parallel_wall:.2f}x")
+
+
+def main():
+    """Main function to generate all scene screenshots."""
+    parser = argparse.ArgumentParser(description='Generate code screenshots for each scene')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help='number of parallel render processes (default: all cores, 1: sequential)')
+    parser.add_argument('--force', action='store_true',
+                        help='re-render every scene even if its inputs are unchanged')
+    parser.add_argument('--compare-timing', action='store_true',
+                        help='render sequentially and in parallel and report wall-clock times')
+    args = parser.parse_args()
+
+    print("テニスゲームのスクリーンショット生成を開始...")
+
+    if args.compare_timing:
+        compare_timing(max(args.jobs, 2))
+        return 0
+
+    start_time = time.perf_counter()
+    results = generate_screenshots(args.jobs, use_cache=not args.force)
+
+    # 処理完了メッセージ
+    print(f"\n✓ 全{len(results)}枚のスクリーンショットが正常に生成されました！"
+          f"（{time.perf_counter() - start_time:.1f}秒, {max(args.jobs, 1)}並列）")
+    print("スクリーンショットは 'pic' ディレクトリに保存されています。")
+    return 0
+
 
-# 処理完了メッセージ
-print(f"\n✓ 全{len(scenes)}枚のスクリーンショットが正常に生成されました！")
-print("スクリーンショットは 'pic' ディレクトリに保存されています。")
\ No newline at end of file
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+コードスライドの行ハイライトのアニメーション
+
+ナレーションの進行に合わせて、コードのスライド上でハイライトの帯を行から行へ動かします。
+
+- スライドは SimpleCodeImageGenerator.render_to_frame() で一度だけ描画し、ベースフレームにする
+- 帯をかけた状態（ベースにハイライトの色を重ねた画像）も最初に1枚だけ作っておく
+- 各フレームでは、帯が動いて前のフレームから変わった行の矩形（ダーティ矩形）だけを
+  ベースまたは帯付きの画像からコピーする（帯が止まっている間は何もしない）
+
+コードの再描画や色の合成をフレームごとに行わないため、動画にしても静止画のスライドとほぼ同じ負荷で済みます。
+
+ナレーションの文とコードの行の対応は台本にないため、空行で区切ったコードのまとまり（ブロック）ごとに、
+文字数に比例した時間をナレーションの長さから割り当てます。
+ブロックが切り替わると、帯は TRANSITION_SECONDS 秒かけて次のブロックへ移動します。
+
+使用方法:
+    python highlight_animation.py [--scene scene08] [--duration 25] [--output preview.mp4] [--benchmark]
+"""
+
+import argparse  # コマンドライン引数の解析用
+import bisect    # 時刻からブロックを探す用
+import math      # フレーム数の計算用
+import subprocess  # ffmpegコマンド実行用
+import sys       # 終了コード用
+import time      # 処理時間の計測用
+
+import numpy as np
+from PIL import ImageColor
+
+from audio_durations import probe_durations  # 音声の長さの取得用
+from create_video import fps as video_fps  # 解説動画のフレームレート
+from generate_screenshots import SOURCE_FILE, get_generator, scene_title, scenes  # シーン定義と画像生成器
+from resize_screenshots import BACKGROUND_COLOR, FILL_RATIO, TARGET_HEIGHT, TARGET_WIDTH  # フレームの設定
+
+# ハイライトの設定
+HIGHLIGHT_COLOR = '#ffcc00'  # 帯の色
+HIGHLIGHT_ALPHA = 0.3        # 帯の色の不透明度（コードの文字が読めるよう薄くする）
+ACCENT_WIDTH = 6             # 帯の左端に付ける不透明な縦線の幅（ピクセル）
+MAX_BLOCK_LINES = 8          # 1回にハイライトする最大行数（長いまとまりは均等に分割）
+TRANSITION_SECONDS = 0.25    # 次のブロックへ帯が移動する時間
+
+
+def highlight_blocks(lines, max_lines=MAX_BLOCK_LINES):
+    """
+    空行で区切ったコードのまとまりを、ハイライトする単位（ブロック）に分ける
+
+    max_lines 行を超えるまとまりは、ほぼ同じ行数のブロックに分割します。
+
+    Args:
+        lines (list): コードの行のリスト
+        max_lines (int): 1ブロックの最大行数
+
+    Returns:
+        list: (開始行, 終了行, 文字数) のリスト（行は0始まり、終了行は含まない。文字数は前後の空白を除く）
+    """
+    runs = []
+    start = None
+    for index, line in enumerate(lines + ['']):
+        if line.strip() and start is None:
+            start = index
+        elif not line.strip() and start is not None:
+            runs.append((start, index))
+            start = None
+
+    blocks = []
+    for start, end in runs:
+        parts = math.ceil((end - start) / max_lines)
+        bounds = [start + round((end - start) * part / parts) for part in range(parts + 1)]
+        for first, last in zip(bounds, bounds[1:]):
+            blocks.append((first, last, sum(len(line.strip()) for line in lines[first:last])))
+    return blocks
+
+
+def highlight_schedule(blocks, duration):
+    """
+    ブロックごとのハイライトの開始時刻を、文字数に比例して duration 秒に割り当てる
+
+    Returns:
+        list: blocks と同じ順序の開始時刻（秒）のリスト
+    """
+    total = sum(chars for _, _, chars in blocks)
+    starts = []
+    elapsed = 0.0
+    for _, _, chars in blocks:
+        starts.append(elapsed)
+        elapsed += duration * chars / total if total else duration / len(blocks)
+    return starts
+
+
+def _smoothstep(progress):
+    """0〜1の進み具合を、動き始めと終わりがなめらかな値に変換"""
+    return progress * progress * (3 - 2 * progress)
+
+
+def _row_difference(rows, other):
+    """行範囲 rows = [top, bottom) のうち other に含まれない部分（最大2つの行範囲）"""
+    top, bottom = rows
+    pieces = [(top, min(bottom, other[0])), (max(top, other[1]), bottom)]
+    return [(start, end) for start, end in pieces if start < end]
+
+
+class HighlightAnimation:
+    """
+    ベースフレーム上でハイライトの帯を動かし、フレームを順に作成するクラス
+
+    frame は常に「ベースフレーム + 現在の帯」の状態に保たれ、move() は前の帯と新しい帯の
+    差分の行だけを書き換えます。書き換えた画素数は dirty_pixels に累計されます。
+    """
+
+    def __init__(self, frame, stats, code, duration, color=HIGHLIGHT_COLOR, alpha=HIGHLIGHT_ALPHA,
+                 max_lines=MAX_BLOCK_LINES):
+        """
+        Args:
+            frame (Image): render_to_frame() で描画したベースフレーム
+            stats (dict): 描画直後の last_render_stats（コード画像の配置位置と行のレイアウト）
+            code (str): 描画したソースコード
+            duration (float): ハイライトを動かす時間（ナレーションの長さ、秒）
+            color (str): 帯の色
+            alpha (float): 帯の色の不透明度
+            max_lines (int): 1ブロックの最大行数
+        """
+        self.base = np.array(frame.convert('RGB'), dtype=np.uint8)
+        self.frame = self.base.copy()
+
+        # コード領域（行番号を含む）の横の範囲と、各行の上端のy座標
+        offset_x, offset_y = stats['image_offset']
+        self.left = offset_x + stats['padding']
+        self.right = offset_x + stats['width'] - stats['padding']
+        line_top = offset_y + stats['content_top']
+        line_height = stats['line_height']
+
+        # 帯をかけた状態のコード領域を一度だけ作る（8ビットの固定小数点で色を重ね、左端に縦線）
+        weight = round(alpha * 256)
+        rgb = np.array(ImageColor.getrgb(color), dtype=np.uint16)
+        region = self.base[:, self.left:self.right].astype(np.uint16)
+        self.tinted = ((region * (256 - weight) + rgb * weight + 128) >> 8).astype(np.uint8)
+        self.tinted[:, :ACCENT_WIDTH] = rgb
+
+        blocks = highlight_blocks(code.split('\n'), max_lines)
+        self.starts = highlight_schedule(blocks, duration)
+        self.rows = [(line_top + first * line_height, line_top + last * line_height) for first, last, _ in blocks]
+        self.band = (0, 0)
+        self.dirty_pixels = 0
+
+    def band_at(self, seconds):
+        """時刻 seconds の帯の行範囲 (top, bottom)（ブロックの切り替わりでは前のブロックから移動中の位置）"""
+        if not self.rows:
+            return 0, 0
+        index = max(0, bisect.bisect_right(self.starts, seconds) - 1)
+        top, bottom = self.rows[index]
+        elapsed = seconds - self.starts[index]
+        if index > 0 and elapsed < TRANSITION_SECONDS:
+            progress = _smoothstep(elapsed / TRANSITION_SECONDS)
+            previous_top, previous_bottom = self.rows[index - 1]
+            top = round(previous_top + (top - previous_top) * progress)
+            bottom = round(previous_bottom + (bottom - previous_bottom) * progress)
+        return top, bottom
+
+    def move(self, band):
+        """帯を band = (top, bottom) に動かし、変化した行の矩形だけを書き換える"""
+        if band == self.band:
+            return
+        width = self.right - self.left
+        # 帯から外れた行はベースに戻し、新しく帯に入った行は帯付きの画像からコピー
+        for top, bottom in _row_difference(self.band, band):
+            self.frame[top:bottom, self.left:self.right] = self.base[top:bottom, self.left:self.right]
+            self.dirty_pixels += (bottom - top) * width
+        for top, bottom in _row_difference(band, self.band):
+            self.frame[top:bottom, self.left:self.right] = self.tinted[top:bottom]
+            self.dirty_pixels += (bottom - top) * width
+        self.band = band
+
+    def frames(self, total_duration, fps):
+        """
+        total_duration 秒分のフレームを順に返す
+
+        返すのは毎回同じバッファ（frame）のビューなので、次のフレームを要求する前に書き出してください。
+
+        Yields:
+            memoryview: RGB24の生データ
+        """
+        data = memoryview(self.frame).cast('B')
+        for index in range(math.ceil(total_duration * fps)):
+            self.move(self.band_at(index / fps))
+            yield data
+
+
+def preview_command(output, frame_size, fps):
+    """RGBの生フレームを標準入力から受け取って、音声なしのプレビュー動画にする ffmpeg コマンド"""
+    return [
+        'ffmpeg', '-loglevel', 'error',
+        '-f', 'rawvideo',
+        '-pix_fmt', 'rgb24',
+        '-s', f'{frame_size[0]}x{frame_size[1]}',
+        '-framerate', str(fps),
+        '-i', '-',
+        '-c:v', 'libx264',
+        '-preset', 'veryfast',
+        '-pix_fmt', 'yuv420p',
+        output,
+        '-y'
+    ]
+
+
+def main():
+    """Main function to preview or benchmark the line-highlight animation of one scene."""
+    parser = argparse.ArgumentParser(description='Animate a highlight band over the lines of a code slide')
+    parser.add_argument('--scene', default='scene08', help='scene id (default: scene08)')
+    parser.add_argument('--duration', type=float,
+                        help='narration length in seconds (default: length of the scene narration audio)')
+    parser.add_argument('--fps', type=int, default=video_fps, help=f'frame rate (default: {video_fps})')
+    parser.add_argument('--output', default='highlight_preview.mp4', help='output video file (without audio)')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='compare compositing the band per frame with re-rendering the slide, without ffmpeg')
+    args = parser.parse_args()
+
+    scene = next((scene for scene in scenes if scene['name'].startswith(f'{args.scene}_')), None)
+    if scene is None:
+        print(f"✗ Error: unknown scene {args.scene}")
+        return 1
+    duration = args.duration
+    if duration is None:
+        audio_file = f"audio/{args.scene}_narration.mp3"
+        duration = probe_durations([audio_file]).get(audio_file)
+        if duration is None:
+            print(f"✗ Error: Unable to get duration of {audio_file} (use --duration)")
+            return 1
+
+    with open(SOURCE_FILE, 'r', encoding='utf-8') as f:
+        source_lines = f.readlines()
+    code = ''.join(source_lines[scene['start']-1:scene['end']])
+    generator = get_generator()
+
+    def render():
+        return generator.render_to_frame(code, frame_size=(TARGET_WIDTH, TARGET_HEIGHT), title=scene_title(scene),
+                                         background=BACKGROUND_COLOR, fill_ratio=FILL_RATIO)
+
+    start_time = time.perf_counter()
+    frame = render()
+    animation = HighlightAnimation(frame, generator.last_render_stats, code, duration)
+    setup_seconds = time.perf_counter() - start_time
+    print(f"{scene['name']}: {len(animation.rows)} highlight blocks over {duration:.1f}s "
+          f"(base frame and highlight layer prepared in {setup_seconds * 1000:.0f}ms)")
+
+    if args.benchmark:
+        start_time = time.perf_counter()
+        count = sum(1 for _ in animation.frames(duration, args.fps))
+        composite_seconds = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        render()
+        render_seconds = time.perf_counter() - start_time
+        frame_pixels = TARGET_WIDTH * TARGET_HEIGHT
+        print(f"  composite: {count} frames in {composite_seconds:.3f}s "
+              f"({composite_seconds / count * 1e6:.0f}us/frame, "
+              f"{animation.dirty_pixels / count / frame_pixels:.2%} of the frame rewritten per frame on average)")
+        print(f"  re-render: {render_seconds * 1000:.0f}ms/frame "
+              f"({render_seconds * count:.1f}s if every frame were rendered from the code)")
+        return 0
+
+    start_time = time.perf_counter()
+    process = subprocess.Popen(preview_command(args.output, (TARGET_WIDTH, TARGET_HEIGHT), args.fps),
+                               stdin=subprocess.PIPE)
+    count = 0
+    try:
+        for data in animation.frames(duration, args.fps):
+            process.stdin.write(data)
+            count += 1
+    finally:
+        process.stdin.close()
+    if process.wait() != 0:
+        print(f"✗ Error: ffmpeg failed with exit code {process.returncode}")
+        return 1
+    seconds = time.perf_counter() - start_time
+    print(f"✓ Created {args.output}: {count} frames in {seconds:.1f}s ({duration / seconds:.1f}x realtime)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
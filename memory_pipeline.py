@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+メモリ上で画像を受け渡す動画生成スクリプト
+
+通常の流れ（generate_screenshots.py → resize_screenshots.py → create_video_resized.py）では、
+フル解像度のPNGを書き出して読み直し、リサイズ後のPNGを書き出して ffmpeg がまた読み込みます。
+このスクリプトは SimpleCodeImageGenerator.render_to_frame() で 1920x1080 のフレームに収まる
+フォントサイズで直接描画し（リサイズによる2回目のリサンプリングなし）、
+RGBの生データとして ffmpeg の標準入力に直接渡すため、PNGのエンコード・デコード2往復を省略できます。
+
+音声ファイルは事前に生成しておく必要があります（generate_audio_gtts.py）。
+ソースコードの該当行・描画設定・音声が前回と同じシーンは、セグメントを再利用します。
+
+--animated を指定すると、静止画の代わりにナレーションの進行に合わせて行のハイライトが動く映像にします
+（highlight_animation.py。スライドの描画はシーンごとに1回だけで、フレームごとには差分の矩形だけを書き換えます）。
+
+使用方法:
+    python memory_pipeline.py [--jobs N] [--profile still|standard] [--animated] [--debug-frames DIR]
+
+--debug-frames を指定した場合のみ、描画したフレームをPNGとして保存します。
+"""
+
+import argparse   # コマンドライン引数の解析用
+import functools  # シーンごとのフレーム生成関数の作成用
+import os         # ファイル操作用
+import sys        # 終了コード用
+import threading  # 描画処理の排他制御用
+import time       # 処理時間の計測用
+
+import create_video
+from audio_durations import probe_durations  # 音声の長さの一括取得用
+from build_cache import BuildCache, content_key, hash_file  # 差分ビルド用
+from highlight_animation import HighlightAnimation  # 行ハイライトのアニメーション用
+from profiler import span  # 処理時間の計測用
+from generate_screenshots import SOURCE_FILE, get_generator, scene_cache_key, scene_title, scenes
+from resize_screenshots import BACKGROUND_COLOR, FILL_RATIO, TARGET_HEIGHT, TARGET_WIDTH
+
+# 画像生成器（generate_screenshots.get_generator()）はグリフキャッシュを持つため、
+# エンコードのワーカースレッド間で共有して1つずつ描画する
+_render_lock = threading.Lock()
+
+
+def render_frame(scene, source_lines, debug_dir=None):
+    """
+    1シーン分のフレームを目標解像度で直接描画し、RGBの生データを返す
+
+    Args:
+        scene (dict): generate_screenshots.scenes のシーン定義（name, start, end）
+        source_lines (list): ソースコードの行のリスト
+        debug_dir (str, optional): 指定した場合、フレームをPNGとしてこのディレクトリに保存
+
+    Returns:
+        bytes: TARGET_WIDTH x TARGET_HEIGHT のRGB24の生データ
+    """
+    scene_code = ''.join(source_lines[scene['start']-1:scene['end']])
+    with _render_lock, span('render', 'frames', scene=scene['name']):
+        frame = get_generator().render_to_frame(scene_code, frame_size=(TARGET_WIDTH, TARGET_HEIGHT),
+                                                title=scene_title(scene), background=BACKGROUND_COLOR,
+                                                fill_ratio=FILL_RATIO)
+
+    if debug_dir:
+        frame.save(os.path.join(debug_dir, f"{scene['name']}.png"))
+    return frame.tobytes()
+
+
+def animate_frames(scene, source_lines, duration, total_duration, debug_dir=None):
+    """
+    1シーン分の行ハイライトのアニメーションのフレームを順に返す
+
+    スライドは最初に1回だけ目標解像度で描画し、以降は HighlightAnimation が
+    帯の動いた行だけを書き換えたフレーム（RGB24の生データ）を返します。
+
+    Args:
+        scene (dict): generate_screenshots.scenes のシーン定義（name, start, end）
+        source_lines (list): ソースコードの行のリスト
+        duration (float): ハイライトを動かす時間（ナレーションの長さ、秒）
+        total_duration (float): セグメントの長さ（無音間隔を含む、秒）
+        debug_dir (str, optional): 指定した場合、ベースフレームをPNGとしてこのディレクトリに保存
+
+    Yields:
+        memoryview: TARGET_WIDTH x TARGET_HEIGHT のRGB24の生データ
+    """
+    scene_code = ''.join(source_lines[scene['start']-1:scene['end']])
+    with _render_lock, span('render', 'frames', scene=scene['name'], animated=True):
+        generator = get_generator()
+        frame = generator.render_to_frame(scene_code, frame_size=(TARGET_WIDTH, TARGET_HEIGHT),
+                                          title=scene_title(scene), background=BACKGROUND_COLOR,
+                                          fill_ratio=FILL_RATIO)
+        stats = generator.last_render_stats
+
+    if debug_dir:
+        frame.save(os.path.join(debug_dir, f"{scene['name']}.png"))
+    animation = HighlightAnimation(frame, stats, scene_code, duration)
+    yield from animation.frames(total_duration, create_video.fps)
+
+
+def collect_memory_scenes(source_lines, debug_dir=None, animated=False):
+    """
+    メモリ上で描画するシーンを create_video.encode_segments() の形式でまとめる
+
+    画像ファイルの代わりに、描画関数（render）とその入力から計算したキー（source_key）を持ちます。
+    animated の場合は render の代わりに、アニメーションのフレームの列を返す関数（frames）を持ちます。
+    描画はセグメントを再作成するときだけ行われます。
+
+    Args:
+        source_lines (list): ソースコードの行のリスト
+        debug_dir (str, optional): フレームのPNGの保存先
+        animated (bool): 行ハイライトのアニメーションにする場合True
+
+    Returns:
+        list: シーン順の辞書のリスト
+    """
+    gaps = {scene['id']: scene['gap'] for scene in create_video.scenes}
+    audio_files = {scene['name']: f"audio/{scene['name'].split('_')[0]}_narration.mp3" for scene in scenes}
+    audio_durations = probe_durations(list(audio_files.values()))
+
+    items = []
+    for scene in scenes:
+        scene_id = scene['name'].split('_')[0]
+        audio_file = audio_files[scene['name']]
+        if audio_file not in audio_durations:
+            print(f"  ✗ Error: Audio file {audio_file} not found")
+            continue
+
+        duration = audio_durations[audio_file]
+        gap = gaps.get(scene_id, 0.0)
+        total_duration = round(duration + gap, 3)
+        source_key = content_key('frame-direct', scene_cache_key(scene, source_lines),
+                                 TARGET_WIDTH, TARGET_HEIGHT, BACKGROUND_COLOR, FILL_RATIO)
+        item = {
+            'id': scene_id,
+            'audio': audio_file,
+            'duration': duration,
+            'gap': gap,
+            'total_duration': total_duration,
+            'source_key': source_key,
+            'frame_size': f"{TARGET_WIDTH}x{TARGET_HEIGHT}",
+        }
+        if animated:
+            # ハイライトの時間配分はナレーションの長さで決まるため、キーに含める
+            item['source_key'] = content_key('highlight', source_key, duration,
+                                             hash_file('highlight_animation.py'))
+            item['frames'] = functools.partial(animate_frames, scene, source_lines, duration, total_duration,
+                                               debug_dir)
+        else:
+            item['render'] = lambda scene=scene: render_frame(scene, source_lines, debug_dir)
+        items.append(item)
+    return items
+
+
+def create_video_in_memory(jobs=1, profile=create_video.DEFAULT_PROFILE, debug_dir=None, animated=False):
+    """
+    全シーンをメモリ上で描画して動画を作成
+
+    Args:
+        jobs (int): 同時に実行するセグメントのエンコード数
+        profile (str): エンコードプロファイル（create_video.ENCODE_PROFILES のキー）
+        debug_dir (str, optional): 指定した場合、描画したフレームをPNGとしてこのディレクトリに保存
+        animated (bool): 行ハイライトのアニメーションにする場合True
+
+    Returns:
+        bool: 出力動画を作成（または再利用）できた場合True
+    """
+    if debug_dir:
+        os.makedirs(debug_dir, exist_ok=True)
+
+    print("Creating video from in-memory frames" + (" with line highlights..." if animated else "..."))
+    start_time = time.perf_counter()
+
+    with open(SOURCE_FILE, 'r', encoding='utf-8') as f:
+        source_lines = f.readlines()
+
+    items = collect_memory_scenes(source_lines, debug_dir, animated)
+    if not items:
+        print("\n✗ No scenes to encode")
+        return False
+
+    cache = BuildCache('video')
+    # 静止画とアニメーションはセグメントのキーが異なるため、保存先も分ける
+    segments_path = create_video.segments_dir('memory_pipeline-animated' if animated else 'memory_pipeline',
+                                              create_video.output_video, profile)
+    ok = create_video.encode_segments(items, create_video.output_video, cache, segments_path=segments_path,
+                                      jobs=jobs, profile=profile)
+    cache.save()
+    if not ok:
+        return False
+
+    create_video.show_video_info(create_video.output_video)
+    print(f"\nVideo creation complete! Output file: {create_video.output_video} "
+          f"({time.perf_counter() - start_time:.1f}s)")
+    return True
+
+
+def main():
+    """Main function to render and encode the video without intermediate PNGs."""
+    parser = argparse.ArgumentParser(description='Render code slides in memory and pipe them to ffmpeg')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help='number of segment encodes to run at once (default: all cores)')
+    parser.add_argument('--profile', choices=sorted(create_video.ENCODE_PROFILES),
+                        default=create_video.DEFAULT_PROFILE,
+                        help=f'video encoding profile (default: {create_video.DEFAULT_PROFILE})')
+    parser.add_argument('--animated', action='store_true',
+                        help='move a highlight band over the code lines as the narration progresses')
+    parser.add_argument('--debug-frames', metavar='DIR',
+                        help='also save each rendered frame as a PNG in DIR')
+    args = parser.parse_args()
+
+    ok = create_video_in_memory(jobs=args.jobs, profile=args.profile, debug_dir=args.debug_frames,
+                                 animated=args.animated)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
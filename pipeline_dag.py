@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+依存関係グラフ（DAG）による動画生成パイプライン
+
+generate_screenshots.py → generate_audio_gtts.py → resize_screenshots.py → create_video_resized.py を
+段階ごとに順番に実行する代わりに、シーンごとの処理を依存関係グラフとして1つのプロセス内で実行します。
+
+シーンごとの依存関係:
+    render（スクリーンショット描画） → resize（リサイズ） ─┐
+                                                            ├→ encode（セグメント作成） → concat（全シーン結合）
+    tts（音声合成） → duration（音声の長さの取得） ─────────┘
+
+依存関係のない処理（あるシーンの描画と別のシーンの音声合成など）は同時に実行され、
+シーンの画像と音声がそろった時点でそのシーンのセグメントのエンコードを開始します。
+各処理は種類ごとの実行プールで動きます。
+- cpu: 描画とリサイズ（プロセスプール、--jobs 個）
+- tts: 音声合成（スレッドプール、--tts-jobs 個。文単位のチャンクごとに投入し、リクエスト頻度の上限は全シーンで共有）
+- encode: ffmpeg（スレッドプール、--encode-jobs 個）
+
+各段階の成果物の再利用判定は、個別のスクリプトと同じビルドキャッシュ（build_cache.py）を使います。
+
+使用方法:
+    python pipeline_dag.py [--jobs N] [--tts-jobs 4] [--encode-jobs N] [--profile still|standard] [--fake-tts]
+                           [--trace trace.json]
+"""
+
+import argparse    # コマンドライン引数の解析用
+import os          # ファイル操作用
+import shutil      # チャンク音声の一時ディレクトリの削除用
+import subprocess  # 音声の結合失敗の判定用
+import sys         # 終了コード用
+import tempfile    # チャンク音声の一時保存用
+import threading   # Future の結合用
+import time        # 処理時間の計測用
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import create_video
+import generate_audio_gtts
+import generate_screenshots
+import resize_screenshots
+from audio_cache import AudioCache  # 合成済み音声のキャッシュ
+from audio_durations import probe_durations  # 音声の長さの取得用
+from build_cache import BuildCache, FileHashIndex, hash_file  # 差分ビルド用
+from profiler import session, span  # 処理時間の計測用
+from tts_engine import TokenBucket, _synthesize_with_retry, split_sentences, stitch_audio  # 音声合成用
+
+
+def _gather(futures):
+    """
+    複数の Future がすべて完了したときに、結果のリスト（futures と同じ順序）で完了する Future を返す
+
+    いずれかの Future で例外が発生した場合は、その例外で完了します。
+    """
+    gathered = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        try:
+            gathered.set_result([future.result() for future in futures])
+        except Exception as e:
+            gathered.set_exception(e)
+
+    for future in futures:
+        future.add_done_callback(done)
+    return gathered
+
+
+class TaskFailed(Exception):
+    """タスクの失敗（依存するタスクは実行されません）"""
+
+
+class Task:
+    """
+    依存関係グラフの1つの処理
+
+    start(results) は依存タスクがすべて完了したときにスケジューラーのスレッドで呼ばれ、
+    依存タスクの結果の辞書を受け取ります。実行プールに投入した Future を返すと完了後に
+    finish(Future の結果) が呼ばれ、その戻り値がタスクの結果になります。
+    Future 以外を返した場合（キャッシュが有効な場合など）はその値がそのまま結果になります。
+    start / finish で TaskFailed などの例外が発生するとタスクは失敗になります。
+    """
+
+    def __init__(self, name, start, deps=(), finish=None):
+        """
+        Args:
+            name (str): タスク名（'render:scene01' など）
+            start (callable): 依存タスクの結果の辞書を受け取り、Future または結果を返す関数
+            deps (iterable): 依存するタスク名
+            finish (callable, optional): Future の結果を受け取り、タスクの結果を返す関数
+        """
+        self.name = name
+        self.start = start
+        self.deps = tuple(deps)
+        self.finish = finish
+
+
+def run_dag(tasks, on_event=None):
+    """
+    依存関係グラフのタスクを、依存タスクが完了したものから順に実行
+
+    Args:
+        tasks (list): Task のリスト（依存タスクより後ろに並んでいなくてもよい）
+        on_event (callable, optional): タスクの完了・失敗ごとに (タスク名, 状態, 開始からの経過秒数, 詳細) で
+                                       呼ばれる関数。状態は 'done', 'failed', 'skipped' のいずれか
+
+    Returns:
+        tuple: (タスク名 -> 結果 の辞書, 失敗・未実行のタスク名 -> 理由 の辞書)
+
+    Raises:
+        ValueError: 存在しないタスクへの依存や循環依存がある場合
+    """
+    by_name = {task.name: task for task in tasks}
+    for task in tasks:
+        unknown = [dep for dep in task.deps if dep not in by_name]
+        if unknown:
+            raise ValueError(f"{task.name} depends on unknown task(s): {', '.join(unknown)}")
+
+    def notify(name, status, detail=None):
+        if on_event is not None:
+            on_event(name, status, time.perf_counter() - run_start, detail)
+
+    run_start = time.perf_counter()
+    results = {}
+    failures = {}
+    pending = list(tasks)
+    running = {}  # Future -> Task
+
+    while pending or running:
+        # 依存タスクが失敗したタスクは実行しない
+        for task in list(pending):
+            failed_deps = [dep for dep in task.deps if dep in failures]
+            if failed_deps:
+                pending.remove(task)
+                failures[task.name] = f"dependency failed: {failed_deps[0]}"
+                notify(task.name, 'skipped', failures[task.name])
+
+        # 依存タスクがすべて完了したタスクを開始
+        for task in [task for task in pending if all(dep in results for dep in task.deps)]:
+            pending.remove(task)
+            try:
+                outcome = task.start({dep: results[dep] for dep in task.deps})
+            except Exception as e:
+                failures[task.name] = str(e)
+                notify(task.name, 'failed', str(e))
+                continue
+            if isinstance(outcome, Future):
+                running[outcome] = task
+            else:
+                results[task.name] = outcome
+                notify(task.name, 'done')
+
+        if not running:
+            if pending and not any(all(dep in results for dep in task.deps) for task in pending):
+                raise ValueError(f"dependency cycle among: {', '.join(task.name for task in pending)}")
+            continue
+
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in finished:
+            task = running.pop(future)
+            try:
+                value = future.result()
+                results[task.name] = task.finish(value) if task.finish else value
+                notify(task.name, 'done')
+            except Exception as e:
+                failures[task.name] = str(e)
+                notify(task.name, 'failed', str(e))
+
+    return results, failures
+
+
+class ScenePipeline:
+    """
+    全シーンの render / resize / tts / duration / encode と最後の concat のタスクを作成
+
+    各タスクの start / finish はスケジューラーのスレッドで呼ばれ、ビルドキャッシュの判定と記録を行います。
+    実際の描画・リサイズ・音声合成・エンコードだけが実行プールで動きます。
+    """
+
+    def __init__(self, cpu_pool, tts_pool, encode_pool, backend, rate=2.0, retries=4,
+                 encode_threads=1, profile=create_video.DEFAULT_PROFILE, output=create_video.output_video):
+        self.cpu_pool = cpu_pool
+        self.tts_pool = tts_pool
+        self.encode_pool = encode_pool
+        self.backend = backend
+        # チャンクごとの合成を tts_pool に投入するため、同時に実行するリクエスト数は tts_pool の
+        # スレッド数、リクエスト頻度は全シーンで共有するトークンバケットで制限する
+        self.tts_bucket = TokenBucket(rate, 2)
+        self.tts_cache = AudioCache()
+        self.tts_retries = retries
+        self.encode_threads = encode_threads
+        self.profile = profile
+        self.output = output
+        self.segments_path = create_video.segments_dir('pipeline_dag', output, profile)
+
+        self.caches = {stage: BuildCache(stage) for stage in ('screenshots', 'resize', 'audio', 'video')}
+        self.hashes = FileHashIndex('resize')
+        self.reasons = {}  # 成果物 -> 再生成の理由
+        self.reused = set()  # 成果物を再利用したタスク名
+
+        with open(generate_screenshots.SOURCE_FILE, 'r', encoding='utf-8') as f:
+            self.source_lines = f.readlines()
+
+        os.makedirs(generate_screenshots.OUTPUT_DIR, exist_ok=True)
+        os.makedirs(resize_screenshots.RESIZED_DIR, exist_ok=True)
+        os.makedirs(generate_audio_gtts.OUTPUT_DIR, exist_ok=True)
+        os.makedirs(self.segments_path, exist_ok=True)
+
+    def _check(self, task_name, stage, artifact, key):
+        """成果物を再利用できる場合True（記録も行う）。再生成が必要な場合は理由を覚えておく"""
+        cache = self.caches[stage]
+        fresh, reason = cache.check(artifact, key)
+        if fresh:
+            cache.record(artifact, key, rebuilt=False, reason=reason)
+            self.reused.add(task_name)
+        else:
+            self.reasons[artifact] = reason
+        return fresh
+
+    def _rebuilt(self, stage, artifact, key):
+        self.caches[stage].record(artifact, key, rebuilt=True, reason=self.reasons.pop(artifact))
+
+    def _failed(self, stage, artifact, error):
+        self.caches[stage].forget(artifact)
+        raise TaskFailed(error)
+
+    def tasks(self):
+        """全シーンのタスクと concat タスクのリスト"""
+        gaps = {scene['id']: scene['gap'] for scene in create_video.scenes}
+        narrations = {scene['id']: scene for scene in generate_audio_gtts.scenes}
+
+        tasks = []
+        encodes = []
+        for scene in generate_screenshots.scenes:
+            scene_id = scene['name'].split('_')[0]
+            if scene_id not in narrations:
+                print(f"  ✗ Error: No narration for {scene_id}")
+                continue
+            tasks += [
+                self._render_task(scene_id, scene),
+                self._resize_task(scene_id, scene),
+                self._tts_task(scene_id, narrations[scene_id]),
+                self._duration_task(scene_id, narrations[scene_id]),
+                self._encode_task(scene_id, gaps.get(scene_id, 0.0)),
+            ]
+            encodes.append(f'encode:{scene_id}')
+        tasks.append(Task('concat', self._concat, deps=encodes))
+        return tasks
+
+    def _render_task(self, scene_id, scene):
+        output_path = generate_screenshots.scene_output_path(scene)
+        key = generate_screenshots.scene_cache_key(scene, self.source_lines)
+
+        def start(_):
+            if self._check(f'render:{scene_id}', 'screenshots', output_path, key):
+                return output_path
+            return self.cpu_pool.submit(generate_screenshots.render_scene, scene, self.source_lines)
+
+        def finish(result):
+            self._rebuilt('screenshots', output_path, key)
+            return output_path
+
+        return Task(f'render:{scene_id}', start, finish=finish)
+
+    def _resize_task(self, scene_id, scene):
+        output_path = os.path.join(resize_screenshots.RESIZED_DIR, os.path.basename(
+            generate_screenshots.scene_output_path(scene)))
+        state = {}
+
+        def start(results):
+            input_path = results[f'render:{scene_id}']
+            state['key'] = resize_screenshots.resize_cache_key(self.hashes.hash(input_path))
+            if self._check(f'resize:{scene_id}', 'resize', output_path, state['key']):
+                return output_path
+            return self.cpu_pool.submit(resize_screenshots.resize_file, input_path, output_path)
+
+        def finish(result):
+            if result['error']:
+                self._failed('resize', output_path, result['error'])
+            self._rebuilt('resize', output_path, state['key'])
+            return output_path
+
+        return Task(f'resize:{scene_id}', start, deps=[f'render:{scene_id}'], finish=finish)
+
+    def _tts_task(self, scene_id, narration):
+        output_path = generate_audio_gtts.narration_path(narration)
+        key = generate_audio_gtts.narration_cache_key(narration, self.backend)
+
+        chunks = split_sentences(narration['text']) or [narration['text']]
+        chunk_paths = []
+
+        def start(_):
+            if self._check(f'tts:{scene_id}', 'audio', output_path, key):
+                return output_path
+            # 長いシーンも複数のチャンクが同時に合成されるよう、チャンクごとに tts_pool に投入する
+            chunk_dir = tempfile.mkdtemp(prefix=f'tts_chunks_{scene_id}_')
+            chunk_paths[:] = [os.path.join(chunk_dir, f"{scene_id}_{index:03d}.mp3")
+                              for index in range(len(chunks))]
+            futures = [
+                self.tts_pool.submit(_synthesize_with_retry, self.backend, self.tts_bucket,
+                                     (scene_id, chunk, chunk_path), self.tts_retries, 0.5, 8.0, self.tts_cache)
+                for chunk, chunk_path in zip(chunks, chunk_paths)
+            ]
+            gathered = _gather(futures)
+            # 合成中に例外が発生した場合は finish が呼ばれないため、ここで一時ディレクトリを削除する
+            gathered.add_done_callback(
+                lambda future: future.exception() and shutil.rmtree(chunk_dir, ignore_errors=True))
+            return gathered
+
+        def finish(results):
+            chunk_dir = os.path.dirname(chunk_paths[0])
+            try:
+                failed = [result for result in results if not result['ok']]
+                if failed:
+                    self._failed('audio', output_path, failed[0]['error'])
+                try:
+                    with span('stitch', 'audio', id=scene_id, chunks=len(chunk_paths)):
+                        stitch_audio(chunk_paths, output_path)
+                except (OSError, subprocess.CalledProcessError) as e:
+                    self._failed('audio', output_path, f"stitching failed: {e}")
+            finally:
+                shutil.rmtree(chunk_dir, ignore_errors=True)
+            self._rebuilt('audio', output_path, key)
+            return output_path
+
+        return Task(f'tts:{scene_id}', start, finish=finish)
+
+    def _duration_task(self, scene_id, narration):
+        def start(results):
+            audio_file = results[f'tts:{scene_id}']
+            durations = probe_durations([audio_file])
+            if audio_file not in durations:
+                raise TaskFailed(f"unable to get duration of {audio_file}")
+            return durations[audio_file]
+
+        return Task(f'duration:{scene_id}', start, deps=[f'tts:{scene_id}'])
+
+    def _encode_task(self, scene_id, gap):
+        state = {}
+
+        def start(results):
+            duration = results[f'duration:{scene_id}']
+            image_file = results[f'resize:{scene_id}']
+            item = {
+                'id': scene_id,
+                'image': image_file,
+                'audio': results[f'tts:{scene_id}'],
+                'duration': duration,
+                'gap': gap,
+                'total_duration': round(duration + gap, 3),
+                'source_key': hash_file(image_file),
+            }
+            state['segment'], state['key'] = create_video.segment_plan(item, self.segments_path, self.profile)
+            if self._check(f'encode:{scene_id}', 'video', state['segment'], state['key']):
+                return state['segment'], state['key']
+            return self.encode_pool.submit(create_video.encode_segment, item, state['segment'],
+                                           self.encode_threads, self.profile)
+
+        def finish(result):
+            ok, _, error = result
+            if not ok:
+                self._failed('video', state['segment'], error)
+            self._rebuilt('video', state['segment'], state['key'])
+            return state['segment'], state['key']
+
+        return Task(f'encode:{scene_id}', start, deps=[f'tts:{scene_id}', f'duration:{scene_id}',
+                                                       f'resize:{scene_id}'], finish=finish)
+
+    def _concat(self, results):
+        segments = list(results.values())  # 依存タスクの順（シーン順）
+        segment_files = [segment for segment, _ in segments]
+        cache = self.caches['video']
+        create_video.prune_segments(segment_files, cache, self.segments_path)
+        if not create_video.concat_segments(segment_files, [key for _, key in segments], self.output, cache):
+            raise TaskFailed('concatenation failed')
+        return self.output
+
+    def report(self, name, status, seconds, detail=None):
+        """タスクの完了・失敗を、パイプライン開始からの経過時間とともに表示（run_dag の on_event）"""
+        if status == 'done' and name in self.reused:
+            print(f"  [{seconds:7.2f}s] - {name:<20} up to date")
+        elif status == 'done':
+            print(f"  [{seconds:7.2f}s] ✓ {name}")
+        else:
+            print(f"  [{seconds:7.2f}s] ✗ {name:<20} {status}: {detail}")
+
+    def save(self):
+        """ビルドキャッシュとハッシュの索引を保存"""
+        self.hashes.save()
+        for cache in self.caches.values():
+            cache.save()
+
+
+def run_pipeline(jobs=None, tts_jobs=4, encode_jobs=None, rate=2.0, retries=4,
+                 profile=create_video.DEFAULT_PROFILE, fake_tts=False):
+    """
+    全シーンの依存関係グラフを作成して実行
+
+    Args:
+        jobs (int, optional): 描画・リサイズのプロセス数（省略時はCPUコア数）
+        tts_jobs (int): 同時に実行するTTSリクエストの数
+        encode_jobs (int, optional): 同時に実行するffmpegの数（省略時はCPUコア数）
+        rate (float): 1秒あたりのTTSリクエスト数の上限（0: 制限なし）
+        retries (int): 音声合成の再試行回数
+        profile (str): エンコードプロファイル（create_video.ENCODE_PROFILES のキー）
+        fake_tts (bool): Trueの場合、ネットワークを使わない疑似TTSバックエンドを使用
+
+    Returns:
+        bool: 出力動画を作成（または再利用）できた場合True
+    """
+    cpu_count = os.cpu_count() or 1
+    jobs = jobs or cpu_count
+    encode_jobs = encode_jobs or cpu_count
+    backend = generate_audio_gtts.create_backend(fake_tts)
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=generate_screenshots._init_worker) as cpu_pool, \
+            ThreadPoolExecutor(max_workers=tts_jobs) as tts_pool, \
+            ThreadPoolExecutor(max_workers=encode_jobs) as encode_pool:
+        pipeline = ScenePipeline(cpu_pool, tts_pool, encode_pool, backend, rate=rate,
+                                 retries=retries, encode_threads=max(1, cpu_count // encode_jobs),
+                                 profile=profile)
+        tasks = pipeline.tasks()
+        print(f"\nRunning {len(tasks)} tasks ({jobs} cpu, {tts_jobs} tts, {encode_jobs} encode workers)...")
+        try:
+            with span('pipeline_dag', 'stage', tasks=len(tasks)):
+                _, failures = run_dag(tasks, on_event=pipeline.report)
+        finally:
+            pipeline.save()
+
+    print(f"\nPipeline finished in {time.perf_counter() - start_time:.1f}s")
+    if failures:
+        print(f"✗ {len(failures)} task(s) failed or were not run:")
+        for name, reason in failures.items():
+            print(f"  {name}: {reason}")
+        return False
+    return True
+
+
+def main():
+    """Main function to run the whole pipeline as a dependency graph."""
+    parser = argparse.ArgumentParser(description='Run the video pipeline as a per-scene dependency graph')
+    parser.add_argument('--jobs', '-j', type=int, help='render/resize processes (default: all cores)')
+    parser.add_argument('--tts-jobs', type=int, default=4, help='concurrent TTS requests (default: 4)')
+    parser.add_argument('--encode-jobs', type=int, help='concurrent ffmpeg encodes (default: all cores)')
+    parser.add_argument('--rate', type=float, default=2.0, help='maximum TTS requests per second (0: unlimited)')
+    parser.add_argument('--retries', type=int, default=4, help='TTS retries per scene on failure')
+    parser.add_argument('--profile', choices=sorted(create_video.ENCODE_PROFILES),
+                        default=create_video.DEFAULT_PROFILE,
+                        help=f'video encoding profile (default: {create_video.DEFAULT_PROFILE})')
+    parser.add_argument('--fake-tts', action='store_true', help='use the offline fake TTS backend')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='record per-task timings and write a Chrome trace JSON report to FILE')
+    args = parser.parse_args()
+
+    with session(args.trace):
+        ok = run_pipeline(jobs=args.jobs, tts_jobs=args.tts_jobs, encode_jobs=args.encode_jobs, rate=args.rate,
+                          retries=args.retries, profile=args.profile, fake_tts=args.fake_tts)
+    if ok:
+        create_video.show_video_info(create_video.output_video)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+パイプライン全体の処理時間の計測（スパン）とレポート
+
+各処理段階・シーン・処理の内訳（トークン分割、描画、縮小、保存、音声合成、エンコード、結合など）を
+span() で囲むと、経過時間・CPU時間・最大メモリ使用量（RSS）を記録します。
+計測は環境変数 PIPELINE_TRACE_DIR にディレクトリが設定されているときだけ有効で、
+設定されていない場合の span() は何もしません。
+
+記録はプロセスごとのファイル（<PIPELINE_TRACE_DIR>/<pid>.jsonl）に1スパン1行で追記するため、
+プロセスプールのワーカーや、別プロセスで起動したスクリプトの計測も集められます。
+
+session() で囲んだ処理が終わると、全プロセスの記録をまとめて
+Chrome のトレース形式（chrome://tracing や Perfetto で表示可能）のJSONに書き出し、集計表を表示します。
+JSONの "summary" には (カテゴリ, 名前) ごとの集計が入り、実行間の比較に使えます。
+
+使用方法:
+    python run_video_pipeline.py --trace trace.json
+    PIPELINE_TRACE_DIR=traces python generate_screenshots.py
+    python profiler.py report traces -o trace.json   # ディレクトリの記録からレポートを作成
+    python profiler.py summary trace.json            # 集計表を再表示
+    python profiler.py compare before.json after.json
+"""
+
+import argparse    # コマンドライン引数の解析用
+import contextlib  # スパンのコンテキストマネージャー用
+import json        # 記録とレポートの読み書き用
+import multiprocessing  # プロセスプールのワーカーの判定用
+import os          # 環境変数とファイル操作用
+import shutil      # 一時ディレクトリの削除用
+import sys         # 実行中のスクリプト名とプラットフォームの判定用
+import tempfile    # 記録用の一時ディレクトリ
+import threading   # 複数スレッドからの書き込みの排他制御用
+import time        # 経過時間とCPU時間の計測用
+
+try:
+    import resource  # 最大メモリ使用量と子プロセスのCPU時間の取得用（Unix系のみ）
+except ImportError:
+    resource = None
+
+# 記録先ディレクトリを指定する環境変数（子プロセスにも引き継がれる）
+TRACE_ENV = 'PIPELINE_TRACE_DIR'
+
+# ru_maxrss の単位（Linux はKB、macOS はバイト）
+_RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+_lock = threading.Lock()
+_files = {}  # 記録先ディレクトリ -> このプロセスの記録ファイル
+
+
+def _reset_after_fork():
+    """fork した子プロセスでは親のファイルとロックを使わない"""
+    global _lock
+    _lock = threading.Lock()
+    _files.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _usage():
+    """(このプロセスの最大RSS（バイト）, 終了した子プロセスのCPU時間（秒）, 子プロセスの最大RSS（バイト）)"""
+    if resource is None:
+        return 0, 0.0, 0
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (own.ru_maxrss * _RSS_UNIT, children.ru_utime + children.ru_stime,
+            children.ru_maxrss * _RSS_UNIT)
+
+
+def _process_label():
+    """トレース表示用のプロセス名"""
+    script = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else 'python'
+    if multiprocessing.parent_process() is not None:
+        return f"{script} worker"
+    return script
+
+
+def _write(trace_dir, event):
+    """このプロセスの記録ファイルにイベントを1行追記"""
+    line = json.dumps(event, ensure_ascii=False)
+    with _lock:
+        f = _files.get(trace_dir)
+        if f is None:
+            os.makedirs(trace_dir, exist_ok=True)
+            f = open(os.path.join(trace_dir, f'{os.getpid()}.jsonl'), 'a', encoding='utf-8')
+            _files[trace_dir] = f
+            f.write(json.dumps({'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+                                'args': {'name': _process_label()}}, ensure_ascii=False) + '\n')
+        f.write(line + '\n')
+        # プロセスプールのワーカーは終了処理を経ずに終わることがあるため毎回書き出す
+        f.flush()
+
+
+def enabled():
+    """計測が有効な場合True"""
+    return bool(os.environ.get(TRACE_ENV))
+
+
+@contextlib.contextmanager
+def span(name, category='pipeline', **args):
+    """
+    処理時間の計測範囲（計測が無効な場合は何もしない）
+
+    経過時間、このスレッドのCPU時間、範囲内に終了した子プロセス（ffmpeg など）のCPU時間、
+    範囲の終了時点でのプロセスと子プロセスの最大RSSを記録します。
+    子プロセスのCPU時間はプロセス全体での差分のため、並列実行中は他の範囲の分を含むことがあります。
+
+    Args:
+        name (str): 処理の名前（'tokenize', 'encode' など）
+        category (str): 処理の分類（'screenshots', 'audio', 'video' など）
+        **args: 記録に含める追加情報（シーンIDなど）
+    """
+    trace_dir = os.environ.get(TRACE_ENV)
+    if not trace_dir:
+        yield
+        return
+
+    timestamp = time.time_ns() // 1000
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    _, children_cpu_start, _ = _usage()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        peak_rss, children_cpu, children_peak_rss = _usage()
+        event_args = dict(args, cpu_ms=round(cpu * 1000, 3),
+                          child_cpu_ms=round((children_cpu - children_cpu_start) * 1000, 3),
+                          peak_rss_mb=round(peak_rss / 1024 / 1024, 1),
+                          child_peak_rss_mb=round(children_peak_rss / 1024 / 1024, 1))
+        if error:
+            event_args['error'] = error
+        _write(trace_dir, {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': timestamp,
+            'dur': round(wall * 1_000_000),
+            'pid': os.getpid(),
+            'tid': threading.get_native_id(),
+            'args': event_args,
+        })
+
+
+def load_events(trace_dir):
+    """記録ディレクトリの全プロセスのイベントを読み込み（開始時刻順）"""
+    events = []
+    for filename in sorted(os.listdir(trace_dir)):
+        if not filename.endswith('.jsonl'):
+            continue
+        with open(os.path.join(trace_dir, filename), 'r', encoding='utf-8') as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+    return sorted(events, key=lambda event: event.get('ts', 0))
+
+
+def summarize(events):
+    """
+    (カテゴリ, 名前) ごとにスパンを集計
+
+    Returns:
+        list: 集計の辞書（category, name, count, wall_s, mean_ms, max_ms, cpu_s, child_cpu_s, peak_rss_mb）の
+              リスト。カテゴリ順、同じカテゴリ内は合計時間の長い順
+    """
+    groups = {}
+    for event in events:
+        if event.get('ph') != 'X':
+            continue
+        args = event.get('args', {})
+        entry = groups.setdefault((event['cat'], event['name']), {
+            'category': event['cat'], 'name': event['name'], 'count': 0, 'wall_s': 0.0, 'max_ms': 0.0,
+            'cpu_s': 0.0, 'child_cpu_s': 0.0, 'peak_rss_mb': 0.0,
+        })
+        entry['count'] += 1
+        entry['wall_s'] += event['dur'] / 1_000_000
+        entry['max_ms'] = max(entry['max_ms'], event['dur'] / 1000)
+        entry['cpu_s'] += args.get('cpu_ms', 0) / 1000
+        entry['child_cpu_s'] += args.get('child_cpu_ms', 0) / 1000
+        entry['peak_rss_mb'] = max(entry['peak_rss_mb'], args.get('peak_rss_mb', 0),
+                                   args.get('child_peak_rss_mb', 0))
+
+    summary = list(groups.values())
+    for entry in summary:
+        entry['mean_ms'] = entry['wall_s'] * 1000 / entry['count']
+        for field in ('wall_s', 'mean_ms', 'max_ms', 'cpu_s', 'child_cpu_s'):
+            entry[field] = round(entry[field], 4)
+    return sorted(summary, key=lambda entry: (entry['category'], -entry['wall_s']))
+
+
+def print_summary(summary):
+    """集計表を表示"""
+    print(f"\n{'category':<12} {'span':<16} {'count':>6} {'wall':>9} {'mean':>9} {'max':>9} "
+          f"{'cpu':>8} {'child cpu':>9} {'peak rss':>9}")
+    for entry in summary:
+        print(f"{entry['category']:<12} {entry['name']:<16} {entry['count']:>6} {entry['wall_s']:>8.2f}s "
+              f"{entry['mean_ms']:>7.1f}ms {entry['max_ms']:>7.1f}ms {entry['cpu_s']:>7.2f}s "
+              f"{entry['child_cpu_s']:>8.2f}s {entry['peak_rss_mb']:>7.1f}MB")
+
+
+def write_report(events, output_path):
+    """
+    Chrome のトレース形式のJSONに書き出し
+
+    Returns:
+        list: summarize() の集計
+    """
+    summary = summarize(events)
+    report = {
+        'traceEvents': events,
+        'displayTimeUnit': 'ms',
+        'summary': summary,
+    }
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False)
+    return summary
+
+
+@contextlib.contextmanager
+def session(output_path, name='total'):
+    """
+    ブロック内（子プロセスを含む）の計測を有効にし、終了時にレポートを書き出して集計表を表示
+
+    output_path がNoneの場合は何もしません。
+
+    Args:
+        output_path (str): レポート（Chrome のトレース形式のJSON）の出力先
+        name (str): ブロック全体を囲むスパンの名前
+    """
+    if not output_path:
+        yield
+        return
+
+    trace_dir = tempfile.mkdtemp(prefix='pipeline_trace_')
+    previous = os.environ.get(TRACE_ENV)
+    os.environ[TRACE_ENV] = trace_dir
+    try:
+        with span(name, 'stage'):
+            yield
+    finally:
+        if previous is None:
+            del os.environ[TRACE_ENV]
+        else:
+            os.environ[TRACE_ENV] = previous
+        with _lock:
+            f = _files.pop(trace_dir, None)
+            if f is not None:
+                f.close()
+
+        summary = write_report(load_events(trace_dir), output_path)
+        shutil.rmtree(trace_dir, ignore_errors=True)
+        print_summary(summary)
+        print(f"\nTrace written to {output_path} (open in chrome://tracing or https://ui.perfetto.dev)")
+
+
+def compare(before, after):
+    """2つのレポートの集計を比較して表示"""
+    old = {(entry['category'], entry['name']): entry for entry in before}
+    new = {(entry['category'], entry['name']): entry for entry in after}
+    print(f"\n{'category':<12} {'span':<16} {'before':>9} {'after':>9} {'change':>8}")
+    for key in sorted(set(old) | set(new)):
+        before_s = old[key]['wall_s'] if key in old else None
+        after_s = new[key]['wall_s'] if key in new else None
+        before_text = f"{before_s:8.2f}s" if before_s is not None else f"{'-':>9}"
+        after_text = f"{after_s:8.2f}s" if after_s is not None else f"{'-':>9}"
+        change = f"{(after_s - before_s) / before_s * 100:+7.1f}%" if before_s and after_s is not None else ''
+        print(f"{key[0]:<12} {key[1]:<16} {before_text} {after_text} {change:>8}")
+
+
+def _load_summary(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['summary']
+
+
+def main():
+    """Main function to build, show and compare pipeline trace reports."""
+    parser = argparse.ArgumentParser(description='Pipeline trace reports')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    report_parser = subparsers.add_parser('report', help=f'build a report from a {TRACE_ENV} directory')
+    report_parser.add_argument('trace_dir')
+    report_parser.add_argument('--output', '-o', default='trace.json', help='report path (default: trace.json)')
+
+    summary_parser = subparsers.add_parser('summary', help='print the summary table of a report')
+    summary_parser.add_argument('report')
+
+    compare_parser = subparsers.add_parser('compare', help='compare the span totals of two reports')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+
+    args = parser.parse_args()
+    if args.command == 'report':
+        print_summary(write_report(load_events(args.trace_dir), args.output))
+        print(f"\nTrace written to {args.output}")
+    elif args.command == 'summary':
+        print_summary(_load_summary(args.report))
+    else:
+        compare(_load_summary(args.before), _load_summary(args.after))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
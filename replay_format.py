@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+テニスゲームの試合記録（リプレイ）のファイル形式
+
+フレームごとのゲームの状態（ボールの位置と速度、パドルの位置、スコア、キー入力）を
+列ごとに固定長のバイナリで保存します。列は連続した領域なので numpy.memmap でそのまま読め、
+ファイル全体をメモリに読み込まずに、任意のポイント（ラリー）へ移動してフレームを順に読み出せます。
+
+ファイルの構成:
+    マジック（8バイト） + ヘッダー長（4バイト, リトルエンディアン） + JSONヘッダー
+    ポイントの索引（固定長のレコード: 試合番号, 開始フレーム, 終了フレーム, 打ち返し回数, スコア, 得点者）
+    列データ（ball_x, ball_y, ..., flags をそれぞれ num_frames 個ずつ）
+
+各領域の位置・型はJSONヘッダーに記録され、64バイト境界にそろえて配置されます。
+
+使用方法:
+    python replay_format.py record OUTPUT [--matches 1] [--difficulty medium] [--player follow] [--seed 0]
+    python replay_format.py info REPLAY
+    python replay_format.py benchmark [--minutes 10]
+"""
+
+import argparse  # コマンドライン引数の解析用
+import json      # ヘッダーの読み書き、比較用のJSON形式用
+import os        # ファイル操作用
+import shutil    # 列データの連結用
+import struct    # マジックとヘッダー長の読み書き用
+import sys       # 終了コード用
+import tempfile  # 書き込み途中の列データの一時ファイル用
+import time      # ベンチマークの計測用
+
+import numpy as np
+
+import game_engine
+
+MAGIC = b'TNSRPLY1'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# フレームごとの列（名前, 型）。位置と速度は32bit浮動小数点数（描画・分析には十分な精度）
+COLUMNS = [
+    ('ball_x', '<f4'),
+    ('ball_y', '<f4'),
+    ('speed_x', '<f4'),
+    ('speed_y', '<f4'),
+    ('player_y', '<f4'),
+    ('ai_y', '<f4'),
+    ('player_score', 'u1'),
+    ('ai_score', 'u1'),
+    ('flags', 'u1'),
+]
+
+# flags 列のビット
+FLAG_UP = 1       # player.up（↑キーが押されている）
+FLAG_DOWN = 2     # player.down（↓キーが押されている）
+FLAG_SERVED = 4   # このフレームでボールがサーブされた（試合開始、または得点直後）
+
+# ポイントの索引のレコード
+POINT_DTYPE = np.dtype([
+    ('match', '<u4'),         # 試合番号
+    ('start', '<u8'),         # 最初のフレーム（サーブしたフレーム）
+    ('stop', '<u8'),          # 最後のフレーム（得点する直前のフレーム）の次 = 次のポイントのサーブのフレーム
+    ('hits', '<u2'),          # 打ち返し回数
+    ('player_score', 'u1'),   # このポイント後のスコア
+    ('ai_score', 'u1'),
+    ('winner', 'u1'),         # 得点者（WINNER_PLAYER または WINNER_AI）
+])
+WINNER_AI = 0
+WINNER_PLAYER = 1
+
+
+def _align(offset):
+    """offset を ALIGNMENT の倍数に切り上げ"""
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class ReplayWriter:
+    """
+    リプレイファイルの書き込み
+
+    フレームは append()（1フレーム）または extend()（配列でまとめて）で追加し、
+    ポイントが終わるたびに end_point() で索引に記録します。
+    列ごとに一時ファイルへ追記し、close() で1つのファイルにまとめてアトミックに置き換えるため、
+    長時間の記録でもメモリ使用量は一定です。
+    """
+
+    def __init__(self, path, frame_rate=game_engine.FRAME_RATE, metadata=None, chunk_frames=8192):
+        """
+        Args:
+            path (str): 出力ファイル
+            frame_rate (int): 1秒あたりのフレーム数
+            metadata (dict, optional): ヘッダーに保存する任意の情報（難易度、シードなど）
+            chunk_frames (int): append() で一時ファイルへ書き出すまでにためるフレーム数
+        """
+        self.path = path
+        self.frame_rate = frame_rate
+        self.metadata = metadata or {}
+        self.frame_count = 0
+        self._directory = os.path.dirname(os.path.abspath(path))
+        self._spill = {name: tempfile.TemporaryFile(dir=self._directory) for name, _ in COLUMNS}
+        self._chunk = {name: np.empty(chunk_frames, dtype=dtype) for name, dtype in COLUMNS}
+        self._chunk_used = 0
+        self._points = []
+        self._point_start = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def _flush_chunk(self):
+        """append() でためたフレームを一時ファイルへ書き出す"""
+        if self._chunk_used:
+            for name, _ in COLUMNS:
+                self._spill[name].write(self._chunk[name][:self._chunk_used].tobytes())
+            self._chunk_used = 0
+
+    def append(self, **values):
+        """1フレーム分の状態を追加（キーワード引数は COLUMNS の全ての列）"""
+        for name, _ in COLUMNS:
+            self._chunk[name][self._chunk_used] = values[name]
+        self._chunk_used += 1
+        self.frame_count += 1
+        if self._chunk_used == len(self._chunk['flags']):
+            self._flush_chunk()
+
+    def extend(self, **columns):
+        """複数フレームの状態を列ごとの配列でまとめて追加"""
+        self._flush_chunk()
+        lengths = {len(columns[name]) for name, _ in COLUMNS}
+        if len(lengths) != 1:
+            raise ValueError('all columns must have the same length')
+        for name, dtype in COLUMNS:
+            self._spill[name].write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+        self.frame_count += lengths.pop()
+
+    def end_point(self, winner, player_score, ai_score, hits=0, match=0):
+        """
+        現在のフレームまでを1ポイントとして索引に記録
+
+        直前の end_point()（または記録の開始）の次のフレームから、最後に追加したフレームまでが対象です。
+        """
+        self._points.append((match, self._point_start, self.frame_count, hits, player_score, ai_score, winner))
+        self._point_start = self.frame_count
+
+    def skip_to_next_point(self):
+        """最後のポイント以降のフレーム（途中で打ち切った試合など）を、どのポイントにも含めない"""
+        self._point_start = self.frame_count
+
+    def close(self):
+        """ヘッダー・索引・列データを1つのファイルに書き出す"""
+        self._flush_chunk()
+        points = np.array(self._points, dtype=POINT_DTYPE)
+
+        # ヘッダーの長さで索引と列の位置が変わるため、ヘッダーが索引の手前に収まるまで計算し直す
+        data_start = len(MAGIC) + 4
+        while True:
+            offset = _align(data_start)
+            index_offset = offset
+            offset = _align(offset + points.nbytes)
+            columns = []
+            for name, dtype in COLUMNS:
+                columns.append({'name': name, 'dtype': dtype, 'offset': offset})
+                offset = _align(offset + self.frame_count * np.dtype(dtype).itemsize)
+            header = {
+                'version': FORMAT_VERSION,
+                'frame_rate': self.frame_rate,
+                'num_frames': self.frame_count,
+                'columns': columns,
+                'points': {'offset': index_offset, 'count': len(points), 'dtype': POINT_DTYPE.descr},
+                'metadata': self.metadata,
+            }
+            encoded = json.dumps(header, ensure_ascii=False).encode('utf-8')
+            if len(MAGIC) + 4 + len(encoded) <= index_offset:
+                break
+            data_start = len(MAGIC) + 4 + len(encoded)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(MAGIC)
+                f.write(struct.pack('<I', len(encoded)))
+                f.write(encoded)
+                f.write(b'\0' * (index_offset - f.tell()))
+                f.write(points.tobytes())
+                for column in columns:
+                    f.write(b'\0' * (column['offset'] - f.tell()))
+                    spill = self._spill[column['name']]
+                    spill.seek(0)
+                    shutil.copyfileobj(spill, f, 1024 * 1024)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        finally:
+            self.discard()
+
+    def discard(self):
+        """書き込み途中の一時ファイルを削除（ファイルは作成しない）"""
+        for spill in self._spill.values():
+            spill.close()
+
+
+class ReplayReader:
+    """
+    リプレイファイルの読み込み
+
+    各列は numpy.memmap として必要になったときに開き、読んだ範囲だけがメモリに載ります。
+    points はポイントの索引（構造化配列）です。
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): リプレイファイル
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                raise ValueError(f'{path} is not a replay file')
+            header_length, = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        if header['version'] != FORMAT_VERSION:
+            raise ValueError(f"unsupported replay format version {header['version']}")
+
+        self.frame_rate = header['frame_rate']
+        self.frame_count = header['num_frames']
+        self.metadata = header['metadata']
+        self._layout = {column['name']: column for column in header['columns']}
+        self._columns = {}
+
+        index = header['points']
+        dtype = np.dtype([tuple(field) for field in index['dtype']])
+        self.points = (np.memmap(path, dtype=dtype, mode='r', offset=index['offset'], shape=(index['count'],))
+                       if index['count'] else np.empty(0, dtype=dtype))
+
+    @property
+    def duration(self):
+        """記録の長さ（秒）"""
+        return self.frame_count / self.frame_rate
+
+    @property
+    def column_names(self):
+        """記録されている列の名前のリスト"""
+        return list(self._layout)
+
+    def column(self, name):
+        """列全体を numpy.memmap で取得（スライスした範囲だけが読み込まれる）"""
+        data = self._columns.get(name)
+        if data is None:
+            layout = self._layout[name]
+            data = (np.memmap(self.path, dtype=layout['dtype'], mode='r', offset=layout['offset'],
+                              shape=(self.frame_count,))
+                    if self.frame_count else np.empty(0, dtype=layout['dtype']))
+            self._columns[name] = data
+        return data
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def point_frames(self, index):
+        """index 番目のポイントの (開始フレーム, 終了フレーム) を取得"""
+        point = self.points[index]
+        return int(point['start']), int(point['stop'])
+
+    def unserved_points(self):
+        """開始フレームに FLAG_SERVED が立っていないポイントの番号の配列（正しい索引なら空）"""
+        if not len(self.points):
+            return np.empty(0, dtype=np.int64)
+        starts = self.points['start'].astype(np.int64)
+        return np.flatnonzero((self.column('flags')[starts] & FLAG_SERVED) == 0)
+
+    def frame_at(self, seconds):
+        """記録開始から seconds 秒の位置のフレーム番号"""
+        return min(int(seconds * self.frame_rate), self.frame_count)
+
+    def frames(self, start=0, stop=None, chunk_frames=8192, columns=None):
+        """
+        [start, stop) のフレームを chunk_frames ずつ、列名から配列への辞書で返すジェネレーター
+
+        配列はファイルを参照するビューで、必要なページだけが読み込まれます。
+        """
+        stop = self.frame_count if stop is None else min(stop, self.frame_count)
+        names = columns or self.column_names
+        for chunk_start in range(start, stop, chunk_frames):
+            chunk_stop = min(chunk_start + chunk_frames, stop)
+            yield {name: self.column(name)[chunk_start:chunk_stop] for name in names}
+
+    def states(self, start=0, stop=None):
+        """
+        gameplay_renderer.render_clip() に渡せる (ball_x, ball_y, ai_y, player_y, served) の列
+
+        開始フレームの直前の軌跡は分からないため、最初のフレームは served として扱います。
+        """
+        first = True
+        for chunk in self.frames(start, stop, columns=['ball_x', 'ball_y', 'ai_y', 'player_y', 'flags']):
+            served = (chunk['flags'] & FLAG_SERVED) != 0
+            served[:1] |= first
+            first = False
+            yield from zip(chunk['ball_x'].tolist(), chunk['ball_y'].tolist(), chunk['ai_y'].tolist(),
+                           chunk['player_y'].tolist(), served.tolist())
+
+
+def record_match(writer, difficulty='medium', player='follow', seed=0, match=0, max_frames=None):
+    """
+    1試合をシミュレーションしてリプレイに追記
+
+    最初にサーブ直後の状態、以降は1フレームごとの状態を記録し、ポイントごとに索引に登録します。
+    得点したステップでは engine.step() がボールをサーブし直すため、その状態は次のポイントの
+    最初のフレームとして、索引に登録した後に追加します（試合が終わった場合は追加しません）。
+
+    Returns:
+        bool: 試合が最後まで（どちらかが11点に達するまで）記録された場合True
+    """
+    engine = game_engine.GameEngine(1, player=game_engine.PLAYER_MODELS[player](), seed=seed,
+                                    **game_engine.preset_params(difficulty))
+
+    def append(served):
+        flags = FLAG_UP * bool(engine.player_up[0]) | FLAG_DOWN * bool(engine.player_down[0]) | FLAG_SERVED * served
+        writer.append(ball_x=engine.ball_x[0], ball_y=engine.ball_y[0], speed_x=engine.speed_x[0],
+                      speed_y=engine.speed_y[0], player_y=engine.player_y[0], ai_y=engine.ai_y[0],
+                      player_score=engine.player_score[0], ai_score=engine.ai_score[0], flags=flags)
+
+    append(True)
+    frames = 0
+    hits_before_point = 0
+    while engine.running[0] and (max_frames is None or frames < max_frames):
+        player_point, ai_point = engine.step()
+        frames += 1
+        scored = bool(player_point[0] | ai_point[0])
+        if scored:
+            total_hits = int(engine.ai_hits[0] + engine.player_hits[0])
+            writer.end_point(WINNER_PLAYER if player_point[0] else WINNER_AI, engine.player_score[0],
+                             engine.ai_score[0], hits=total_hits - hits_before_point, match=match)
+            hits_before_point = total_hits
+            if not engine.running[0]:
+                break
+        append(scored)
+    if engine.running[0]:
+        writer.skip_to_next_point()
+        return False
+    return True
+
+
+def record_session(path, matches=1, difficulty='medium', player='follow', seed=0, max_frames=None):
+    """
+    matches 試合を続けてシミュレーションし、1つのリプレイファイルに保存
+
+    試合 i の乱数の種は seed + i です。
+
+    Returns:
+        int: 記録したフレーム数
+    """
+    metadata = {'difficulty': difficulty, 'player': player, 'seed': seed, 'matches': matches}
+    with ReplayWriter(path, metadata=metadata) as writer:
+        for match in range(matches):
+            record_match(writer, difficulty, player, seed + match, match, max_frames)
+        return writer.frame_count
+
+
+def replay_to_json(reader, path):
+    """比較用：リプレイと同じ内容をフレームごとのオブジェクトのリストとしてJSONで保存"""
+    frames = []
+    for chunk in reader.frames():
+        columns = {name: values.tolist() for name, values in chunk.items()}
+        frames.extend(dict(zip(columns, row)) for row in zip(*columns.values()))
+    points = [dict(zip(POINT_DTYPE.names, (int(value) for value in point))) for point in reader.points]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'frame_rate': reader.frame_rate, 'metadata': reader.metadata, 'points': points,
+                   'frames': frames}, f)
+
+
+def bench_formats(args):
+    """リプレイ形式とJSON形式のファイルサイズ・書き込み・読み込み・シークの時間を比較"""
+    with tempfile.TemporaryDirectory(dir='.') as tmp_dir:
+        replay_path = os.path.join(tmp_dir, 'session.replay')
+        json_path = os.path.join(tmp_dir, 'session.json')
+
+        start = time.perf_counter()
+        frames = 0
+        seed = args.seed
+        with ReplayWriter(replay_path, metadata={'benchmark': True}) as writer:
+            while writer.frame_count < args.minutes * 60 * game_engine.FRAME_RATE:
+                record_match(writer, args.difficulty, args.player, seed, match=seed - args.seed)
+                seed += 1
+            frames = writer.frame_count
+        simulate_and_write = time.perf_counter() - start
+        reader = ReplayReader(replay_path)
+
+        # 書き込み：記録済みの列を extend() で書き直す時間（シミュレーションを含まない）
+        rewrite_path = os.path.join(tmp_dir, 'rewrite.replay')
+        start = time.perf_counter()
+        with ReplayWriter(rewrite_path) as writer:
+            for chunk in reader.frames():
+                writer.extend(**chunk)
+        replay_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        replay_to_json(reader, json_path)
+        json_write = time.perf_counter() - start
+
+        # 全フレームの読み込み（ball_x の合計を計算）
+        start = time.perf_counter()
+        total = float(ReplayReader(replay_path)['ball_x'].sum(dtype=np.float64))
+        replay_read = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        json_total = sum(frame['ball_x'] for frame in data['frames'])
+        json_read = time.perf_counter() - start
+        del data
+
+        # 中央のポイントの全フレームを読み出す（シーク）
+        middle = len(reader.points) // 2
+        start = time.perf_counter()
+        seek_reader = ReplayReader(replay_path)
+        first, last = seek_reader.point_frames(middle)
+        seek_frames = sum(1 for _ in seek_reader.states(first, last))
+        replay_seek = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        point = data['points'][middle]
+        json_seek_frames = len(data['frames'][point['start']:point['stop']])
+        json_seek = time.perf_counter() - start
+
+        replay_size = os.path.getsize(replay_path)
+        json_size = os.path.getsize(json_path)
+
+    print(f"Replay benchmark: {frames} frames ({frames / game_engine.FRAME_RATE / 60:.1f} min), "
+          f"{len(reader.points)} points, {seed - args.seed} matches "
+          f"(simulated and recorded in {simulate_and_write:.1f}s)")
+    print(f"  {'':<12}  {'size':>10}  {'write':>9}  {'read all':>9}  {'seek 1 point':>12}")
+    print(f"  {'replay':<12}  {replay_size / 1e6:8.2f}MB  {replay_write * 1000:7.1f}ms  {replay_read * 1000:7.1f}ms  "
+          f"{replay_seek * 1000:10.1f}ms")
+    print(f"  {'json':<12}  {json_size / 1e6:8.2f}MB  {json_write * 1000:7.1f}ms  {json_read * 1000:7.1f}ms  "
+          f"{json_seek * 1000:10.1f}ms")
+    print(f"  size ratio {json_size / replay_size:.1f}x, read speedup {json_read / replay_read:.0f}x, "
+          f"seek speedup {json_seek / replay_seek:.0f}x "
+          f"(checksum diff {abs(total - json_total):.3g}, seek frames {seek_frames}/{json_seek_frames})")
+
+
+def main():
+    """Main function to record and inspect replay files."""
+    parser = argparse.ArgumentParser(description='Record, inspect and benchmark memory-mapped replay files')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='simulate matches and save them as a replay')
+    record_parser.add_argument('output', help='replay file to write')
+    record_parser.add_argument('--matches', type=int, default=1, help='number of matches to record')
+    record_parser.add_argument('--difficulty', choices=sorted(game_engine.DIFFICULTY_PRESETS), default='medium',
+                               help='AI difficulty preset')
+    record_parser.add_argument('--player', choices=sorted(game_engine.PLAYER_MODELS), default='follow',
+                               help='player model')
+    record_parser.add_argument('--seed', type=int, default=0, help='random seed of the first match')
+
+    info_parser = subparsers.add_parser('info', help='show the contents of a replay file')
+    info_parser.add_argument('replay', help='replay file')
+
+    bench_parser = subparsers.add_parser('benchmark', help='compare size and speed with JSON')
+    bench_parser.add_argument('--minutes', type=float, default=10, help='minutes of gameplay to record')
+    bench_parser.add_argument('--difficulty', choices=sorted(game_engine.DIFFICULTY_PRESETS), default='medium',
+                              help='AI difficulty preset')
+    bench_parser.add_argument('--player', choices=sorted(game_engine.PLAYER_MODELS), default='follow',
+                              help='player model')
+    bench_parser.add_argument('--seed', type=int, default=0, help='random seed of the first match')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        start = time.perf_counter()
+        frames = record_session(args.output, args.matches, args.difficulty, args.player, args.seed)
+        print(f"Recorded {frames} frames ({frames / game_engine.FRAME_RATE:.1f}s) to {args.output} "
+              f"in {time.perf_counter() - start:.1f}s")
+        unserved = ReplayReader(args.output).unserved_points()
+        if len(unserved):
+            print(f"✗ Error: {len(unserved)} point(s) do not start with a served frame: {unserved.tolist()}")
+            return 1
+    elif args.command == 'info':
+        reader = ReplayReader(args.replay)
+        print(f"{args.replay}: {reader.frame_count} frames ({reader.duration:.1f}s at {reader.frame_rate} fps), "
+              f"{len(reader.points)} points, {os.path.getsize(args.replay)} bytes")
+        print(f"  metadata: {json.dumps(reader.metadata, ensure_ascii=False)}")
+        for point_index, point in enumerate(reader.points):
+            print(f"  point {point_index:4d}: match {point['match']}  frames {point['start']}-{point['stop']}  "
+                  f"{'player' if point['winner'] == WINNER_PLAYER else 'AI':6s}  "
+                  f"{point['ai_score']}-{point['player_score']}  {point['hits']} hits")
+        unserved = reader.unserved_points()
+        if len(unserved):
+            print(f"  ✗ {len(unserved)} point(s) do not start with a served frame: {unserved.tolist()}")
+            return 1
+    else:
+        bench_formats(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,10 +9,24 @@
 - アスペクト比維持でのスケーリング
 - 中央配置での背景合成
 - 高品質リサンプリング
+- 入力画像が前回と同じ場合のスキップ（build_cache.py のマニフェストで判定。
+  サイズと更新日時が変わっていない入力画像はハッシュも計算し直さない）
+- 変更のあった画像だけを複数プロセスで並列に変換（--jobs）
+
+他のスクリプトからは resize_screenshots() を呼び出すと、ファイルごとの処理結果と処理時間を取得できます。
+
+目標解像度・背景色・縮小率の設定は、PNGを経由せずに目標解像度で直接描画する
+memory_pipeline.py（SimpleCodeImageGenerator.render_to_frame）でも使用されます。
 """
 
 from PIL import Image  # 画像処理ライブラリ
+import argparse        # コマンドライン引数の解析用
 import os              # ファイルシステム操作用
+import sys             # 終了コード用
+import time            # 処理時間の計測用
+from concurrent.futures import ProcessPoolExecutor, as_completed  # 複数画像の並列変換用
+from build_cache import BuildCache, FileHashIndex, content_key  # 差分ビルド用
+from profiler import span  # 処理時間の計測用
 
 # 目標解像度の定義（フルHDサイズ）
 TARGET_WIDTH = 1920   # 横幅（1920ピクセル）
@@ -21,88 +35,252 @@ TARGET_HEIGHT = 1080  # 縦幅（1080ピクセル）
 # 背景色の定義（コードテーマに合わせたダークグレー）
 BACKGROUND_COLOR = '#2d2d2d'
 
-# Create output directory
-output_dir = "pic_resized"
-os.makedirs(output_dir, exist_ok=True)
+# 余白を残すための縮小率（目標解像度に対する割合）
+FILL_RATIO = 0.9
 
-print(f"Resizing screenshots to {TARGET_WIDTH}x{TARGET_HEIGHT}...")
+# 入力（スクリーンショット）と出力（リサイズ画像）のディレクトリ
+INPUT_DIR = 'pic'
+RESIZED_DIR = 'pic_resized'
 
-# Check if pic directory exists
-if not os.path.exists('pic'):
-    print("Error: 'pic' directory not found. Please run generate_screenshots.py first.")
-    exit(1)
 
-# Process all PNG files in pic directory
-pic_files = [f for f in os.listdir('pic') if f.endswith('.png')]
+def letterbox_geometry(width, height):
+    """
+    画像をアスペクト比を保って目標解像度に収めるときの配置を計算
 
-if not pic_files:
-    print("No PNG files found in 'pic' directory.")
-    exit(1)
+    Args:
+        width (int): 元画像の幅
+        height (int): 元画像の高さ
 
-for filename in pic_files:
-    input_path = os.path.join('pic', filename)
-    output_path = os.path.join(output_dir, filename)
+    Returns:
+        tuple: (縮小後の幅, 縮小後の高さ, X方向のオフセット, Y方向のオフセット, 倍率)
+    """
+    # Calculate scaling factor to fit within target resolution while maintaining aspect ratio
+    scale_x = TARGET_WIDTH / width
+    scale_y = TARGET_HEIGHT / height
+    scale = min(scale_x, scale_y) * FILL_RATIO  # Use 90% to leave some padding
 
-    print(f"\nProcessing {filename}...")
+    # Calculate new dimensions
+    new_width = int(width * scale)
+    new_height = int(height * scale)
 
-    try:
-        # Open the original image
-        img = Image.open(input_path)
-        original_width, original_height = img.size
-        print(f"  Original size: {original_width}x{original_height}")
+    # Calculate position to center the resized image
+    x_offset = (TARGET_WIDTH - new_width) // 2
+    y_offset = (TARGET_HEIGHT - new_height) // 2
+    return new_width, new_height, x_offset, y_offset, scale
+
+
+def letterbox(img):
+    """
+    画像を目標解像度の背景の中央に縮小して配置
+
+    Args:
+        img (PIL.Image): 元画像
+
+    Returns:
+        PIL.Image: TARGET_WIDTH x TARGET_HEIGHT のRGB画像
+    """
+    new_width, new_height, x_offset, y_offset, _ = letterbox_geometry(*img.size)
+
+    # Resize the image with high quality
+    resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+    # Create a new image with target resolution and background color
+    final_img = Image.new('RGB', (TARGET_WIDTH, TARGET_HEIGHT), BACKGROUND_COLOR)
 
-        # Calculate scaling factor to fit within target resolution while maintaining aspect ratio
-        scale_x = TARGET_WIDTH / original_width
-        scale_y = TARGET_HEIGHT / original_height
-        scale = min(scale_x, scale_y) * 0.9  # Use 90% to leave some padding
+    # Paste the resized image onto the background
+    final_img.paste(resized_img, (x_offset, y_offset))
+    return final_img
 
-        # Calculate new dimensions
-        new_width = int(original_width * scale)
-        new_height = int(original_height * scale)
 
-        # Resize the image with high quality
-        resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+def resize_cache_key(input_hash):
+    """リサイズ画像のキャッシュキー（入力画像のハッシュとリサイズ設定から計算）"""
+    return content_key('resize', input_hash, TARGET_WIDTH, TARGET_HEIGHT, BACKGROUND_COLOR, FILL_RATIO)
 
-        # Create a new image with target resolution and background color
-        final_img = Image.new('RGB', (TARGET_WIDTH, TARGET_HEIGHT), BACKGROUND_COLOR)
 
-        # Calculate position to center the resized image
-        x_offset = (TARGET_WIDTH - new_width) // 2
-        y_offset = (TARGET_HEIGHT - new_height) // 2
+def resize_file(input_path, output_path):
+    """
+    1枚の画像を目標解像度に変換して保存（プロセスプールのワーカーからも呼び出されます）
 
-        # Paste the resized image onto the background
-        final_img.paste(resized_img, (x_offset, y_offset))
+    Args:
+        input_path (str): 入力画像のパス
+        output_path (str): 出力画像のパス
 
-        # Save the final image
-        final_img.save(output_path, quality=95, dpi=(300, 300))
-        print(f"  ✓ Saved to {output_path}")
-        print(f"  Resized to: {new_width}x{new_height} (scale: {scale:.2f})")
-        print(f"  Centered at: ({x_offset}, {y_offset})")
+    Returns:
+        dict: 処理結果（original_size, resized_size, offset, scale, seconds, error）
+    """
+    start = time.perf_counter()
+    result = {'input': input_path, 'output': output_path, 'error': None}
+    try:
+        with Image.open(input_path) as img:
+            new_width, new_height, x_offset, y_offset, scale = letterbox_geometry(*img.size)
+            result['original_size'] = img.size
+            with span('downsample', 'resize', file=os.path.basename(input_path)):
+                final_img = letterbox(img)
 
+        # 書き込み途中のファイルが残らないよう一時ファイルに保存してから置き換える
+        # （失敗した場合は一時ファイルを削除。残すと次回以降に出力画像として扱われてしまう）
+        tmp_path = output_path + '.tmp.png'
+        try:
+            with span('save', 'resize', file=os.path.basename(input_path)):
+                final_img.save(tmp_path, quality=95, dpi=(300, 300))
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        result.update(resized_size=(new_width, new_height), offset=(x_offset, y_offset), scale=scale)
     except Exception as e:
-        print(f"  ✗ Error processing {filename}: {e}")
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def resize_screenshots(input_dir=INPUT_DIR, output_dir=RESIZED_DIR, jobs=1, verbose=True):
+    """
+    ディレクトリ内の全PNGを目標解像度に変換
+
+    入力画像のハッシュ（サイズと更新日時が変わったファイルだけ計算し直す）とリサイズ設定が
+    前回と同じで出力が残っているファイルはスキップし、残りを jobs 個のプロセスで並列に変換します。
+
+    Args:
+        input_dir (str): 入力ディレクトリ
+        output_dir (str): 出力ディレクトリ
+        jobs (int): 同時に変換するプロセス数
+        verbose (bool): ファイルごとの結果を表示するかどうか
 
-print(f"\n✓ All screenshots resized and saved to '{output_dir}' directory")
+    Returns:
+        list: ファイル名順の処理結果の辞書のリスト
+              （file, action（'resized' / 'skipped' / 'failed'）, reason, seconds と resize_file() の結果）
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pic_files = sorted(f for f in os.listdir(input_dir) if f.endswith('.png'))
 
-# Update create_video.py to use resized images
-print("\nUpdating video creation script to use resized images...")
+    # ビルドキャッシュ（入力画像とリサイズ設定が同じファイルはスキップ）
+    cache = BuildCache('resize')
+    hashes = FileHashIndex('resize')
 
-try:
-    # Check if create_video.py exists
-    if os.path.exists('create_video.py'):
-        # Read the current create_video.py
-        with open('create_video.py', 'r') as f:
-            content = f.read()
+    results = {}
+    stale = []
+    for filename in pic_files:
+        input_path = os.path.join(input_dir, filename)
+        output_path = os.path.join(output_dir, filename)
 
-        # Replace pic/ with pic_resized/
-        updated_content = content.replace('pic/', 'pic_resized/')
+        key = resize_cache_key(hashes.hash(input_path))
+        fresh, reason = cache.check(output_path, key)
+        if fresh:
+            cache.record(output_path, key, rebuilt=False, reason=reason)
+            results[filename] = {'file': filename, 'action': 'skipped', 'reason': reason, 'seconds': 0.0}
+        else:
+            stale.append((filename, input_path, output_path, key, reason))
+    hashes.save()
 
-        # Write the updated content
-        with open('create_video_resized.py', 'w') as f:
-            f.write(updated_content)
+    def finish(filename, output_path, key, reason, result):
+        if result['error']:
+            cache.forget(output_path)
+            action = 'failed'
+        else:
+            cache.record(output_path, key, rebuilt=True, reason=reason)
+            action = 'resized'
+        results[filename] = dict(result, file=filename, action=action, reason=reason)
 
-        print("✓ Created 'create_video_resized.py' that uses resized images")
+    if jobs > 1 and len(stale) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(stale))) as executor:
+            futures = {
+                executor.submit(resize_file, input_path, output_path): (filename, output_path, key, reason)
+                for filename, input_path, output_path, key, reason in stale
+            }
+            for future in as_completed(futures):
+                finish(*futures[future], future.result())
     else:
-        print("Note: create_video.py not found. Will be created later.")
-except Exception as e:
-    print(f"Error updating video script: {e}")
\ No newline at end of file
+        for filename, input_path, output_path, key, reason in stale:
+            finish(filename, output_path, key, reason, resize_file(input_path, output_path))
+    cache.save()
+
+    ordered = [results[filename] for filename in pic_files]
+    if verbose:
+        for result in ordered:
+            print_result(result)
+    return ordered
+
+
+def print_result(result):
+    """resize_screenshots() の1ファイル分の結果を表示"""
+    if result['action'] == 'skipped':
+        print(f"\nSkipping {result['file']} ({result['reason']})")
+        return
+
+    print(f"\nProcessing {result['file']}... ({result['reason']}, {result['seconds']:.2f}s)")
+    if result['action'] == 'failed':
+        print(f"  ✗ Error processing {result['file']}: {result['error']}")
+        return
+
+    original_width, original_height = result['original_size']
+    new_width, new_height = result['resized_size']
+    print(f"  Original size: {original_width}x{original_height}")
+    print(f"  ✓ Saved to {result['output']}")
+    print(f"  Resized to: {new_width}x{new_height} (scale: {result['scale']:.2f})")
+    print(f"  Centered at: {result['offset']}")
+
+
+def main():
+    """Main function to resize all screenshots."""
+    parser = argparse.ArgumentParser(description='Resize screenshots to the video resolution')
+    parser.add_argument('--input-dir', default=INPUT_DIR, help=f'directory of source screenshots (default: {INPUT_DIR})')
+    parser.add_argument('--output-dir', default=RESIZED_DIR,
+                        help=f'directory for resized images (default: {RESIZED_DIR})')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help='number of images to resize at once (default: all cores)')
+    args = parser.parse_args()
+
+    print(f"Resizing screenshots to {TARGET_WIDTH}x{TARGET_HEIGHT}...")
+
+    # Check if pic directory exists
+    if not os.path.exists(args.input_dir):
+        print(f"Error: '{args.input_dir}' directory not found. Please run generate_screenshots.py first.")
+        return 1
+
+    start_time = time.perf_counter()
+    results = resize_screenshots(args.input_dir, args.output_dir, jobs=args.jobs)
+    if not results:
+        print(f"No PNG files found in '{args.input_dir}' directory.")
+        return 1
+
+    elapsed = time.perf_counter() - start_time
+    resized = [result for result in results if result['action'] == 'resized']
+    failed = [result for result in results if result['action'] == 'failed']
+    skipped = len(results) - len(resized) - len(failed)
+    work = sum(result['seconds'] for result in resized)
+    print(f"\nResized {len(resized)}, skipped {skipped}, failed {len(failed)} "
+          f"in {elapsed:.2f}s ({work:.2f}s of resize work, {args.jobs} jobs)")
+    if failed:
+        return 1
+    print(f"\n✓ All screenshots resized and saved to '{args.output_dir}' directory")
+
+    # Update create_video.py to use resized images
+    print("\nUpdating video creation script to use resized images...")
+
+    try:
+        # Check if create_video.py exists
+        if os.path.exists('create_video.py'):
+            # Read the current create_video.py
+            with open('create_video.py', 'r') as f:
+                content = f.read()
+
+            # Replace pic/ with pic_resized/
+            updated_content = content.replace('pic/', 'pic_resized/')
+
+            # Write the updated content
+            with open('create_video_resized.py', 'w') as f:
+                f.write(updated_content)
+
+            print("✓ Created 'create_video_resized.py' that uses resized images")
+        else:
+            print("Note: create_video.py not found. Will be created later.")
+    except Exception as e:
+        print(f"Error updating video script: {e}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,17 +7,23 @@
 
 処理フロー:
 1. 必要なツール・ライブラリの確認
-2. コードスクリーンショット生成
-3. 音声ファイル生成
-4. 画像リサイズ処理
-5. 動画の編集・出力
+2. シーンごとの依存関係グラフ（pipeline_dag.py）の実行
+   - コードスクリーンショット生成 → 画像リサイズ処理
+   - 音声ファイル生成 → 音声の長さの取得
+   - 画像と音声がそろったシーンから動画セグメントを作成し、最後に結合
 
 このスクリプトを実行するだけで、完全な解説動画が自動生成されます。
+入力が前回と同じ成果物は再生成せず、再生成した成果物とその理由は
+.build_cache/manifest.json に記録されます（--force で全て再生成）。
 """
 
+import argparse    # コマンドライン引数の解析用
+import importlib.util  # ライブラリの存在確認（読み込みはしない）用
 import os          # ファイルシステム操作用
 import sys         # システム操作とプロセス制御用
-import subprocess  # 外部スクリプト実行用
+import subprocess  # ffmpegの存在確認用
+from build_cache import load_manifest  # ビルドキャッシュのマニフェスト読み込み用
+from profiler import session, span  # 処理時間の計測用
 
 def check_requirements():
     """
@@ -32,18 +38,17 @@ def check_requirements():
     print("動作要件をチェック中...")
 
     # PIL/Pillow（画像処理ライブラリ）の確認
-    try:
-        import PIL
+    # 存在だけを確認し、読み込みは各処理段階で実際に使うときに行う
+    if importlib.util.find_spec('PIL') is not None:
         print("✓ PIL/Pillow が利用可能です")
-    except ImportError:
+    else:
         print("✗ PIL/Pillow が見つかりません")
         return False
 
     # gTTS（Google Text-to-Speech）の確認
-    try:
-        import gtts
+    if importlib.util.find_spec('gtts') is not None:
         print("✓ gTTS が利用可能です")
-    except ImportError:
+    else:
         print("✗ gTTS が見つかりません")
         return False
 
@@ -58,13 +63,19 @@ def check_requirements():
 
     return True
 
-def run_pipeline():
+def run_pipeline(in_memory=False, fake_tts=False):
     """
     動画生成パイプラインの実行
 
-    全ての工程を順次実行して、最終的な解説動画を生成します。
+    通常はシーンごとの処理（描画 → リサイズ、音声合成 → 長さの取得 → セグメント作成）を
+    pipeline_dag.py の依存関係グラフとして1つのプロセス内で実行し、依存関係のない処理を同時に進めます。
     各ステップでエラーが発生した場合は処理を中断し、エラー内容を報告します。
 
+    Args:
+        in_memory (bool): Trueの場合、スクリーンショットとリサイズ画像のPNGを作らずに
+                          memory_pipeline.py でメモリ上のフレームから直接動画を作成
+        fake_tts (bool): Trueの場合、ネットワークを使わない疑似TTSバックエンドを使用
+
     Returns:
         bool: 全ての処理が成功した場合True
     """
@@ -76,10 +87,11 @@ def run_pipeline():
     required_files = [
         'index.html',
         'code_to_image_simple.py',
+        'build_cache.py',
         'generate_screenshots.py',
         'generate_audio_gtts.py',
         'resize_screenshots.py',
-        'create_video_resized.py'
+        'memory_pipeline.py' if in_memory else 'pipeline_dag.py'
     ]
 
     missing_files = [f for f in required_files if not os.path.exists(f)]
@@ -89,50 +101,45 @@ def run_pipeline():
 
     print("\nAll required files present ✓")
 
-    # Step 1: Generate screenshots
-    print("\n1. Generating screenshots...")
-    try:
-        subprocess.run([sys.executable, 'generate_screenshots.py'], check=True)
-        print("✓ Screenshots generated")
-    except subprocess.CalledProcessError as e:
-        print(f"✗ Screenshot generation failed: {e}")
-        return False
-
-    # Step 2: Generate audio
-    print("\n2. Generating audio files...")
-    try:
-        subprocess.run([sys.executable, 'generate_audio_gtts.py'], check=True)
-        print("✓ Audio files generated")
-    except subprocess.CalledProcessError as e:
-        print(f"✗ Audio generation failed: {e}")
-        return False
-
-    # Step 3: Resize screenshots
-    print("\n3. Resizing screenshots...")
-    try:
-        subprocess.run([sys.executable, 'resize_screenshots.py'], check=True)
-        print("✓ Screenshots resized")
-    except subprocess.CalledProcessError as e:
-        print(f"✗ Screenshot resizing failed: {e}")
-        return False
-
-    # Step 4: Create video (if ffmpeg available)
-    print("\n4. Creating video...")
-    try:
-        subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
-        subprocess.run([sys.executable, 'create_video_resized.py'], check=True)
+    if not in_memory:
+        # スクリーンショット・音声・リサイズ・動画をシーンごとの依存関係に従って同時に進める
+        print("\nGenerating screenshots, audio and video segments as a dependency graph...")
+        import pipeline_dag  # 依存ライブラリの確認後に読み込む（PIL など）
+        if not pipeline_dag.run_pipeline(fake_tts=fake_tts):
+            print("✗ Video creation failed")
+            return False
         print("✓ Video created successfully!")
-
-        # Show final video info
-        if os.path.exists('tennis_game_tutorial.mp4'):
-            size = os.path.getsize('tennis_game_tutorial.mp4') / (1024 * 1024)
-            print(f"  Final video: tennis_game_tutorial.mp4 ({size:.2f} MB)")
-
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("✗ Video creation skipped - ffmpeg not available")
-        print("  Install ffmpeg to complete video generation")
+        size = os.path.getsize('tennis_game_tutorial.mp4') / (1024 * 1024)
+        print(f"  Final video: tennis_game_tutorial.mp4 ({size:.2f} MB)")
+        return True
+
+    # 各段階はこのプロセス内で関数として呼び出す（インタープリターの起動とライブラリの読み込みは1回だけ）
+    import generate_audio_gtts
+    import memory_pipeline
+
+    # Step 1: Generate audio
+    print("\n1. Generating audio files...")
+    backend = generate_audio_gtts.create_backend(fake_tts)
+    with span('audio', 'stage'):
+        failed = generate_audio_gtts.generate_audio(backend)
+    if failed:
+        print(f"✗ Audio generation failed: {', '.join(failed)}")
+        return False
+    generate_audio_gtts.show_durations()
+    print("✓ Audio files generated")
+
+    # Step 2: Create video from in-memory frames
+    print("\n2. Creating video...")
+    with span('video', 'stage'):
+        ok = memory_pipeline.create_video_in_memory(jobs=os.cpu_count() or 1)
+    if not ok:
+        print("✗ Video creation failed")
         return False
+    print("✓ Video created successfully!")
 
+    # Show final video info
+    size = os.path.getsize('tennis_game_tutorial.mp4') / (1024 * 1024)
+    print(f"  Final video: tennis_game_tutorial.mp4 ({size:.2f} MB)")
     return True
 
 def show_summary():
@@ -167,6 +174,17 @@ def show_summary():
         size = os.path.getsize('tennis_game_tutorial.mp4') / (1024 * 1024)
         print(f"\n🎥 Final video: tennis_game_tutorial.mp4 ({size:.2f} MB)")
 
+    # Build cache
+    manifest = load_manifest()
+    if manifest['runs']:
+        print(f"\n🗂️  Build cache (.build_cache/manifest.json):")
+        for stage, run in manifest['runs'].items():
+            rebuilt = [entry for entry in run['entries'] if entry['action'] == 'rebuilt']
+            skipped = len(run['entries']) - len(rebuilt)
+            print(f"   {stage}: {len(rebuilt)} rebuilt, {skipped} up to date")
+            for entry in rebuilt:
+                print(f"     - {entry['artifact']} ({entry['reason']})")
+
     print("\n" + "="*60)
     print("VIDEO GENERATION COMPLETE!")
     print("="*60)
@@ -181,11 +199,29 @@ def show_summary():
     print("  - Run create_video_resized.py to regenerate video")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the whole tutorial video pipeline')
+    parser.add_argument('--force', action='store_true',
+                        help='ignore the build cache and regenerate every artifact')
+    parser.add_argument('--in-memory', action='store_true',
+                        help='render frames in memory and pipe them to ffmpeg without writing PNGs')
+    parser.add_argument('--fake-tts', action='store_true',
+                        help='use the offline fake TTS backend (for trying the pipeline without network)')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='record stage/scene/step timings and write a Chrome trace JSON report to FILE')
+    args = parser.parse_args()
+
+    if args.force:
+        # 各ステップのスクリプトはこの環境変数を見てキャッシュを無視する
+        os.environ['BUILD_CACHE_FORCE'] = '1'
+
     if not check_requirements():
         print("\nPlease install missing requirements and try again.")
         sys.exit(1)
 
-    if run_pipeline():
+    with session(args.trace):
+        ok = run_pipeline(in_memory=args.in_memory, fake_tts=args.fake_tts)
+
+    if ok:
         show_summary()
     else:
         print("\nPipeline completed with some errors. Check the output above.")
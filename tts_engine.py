@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+並列音声合成エンジン
+
+複数シーンのナレーション音声を、同時実行数の上限・トークンバケットによる
+リクエスト頻度制限・指数バックオフによる再試行付きで並列に合成します。
+audio_cache.AudioCache を渡すと、合成済みのナレーションはキャッシュから取り出します。
+
+synthesize_scenes() は各シーンのナレーションを文単位のチャンクに分割して並列に合成し、
+シーンごとのMP3に結合します。チャンクは個別にキャッシュされるため、
+1文だけ編集した場合はその文だけが再合成されます。
+
+バックエンド:
+- GTTSBackend: Google Text-to-Speech（ネットワーク経由）
+- SystemTTSBackend: macOSの say コマンド / Linuxの espeak（ffmpegでMP3に変換）
+- FakeTTSBackend: オフライン検証用。遅延と失敗を意図的に発生させ、
+  無音のMP3ファイルを出力します。
+"""
+
+import os          # ファイル操作用
+import random      # バックオフの揺らぎと疑似バックエンドの乱数用
+import re          # 文単位の分割用
+import shutil      # ファイルの結合用
+import subprocess  # say / espeak / ffmpeg の実行用
+import tempfile    # チャンク音声の一時保存用
+import threading   # トークンバケットの排他制御用
+import time        # 待機と処理時間の計測用
+from concurrent.futures import ThreadPoolExecutor  # 並列合成用
+from profiler import span  # 処理時間の計測用
+
+# 1チャンクの最大文字数（これを超える文は読点で分割）
+MAX_CHUNK_CHARS = 80
+
+
+class TokenBucket:
+    """
+    トークンバケットによるリクエスト頻度制限
+
+    rate 個/秒の速さでトークンが補充され、最大 capacity 個まで貯まります。
+    acquire() はトークンを1つ消費し、足りない場合は補充されるまで待機します。
+    """
+
+    def __init__(self, rate, capacity=1):
+        """
+        Args:
+            rate (float): 1秒あたりのトークン補充数（0以下の場合は制限なし）
+            capacity (int): 貯められるトークンの最大数（連続リクエストの上限）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """トークンを1つ取得（必要に応じて待機）"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class GTTSBackend:
+    """Google Text-to-Speech による音声合成バックエンド"""
+
+    name = 'gtts'
+
+    def __init__(self, lang='ja', slow=False):
+        """
+        Args:
+            lang (str): 言語コード
+            slow (bool): ゆっくり読み上げる場合True
+        """
+        self.lang = lang
+        self.slow = slow
+
+    def cache_identity(self):
+        """音声キャッシュのキーに含める (エンジン, 声, 速度, 言語)"""
+        return self.name, None, 'slow' if self.slow else 'normal', self.lang
+
+    def synthesize(self, text, output_path):
+        """テキストを合成してMP3ファイルとして保存"""
+        from gtts import gTTS  # 実際に合成するときだけ読み込む
+        gTTS(text=text, lang=self.lang, slow=self.slow).save(output_path)
+
+
+class SystemTTSBackend:
+    """
+    OS標準の音声合成コマンドによるバックエンド
+
+    macOSの say（AIFF出力）または Linuxの espeak（WAV出力）で合成し、
+    ffmpegでMP3（128kbps）に変換して保存します。
+    """
+
+    def __init__(self, engine, voice, rate, lang='ja'):
+        """
+        Args:
+            engine (str): 'say' または 'espeak'
+            voice (str): 声の名前（say: 'Kyoko', espeak: 'ja' など）
+            rate (int): 読み上げ速度（words per minute）
+            lang (str): 言語コード（キャッシュキー用）
+        """
+        self.name = engine
+        self.voice = voice
+        self.rate = rate
+        self.lang = lang
+
+    def cache_identity(self):
+        """音声キャッシュのキーに含める (エンジン, 声, 速度, 言語)"""
+        return self.name, self.voice, self.rate, self.lang
+
+    def synthesize(self, text, output_path):
+        """テキストを合成してMP3ファイルとして保存"""
+        suffix = '.aiff' if self.name == 'say' else '.wav'
+        fd, raw_path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        try:
+            if self.name == 'say':
+                cmd = ['say', '-v', self.voice, '-r', str(self.rate), '-o', raw_path, text]
+            else:
+                cmd = ['espeak', '-v', self.voice, '-s', str(self.rate), '-w', raw_path, text]
+            subprocess.run(cmd, check=True, capture_output=True)
+
+            cmd = ['ffmpeg', '-v', 'error', '-i', raw_path, '-acodec', 'mp3', '-ab', '128k',
+                   '-f', 'mp3', output_path, '-y']
+            subprocess.run(cmd, check=True, capture_output=True)
+        finally:
+            os.remove(raw_path)
+
+
+class FakeTTSBackend:
+    """
+    オフライン検証用の疑似音声合成バックエンド
+
+    指定範囲のランダムな遅延の後、一定の確率で例外を発生させます。
+    成功時はテキストの長さに比例した長さの無音MP3（MPEG-2 Layer III, 24kHz, 32kbps, モノラル）を出力します。
+    """
+
+    name = 'fake'
+
+    # 無音MP3フレーム（ヘッダー4バイト + 空のサイド情報・データ、1フレーム = 576サンプル = 24ms）
+    SILENT_FRAME = b'\xff\xf3\x44\xc0' + bytes(92)
+    FRAME_SECONDS = 576 / 24000
+
+    def __init__(self, latency=(0.05, 0.2), failure_rate=0.2, seconds_per_char=0.12, seed=None):
+        """
+        Args:
+            latency (tuple): 1回の合成にかかる時間の範囲（秒）
+            failure_rate (float): 合成が失敗する確率（0.0〜1.0）
+            seconds_per_char (float): 1文字あたりの音声の長さ（秒）
+            seed (int, optional): 乱数のシード
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.seconds_per_char = seconds_per_char
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def cache_identity(self):
+        """音声キャッシュのキーに含める (エンジン, 声, 速度, 言語)"""
+        return self.name, None, self.seconds_per_char, None
+
+    def synthesize(self, text, output_path):
+        """遅延と失敗を再現しつつ、無音のMP3ファイルを保存"""
+        with self._lock:
+            self.calls += 1
+            delay = self._random.uniform(*self.latency)
+            fail = self._random.random() < self.failure_rate
+        time.sleep(delay)
+        if fail:
+            raise ConnectionError('fake TTS backend: injected failure')
+
+        frames = max(1, round(len(text) * self.seconds_per_char / self.FRAME_SECONDS))
+        with open(output_path, 'wb') as f:
+            f.write(self.SILENT_FRAME * frames)
+
+
+def _synthesize_with_retry(backend, bucket, job, retries, backoff, max_backoff, cache=None):
+    """
+    1件の合成を再試行付きで実行
+
+    一時ファイルに書き出してから置き換えるため、失敗時に不完全なファイルが残りません。
+    キャッシュにある場合は合成せずにキャッシュからコピーします（attempts は0）。
+
+    Returns:
+        dict: 合成結果（id, output, ok, cached, attempts, seconds, error）
+    """
+    job_id, text, output_path = job
+    tmp_path = f"{output_path}.part"
+    start_time = time.perf_counter()
+    error = None
+
+    cache_key = cache.key(text, *backend.cache_identity()) if cache is not None else None
+    if cache is not None and cache.get(cache_key, output_path):
+        return {'id': job_id, 'output': output_path, 'ok': True, 'cached': True, 'attempts': 0,
+                'seconds': time.perf_counter() - start_time, 'error': None}
+
+    for attempt in range(1, retries + 2):
+        bucket.acquire()
+        try:
+            with span('synthesize', 'audio', id=job_id, attempt=attempt):
+                backend.synthesize(text, tmp_path)
+            os.replace(tmp_path, output_path)
+            if cache is not None:
+                cache.put(cache_key, output_path)
+            return {'id': job_id, 'output': output_path, 'ok': True, 'cached': False, 'attempts': attempt,
+                    'seconds': time.perf_counter() - start_time, 'error': None}
+        except Exception as e:
+            error = e
+            if attempt <= retries:
+                # 指数バックオフ（揺らぎ付き）で再試行
+                delay = min(max_backoff, backoff * (2 ** (attempt - 1)))
+                time.sleep(delay * random.uniform(0.5, 1.0))
+
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    return {'id': job_id, 'output': output_path, 'ok': False, 'cached': False, 'attempts': retries + 1,
+            'seconds': time.perf_counter() - start_time, 'error': str(error)}
+
+
+def synthesize_all(jobs, backend, concurrency=4, rate=2.0, burst=2, retries=4, backoff=0.5, max_backoff=8.0,
+                   on_result=None, cache=None, bucket=None):
+    """
+    複数のナレーションを並列に合成
+
+    Args:
+        jobs (list): (ID, テキスト, 出力ファイルパス) のリスト
+        backend: synthesize(text, output_path) を持つ音声合成バックエンド
+        concurrency (int): 同時に実行する合成の最大数
+        rate (float): 1秒あたりのリクエスト数の上限（0以下の場合は制限なし）
+        burst (int): 連続して送れるリクエスト数
+        retries (int): 失敗時の最大再試行回数
+        backoff (float): 最初の再試行までの待機時間（秒、以降は2倍ずつ増加）
+        max_backoff (float): 再試行までの待機時間の上限（秒）
+        on_result (callable, optional): 1件完了するごとに結果の辞書を渡して呼ばれる関数
+        cache (AudioCache, optional): 合成済み音声のキャッシュ
+        bucket (TokenBucket, optional): 複数の呼び出しでリクエスト頻度の上限を共有する場合に渡す
+                                        （省略時は rate と burst から作成）
+
+    Returns:
+        list: jobs と同じ順序の合成結果の辞書のリスト
+    """
+    bucket = bucket or TokenBucket(rate, burst)
+    report_lock = threading.Lock()  # 結果表示が混ざらないよう on_result を1件ずつ呼ぶ
+
+    def run(job):
+        result = _synthesize_with_retry(backend, bucket, job, retries, backoff, max_backoff, cache)
+        if on_result is not None:
+            with report_lock:
+                on_result(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        return list(executor.map(run, jobs))
+
+
+def split_sentences(text, max_chars=MAX_CHUNK_CHARS):
+    """
+    ナレーションを文単位のチャンクに分割
+
+    句点（。）と改行で区切り、max_chars を超える文は読点（、）の位置でさらに分割します。
+    区切り文字はチャンクの末尾に残すため、読み上げの間（ま）は変わりません。
+
+    Args:
+        text (str): ナレーションのテキスト
+        max_chars (int): 1チャンクの最大文字数
+
+    Returns:
+        list: 空でないチャンクのリスト
+    """
+    chunks = []
+    for line in text.splitlines():
+        for sentence in re.findall(r'[^。]+。?', line):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            if len(sentence) <= max_chars:
+                chunks.append(sentence)
+                continue
+
+            # 長い文は読点で区切り、max_chars を超えない範囲でまとめる
+            current = ''
+            for clause in re.findall(r'[^、]+、?', sentence):
+                if current and len(current) + len(clause) > max_chars:
+                    chunks.append(current)
+                    current = ''
+                current += clause
+            if current:
+                chunks.append(current)
+    return chunks
+
+
+def stitch_audio(chunk_paths, output_path):
+    """
+    チャンクのMP3を1つのMP3に結合
+
+    ffmpegのconcatフィルターで一度デコードしてから再エンコードするため、
+    各チャンクのエンコーダー遅延・パディングによる隙間が入りません。
+    ffmpegが使えない場合はMP3フレームをそのまま連結します。
+    一時ファイルに書き出してから置き換えます。
+
+    Args:
+        chunk_paths (list): 結合するMP3ファイルのパス（再生順）
+        output_path (str): 出力するMP3ファイルのパス
+    """
+    tmp_path = f"{output_path}.part"
+    if len(chunk_paths) == 1:
+        shutil.copyfile(chunk_paths[0], tmp_path)
+        os.replace(tmp_path, output_path)
+        return
+
+    inputs = []
+    for path in chunk_paths:
+        inputs.extend(['-i', path])
+    streams = ''.join(f'[{i}:a]' for i in range(len(chunk_paths)))
+    cmd = ['ffmpeg', '-v', 'error'] + inputs + [
+        '-filter_complex', f'{streams}concat=n={len(chunk_paths)}:v=0:a=1[a]',
+        '-map', '[a]',
+        '-c:a', 'libmp3lame',
+        '-b:a', '128k',
+        '-f', 'mp3',
+        tmp_path,
+        '-y'
+    ]
+    try:
+        try:
+            subprocess.run(cmd, check=True, capture_output=True)
+        except FileNotFoundError:
+            with open(tmp_path, 'wb') as out:
+                for path in chunk_paths:
+                    with open(path, 'rb') as f:
+                        shutil.copyfileobj(f, out)
+    except Exception:
+        # 失敗した場合は書きかけの一時ファイルを残さない
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_path)
+
+
+def synthesize_scenes(jobs, backend, chunked=True, max_chars=MAX_CHUNK_CHARS, on_result=None, **options):
+    """
+    シーン単位のナレーションを文単位に分割して並列に合成し、シーンごとに結合
+
+    全シーンの全チャンクをまとめて synthesize_all() に渡すため、長いシーンも
+    複数のチャンクが同時に合成されます。cache を渡すとチャンクごとにキャッシュされます。
+
+    Args:
+        jobs (list): (シーンID, テキスト, 出力ファイルパス) のリスト
+        backend: 音声合成バックエンド
+        chunked (bool): Falseの場合はシーン全体を1回で合成
+        max_chars (int): 1チャンクの最大文字数
+        on_result (callable, optional): 1シーン完了するごとに結果の辞書を渡して呼ばれる関数
+        **options: synthesize_all() に渡すオプション（concurrency, rate, retries, cache など）
+
+    Returns:
+        list: jobs と同じ順序のシーンごとの結果の辞書
+              （id, output, ok, cached, chunks, synthesized, attempts, seconds, error）
+    """
+    if not chunked:
+        results = synthesize_all(jobs, backend, on_result=None, **options)
+        for result in results:
+            result.update(chunks=1, synthesized=0 if result['cached'] else 1)
+            if on_result is not None:
+                on_result(result)
+        return results
+
+    with tempfile.TemporaryDirectory(prefix='tts_chunks_') as chunk_dir:
+        scene_chunks = {}
+        chunk_jobs = []
+        for scene_id, text, _ in jobs:
+            chunks = split_sentences(text, max_chars) or [text]
+            scene_chunks[scene_id] = []
+            for index, chunk in enumerate(chunks):
+                chunk_path = os.path.join(chunk_dir, f"{scene_id}_{index:03d}.mp3")
+                scene_chunks[scene_id].append(chunk_path)
+                chunk_jobs.append((scene_id, chunk, chunk_path))
+
+        start_time = time.perf_counter()
+        chunk_results = synthesize_all(chunk_jobs, backend, **options)
+
+        results = []
+        for scene_id, _, output_path in jobs:
+            parts = [result for result in chunk_results if result['id'] == scene_id]
+            failed = [result for result in parts if not result['ok']]
+            result = {
+                'id': scene_id,
+                'output': output_path,
+                'ok': not failed,
+                'cached': all(part['cached'] for part in parts),
+                'chunks': len(parts),
+                'synthesized': sum(1 for part in parts if part['ok'] and not part['cached']),
+                'attempts': sum(part['attempts'] for part in parts),
+                'seconds': time.perf_counter() - start_time,
+                'error': failed[0]['error'] if failed else None,
+            }
+            if result['ok']:
+                try:
+                    with span('stitch', 'audio', id=scene_id, chunks=len(scene_chunks[scene_id])):
+                        stitch_audio(scene_chunks[scene_id], output_path)
+                except (OSError, subprocess.CalledProcessError) as e:
+                    result.update(ok=False, error=f"stitching failed: {e}")
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+        return results